@@ -0,0 +1,544 @@
+"""
+Benchmarks for the pricing engine.
+
+Run a benchmark by name, e.g.:
+    python bench_pricing.py entries --rows 200000
+
+The suite benchmark runs a fixed set of measurements on a synthetic catalog and
+writes them to a JSON file, so runs on different commits can be diffed:
+    python bench_pricing.py suite --output bench_results.json
+"""
+import argparse
+import gc
+import json
+import platform
+import random
+import subprocess
+import sys
+import time
+import tracemalloc
+from bisect import bisect_left
+from itertools import accumulate
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+from pricing_engine import FrozenPriceEntry, PriceBook, PriceEntry, PriceType, PricingEngine, PricingError
+
+
+# Synthetic catalog: NORMAL base price plus a random mix of segment prices
+def generate_catalog(products: int, entries_per_product: int, seed: int = 0, entry_type: Callable = PriceEntry,
+                     normal_share: float = 0.0, mix: Optional[Sequence[float]] = None, break_depth: int = 1,
+                     customers: int = 10_000, tier_names: Sequence[str] = ("GOLD", "SILVER", "BRONZE"),
+                     group_names: Sequence[str] = tuple(f"GRP{g}" for g in range(1, 51)),
+                     rng: Optional[random.Random] = None) -> List:
+    """
+    Build a reproducible list of price rows. Each product's rows are split
+    into segments of break_depth rows; the first segment is its NORMAL base
+    price and the others draw a source from mix and a key for that source.
+    With break_depth 1 every row has a random min_qty and price; deeper
+    segments are ladders of min_qty 1, 5, 10, 25, ... with prices falling 3%
+    per step.
+    :param products: Number of distinct product codes
+    :param entries_per_product: Rows per product
+    :param seed: Random seed
+    :param entry_type: Row constructor (PriceEntry or FrozenPriceEntry)
+    :param normal_share: Fraction of products priced with NORMAL quantity breaks only
+    :param mix: Relative weights of CUSTOMER, TIER, GROUP, NORMAL segments (None = equal)
+    :param break_depth: Quantity breaks per segment
+    :param customers: CUSTOMER keys are 1..customers
+    :param tier_names: TIER keys
+    :param group_names: GROUP keys
+    :param rng: Generator to draw from instead of random.Random(seed)
+    """
+    rng = rng or random.Random(seed)
+    sources = (PriceType.CUSTOMER, PriceType.TIER, PriceType.GROUP, PriceType.NORMAL)
+    depth = max(1, break_depth)
+    break_quantities = [1, 5, 10, 25, 50, 100, 250, 500, 1000]
+    while len(break_quantities) < depth:
+        break_quantities.append(break_quantities[-1] * 2)
+
+    rows = []
+    for product in range(1, products + 1):
+        code = f"P{product:03d}"
+        base = float(rng.randint(50, 500))
+        rows.extend(entry_type(code, break_quantities[level], round(base * (1 - 0.03 * level), 2), PriceType.NORMAL)
+                    for level in range(min(depth, entries_per_product)))
+        normal_only = normal_share and rng.random() < normal_share
+        for segment in range(1, -(-entries_per_product // depth)):
+            if normal_only:
+                source = PriceType.NORMAL
+            else:
+                source = rng.choice(sources) if mix is None else rng.choices(sources, weights=mix)[0]
+            key = {
+                PriceType.CUSTOMER: rng.randint(1, customers),
+                PriceType.TIER: rng.choice(tier_names),
+                PriceType.GROUP: rng.choice(group_names),
+                PriceType.NORMAL: None,
+            }[source]
+            if depth == 1:
+                rows.append(entry_type(code, rng.choice((1, 5, 10, 50, 100)), float(rng.randint(10, 500)), source, key))
+            else:
+                price = base * rng.uniform(0.7, 1.0)
+                rows.extend(entry_type(code, break_quantities[level], round(price * (1 - 0.03 * level), 2), source, key)
+                            for level in range(min(depth, entries_per_product - segment * depth)))
+    return rows
+
+
+# Synthetic price book: generate_catalog's rows plus customer mappings over the same keys
+def synthetic_price_book(products: int, entries_per_product: int, mix: Sequence[float] = (0.1, 0.2, 0.2, 0.5),
+                         break_depth: int = 3, customers: int = 10_000, tiers: int = 3, groups: int = 50,
+                         seed: int = 0) -> Tuple[List[PriceEntry], Dict[int, str], Dict[int, str]]:
+    """
+    Build a reproducible catalog plus customer mappings.
+    The rows come from generate_catalog with the given source mix and
+    break_depth quantity breaks per segment.
+    :param mix: Relative weights of CUSTOMER, TIER, GROUP, NORMAL segments
+    :param customers: Customer ids are 1..customers; each has a tier and a group
+    :return: (price rows, customer_tiers, customer_groups)
+    """
+    rng = random.Random(seed)
+    tier_names = [f"TIER{t}" for t in range(1, tiers + 1)]
+    group_names = [f"GRP{g}" for g in range(1, groups + 1)]
+    rows = generate_catalog(products, entries_per_product, mix=mix, break_depth=break_depth, customers=customers,
+                            tier_names=tier_names, group_names=group_names, rng=rng)
+    customer_tiers = {c: rng.choice(tier_names) for c in range(1, customers + 1)}
+    customer_groups = {c: rng.choice(group_names) for c in range(1, customers + 1)}
+    return rows, customer_tiers, customer_groups
+
+
+# Synthetic request stream: Zipf-distributed product popularity
+def zipf_requests(count: int, products: int, skew: float = 1.1, customers: int = 10_000,
+                  seed: int = 0) -> Tuple[List[int], List[int], List[int]]:
+    """
+    Return (product_ids, quantities, customer_ids) for count requests. Product
+    popularity follows a Zipf law with exponent skew (0 = uniform); popularity
+    ranks are shuffled over product ids so hot products are spread out.
+    """
+    rng = random.Random(seed)
+    ranked = list(range(1, products + 1))
+    rng.shuffle(ranked)
+    cumulative = list(accumulate(1.0 / rank ** skew for rank in range(1, products + 1)))
+    scale = cumulative[-1]
+    product_ids = [ranked[min(bisect_left(cumulative, rng.random() * scale), products - 1)] for _ in range(count)]
+    quantities = [rng.choice((1, 2, 5, 10, 20, 50, 100)) for _ in range(count)]
+    customer_ids = [rng.randint(1, customers) for _ in range(count)]
+    return product_ids, quantities, customer_ids
+
+
+# Helper: peak resident set size of this process in MB (None where unsupported)
+def peak_rss_mb() -> Optional[float]:
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024   # bytes on macOS, KB elsewhere
+
+
+# Helper: nearest-rank percentiles of already sorted values
+def percentiles(values: Sequence[float], points: Sequence[float] = (50, 90, 99, 99.9)) -> Dict[str, float]:
+    return {f"p{point:g}": values[min(len(values) - 1, int(point / 100 * len(values)))] for point in points}
+
+
+# Helper: current commit, so result files can be matched to the code they measured
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+# Helper: bytes allocated while building an object
+def measure_memory(build: Callable) -> tuple:
+    """Return (object, bytes allocated while building it)."""
+    gc.collect()
+    tracemalloc.start()
+    obj = build()
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return obj, size
+
+
+# Helper: best-of-N wall time
+def measure_time(func: Callable, repeat: int = 3) -> float:
+    """Return the fastest of `repeat` runs of func(), in seconds."""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+# Benchmark: PriceEntry vs FrozenPriceEntry vs PriceBook memory and speed
+def bench_entries(args) -> None:
+    products = max(1, args.rows // args.entries_per_product)
+    print(f"{'layout':<18}{'bytes/row':>12}{'scan ms':>12}{'engine build ms':>18}")
+    for name in ("PriceEntry", "FrozenPriceEntry", "PriceBook"):
+        if name == "PriceBook":
+            build = lambda: PriceBook(generate_catalog(products, args.entries_per_product, args.seed, FrozenPriceEntry))
+        else:
+            entry_type = PriceEntry if name == "PriceEntry" else FrozenPriceEntry
+            build = lambda: generate_catalog(products, args.entries_per_product, args.seed, entry_type)
+        rows, size = measure_memory(build)
+        if name == "PriceBook":
+            # Bytes held by the book itself, not the temporary rows it was built from
+            size = sum(column.itemsize * len(column) for column in (rows.product, rows.min_qty, rows.price, rows.source, rows.key))
+            scan = lambda: sum(price for min_qty, price in zip(rows.min_qty, rows.price) if min_qty <= 10)
+        else:
+            # The attribute-load pattern of the old get_best_price filter
+            scan = lambda: sum(p.price for p in rows if p.min_qty <= 10 and p.source == PriceType.NORMAL)
+        scan_time = measure_time(scan)
+        build_time = measure_time(lambda: PricingEngine(rows, {}, {}), repeat=1)
+        print(f"{name:<18}{size / len(rows):>12.1f}{scan_time * 1e3:>12.1f}{build_time * 1e3:>18.1f}")
+
+
+# Benchmark: scalar get_best_price loop vs vectorized get_best_prices
+def bench_batch(args) -> None:
+    rng = random.Random(args.seed)
+    catalog = generate_catalog(args.products, args.entries_per_product, args.seed)
+    tiers = {c: rng.choice(("GOLD", "SILVER", "BRONZE")) for c in range(1, 10_001)}
+    groups = {c: f"GRP{rng.randint(1, 50)}" for c in range(1, 10_001)}
+    engine = PricingEngine(catalog, tiers, groups)
+    product_ids = [rng.randint(1, args.products) for _ in range(args.rows)]
+    quantities = [rng.choice((1, 5, 10, 50, 100)) for _ in range(args.rows)]
+    customer_ids = [rng.randint(1, 10_000) for _ in range(args.rows)]
+
+    def scalar():
+        for row in zip(product_ids, quantities, customer_ids):
+            try:
+                engine.get_best_price(*row)
+            except PricingError:
+                pass
+
+    engine.get_best_prices(product_ids[:1], quantities[:1], customer_ids[:1])  # build the columnar index once
+    scalar_time = measure_time(scalar, repeat=1)
+    batch_time = measure_time(lambda: engine.get_best_prices(product_ids, quantities, customer_ids))
+    print(f"scalar: {args.rows / scalar_time:>12,.0f} rows/s")
+    print(f"batch:  {args.rows / batch_time:>12,.0f} rows/s  ({scalar_time / batch_time:.1f}x)")
+
+
+# Benchmark: scalar lookups with and without the NORMAL-only fast path
+def bench_normal(args) -> None:
+    rng = random.Random(args.seed)
+    catalog = generate_catalog(args.products, args.entries_per_product, args.seed, normal_share=args.normal_share)
+    tiers = {c: rng.choice(("GOLD", "SILVER", "BRONZE")) for c in range(1, 10_001)}
+    groups = {c: f"GRP{rng.randint(1, 50)}" for c in range(1, 10_001)}
+    engine = PricingEngine(catalog, tiers, groups)
+    requests = [(rng.randint(1, args.products), rng.choice((1, 5, 10, 50, 100)), rng.randint(1, 10_000))
+                for _ in range(args.rows)]
+
+    def lookups():
+        for row in requests:
+            try:
+                engine.get_best_price(*row)
+            except PricingError:
+                pass
+
+    fast = measure_time(lookups)
+    fast_path, engine._normal_only = engine._normal_only, {}
+    slow = measure_time(lookups)
+    engine._normal_only = fast_path
+    print(f"NORMAL-only products: {len(fast_path):,} of {args.products:,}")
+    print(f"without fast path: {args.rows / slow:>12,.0f} lookups/s")
+    print(f"with fast path:    {args.rows / fast:>12,.0f} lookups/s  ({slow / fast:.2f}x)")
+
+
+# Benchmark: asyncio service throughput, batch sizes and event-loop lag
+def bench_async(args) -> None:
+    import asyncio
+    from pricing_async import AsyncPricingService
+
+    rng = random.Random(args.seed)
+    engine = PricingEngine(generate_catalog(args.products, args.entries_per_product, args.seed), {}, {})
+    requests = [(rng.randint(1, args.products), rng.choice((1, 5, 10, 50, 100)), rng.randint(1, 10_000))
+                for _ in range(args.rows)]
+    # Long-lived engine objects out of the collector's reach, as a service would do
+    # after loading: otherwise each full collection stalls the loop for ~150ms
+    gc.freeze()
+
+    async def client(service, rows):
+        for row in rows:
+            try:
+                await service.get_best_price(*row)
+            except PricingError:
+                pass
+
+    async def run():
+        async with AsyncPricingService(engine, window=args.window, lag_interval=0.01, offload=args.offload or None) as service:
+            per_client = -(-len(requests) // args.clients)
+            start = time.perf_counter()
+            await asyncio.gather(*(client(service, requests[i:i + per_client]) for i in range(0, len(requests), per_client)))
+            return time.perf_counter() - start, service.metrics()
+
+    seconds, metrics = asyncio.run(run())
+    print(f"requests/s:      {args.rows / seconds:>12,.0f}")
+    print(f"mean batch size: {metrics['mean_batch_size']:>12.1f} (max {metrics['max_batch_size']})")
+    print(f"loop lag ms:     {metrics['loop_lag_mean'] * 1e3:>12.2f} mean, {metrics['loop_lag_max'] * 1e3:.2f} max")
+
+
+# Benchmark: price_cart latency for one customer's cart
+def bench_cart(args) -> None:
+    rng = random.Random(args.seed)
+    catalog = generate_catalog(args.products, args.entries_per_product, args.seed)
+    tiers = {c: rng.choice(("GOLD", "SILVER", "BRONZE")) for c in range(1, 10_001)}
+    groups = {c: f"GRP{rng.randint(1, 50)}" for c in range(1, 10_001)}
+    engine = PricingEngine(catalog, tiers, groups)
+    for product_id in range(1, args.products + 1):   # steady state: every product id seen once
+        engine.try_get_best_price(product_id, 1, 0)
+
+    def singles(customer_id, lines):
+        for product_id, quantity in lines:
+            try:
+                engine.get_best_price(product_id, quantity, customer_id)
+            except PricingError:
+                pass
+
+    # Both paths see the same carts; which one runs first alternates so neither
+    # always finds the other's data in the CPU caches, and the first carts are warm-up
+    timings = {engine.price_cart: [], singles: []}
+    warmup = min(50, args.carts)
+    for cart in range(warmup + args.carts):
+        span = args.cart_products or args.products
+        lines = [(rng.randint(1, span), rng.choice((1, 5, 10, 50, 100))) for _ in range(args.lines)]
+        customer_id = rng.randint(1, 10_000)
+        for price in (list(timings) if cart % 2 else list(timings)[::-1]):
+            start = time.perf_counter()
+            price(customer_id, lines)
+            if cart >= warmup:
+                timings[price].append(time.perf_counter() - start)
+    for name, values in (("price_cart", timings[engine.price_cart]), ("get_best_price", timings[singles])):
+        values.sort()
+        p50, p99 = values[len(values) // 2], values[min(len(values) - 1, len(values) * 99 // 100)]
+        print(f"{name:<17} {args.lines}-line cart: p50 {p50 * 1e3:.3f} ms, p99 {p99 * 1e3:.3f} ms")
+
+
+# Benchmark: bulk CSV load into a PriceBook, then engine construction
+def bench_load(args) -> None:
+    import csv
+    import os
+    import tempfile
+    from pricing_io import load_price_book
+
+    products = max(1, args.rows // args.entries_per_product)
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "prices.csv")
+        with open(path, "w", newline="") as stream:
+            writer = csv.writer(stream)
+            writer.writerow(("product_id", "min_qty", "price", "source", "key"))
+            for p in generate_catalog(products, args.entries_per_product, args.seed):
+                writer.writerow((p.product_id, p.min_qty, p.price, p.source.value, "" if p.key is None else p.key))
+        book, stats = load_price_book(path)
+    start = time.perf_counter()
+    PricingEngine(book, {}, {})
+    build = time.perf_counter() - start
+    print(f"load:   {stats['rows']:,} rows in {stats['seconds']:.2f}s ({stats['rows_per_second']:,.0f} rows/s)")
+    print(f"engine: {build:.2f}s")
+
+
+# Benchmark: time to first quote, eager vs lazy indexing
+def bench_startup(args) -> None:
+    from pricing_lazy import LazyPricingEngine
+
+    products = max(1, args.rows // args.entries_per_product)
+    catalog = generate_catalog(products, args.entries_per_product, args.seed)
+    rng = random.Random(args.seed)
+    if not args.grouped:   # generate_catalog emits each product's rows together; real files need not
+        rng.shuffle(catalog)
+    book = PriceBook(catalog)
+    requests = [(rng.randint(1, products), rng.choice((1, 5, 10, 50, 100)), rng.randint(1, 10_000))
+                for _ in range(args.quotes)]
+    print(f"{len(catalog):,} {'grouped' if args.grouped else 'shuffled'} rows, {products:,} products; "
+          f"first quote, then {args.quotes:,} quotes")
+    for name, source in (("entries", catalog), ("PriceBook", book)):
+        for engine_type in (PricingEngine, LazyPricingEngine):
+            gc.collect()
+            start = time.perf_counter()
+            engine = engine_type(source, {}, {})
+            built = time.perf_counter()
+            for count, row in enumerate(requests):
+                try:
+                    engine.get_best_price(*row)
+                except PricingError:
+                    pass
+                if count == 0:
+                    first = time.perf_counter()
+            done = time.perf_counter()
+            print(f"{name:<9} {engine_type.__name__:<17} construct {built - start:6.2f}s, "
+                  f"first quote {first - start:6.3f}s, all quotes {done - start:6.2f}s")
+
+
+# Benchmark: process-pool throughput as workers are added
+def bench_parallel(args) -> None:
+    import os
+    from pricing_parallel import ParallelPricer
+
+    rng = random.Random(args.seed)
+    engine = PricingEngine(generate_catalog(args.products, args.entries_per_product, args.seed), {}, {})
+    rows = [{"product_id": rng.randint(1, args.products), "quantity": rng.choice((1, 5, 10, 50, 100)),
+             "customer_id": rng.randint(1, 10_000)} for _ in range(args.rows)]
+    max_workers = args.max_workers or os.cpu_count() or 1
+    counts = sorted({1, *(2 ** i for i in range(max_workers.bit_length()) if 2 ** i <= max_workers), max_workers})
+    print(f"{'workers':>8}{'rows/s':>14}{'speedup':>10}")
+    baseline = None
+    for workers in counts:
+        with ParallelPricer(engine, workers=workers, chunk_size=args.chunk_size) as pricer:
+            list(pricer.price(rows[:workers]))   # start every worker before timing
+            seconds = measure_time(lambda: list(pricer.price(rows)), repeat=1)
+        baseline = baseline or seconds
+        print(f"{workers:>8}{args.rows / seconds:>14,.0f}{baseline / seconds:>9.2f}x")
+
+
+# Benchmark suite: construction, latency percentiles, batch throughput and memory, as JSON
+def run_suite(products: int = 20_000, entries_per_product: int = 12, mix: Sequence[float] = (0.1, 0.2, 0.2, 0.5),
+              break_depth: int = 3, requests: int = 200_000, skew: float = 1.1, customers: int = 10_000,
+              seed: int = 0) -> dict:
+    """
+    Generate a catalog and request stream, then measure the engine on them.
+    :return: {"config", "environment", "results"}; latencies are in microseconds
+    """
+    config = {
+        "products": products, "entries_per_product": entries_per_product, "mix": list(mix),
+        "break_depth": break_depth, "requests": requests, "skew": skew, "customers": customers, "seed": seed,
+    }
+    catalog, tiers, groups = synthetic_price_book(products, entries_per_product, mix, break_depth, customers, seed=seed)
+    product_ids, quantities, customer_ids = zipf_requests(requests, products, skew, customers, seed)
+
+    gc.collect()
+    start = time.perf_counter()
+    engine = PricingEngine(catalog, tiers, groups)
+    construction = time.perf_counter() - start
+
+    # Per-call latency of get_best_price (timer overhead included, as callers see it)
+    clock = time.perf_counter_ns
+    latencies = []
+    record = latencies.append
+    for row in zip(product_ids, quantities, customer_ids):
+        begin = clock()
+        try:
+            engine.get_best_price(*row)
+        except PricingError:
+            pass
+        record(clock() - begin)
+    latencies.sort()
+    latency = {name: value / 1e3 for name, value in percentiles(latencies).items()}
+    latency["mean"] = sum(latencies) / len(latencies) / 1e3
+
+    engine.get_best_prices(product_ids[:1], quantities[:1], customer_ids[:1])   # build the columnar index once
+    batch_seconds = measure_time(lambda: engine.get_best_prices(product_ids, quantities, customer_ids))
+
+    try:
+        import numpy
+        numpy_version = numpy.__version__
+    except ImportError:
+        numpy_version = None
+    return {
+        "config": config,
+        "environment": {
+            "commit": git_commit(),
+            "python": platform.python_version(),
+            "numpy": numpy_version,
+            "platform": platform.platform(),
+        },
+        "results": {
+            "catalog_rows": len(catalog),
+            "construction_seconds": construction,
+            "get_best_price_us": latency,
+            "scalar_requests_per_second": len(latencies) / (sum(latencies) / 1e9),
+            "batch_requests_per_second": requests / batch_seconds,
+            "peak_rss_mb": peak_rss_mb(),
+        },
+    }
+
+
+def bench_suite(args) -> None:
+    report = run_suite(args.products, args.entries_per_product, [float(w) for w in args.mix.split(",")], args.break_depth,
+                       args.requests, args.skew, args.customers, args.seed)
+    with open(args.output, "w") as stream:
+        json.dump(report, stream, indent=2)
+        stream.write("\n")
+    results = report["results"]
+    latency = results["get_best_price_us"]
+    print(f"catalog: {results['catalog_rows']:,} rows, built in {results['construction_seconds']:.2f}s")
+    print(f"get_best_price us: p50 {latency['p50']:.2f}, p90 {latency['p90']:.2f}, p99 {latency['p99']:.2f}, p99.9 {latency['p99.9']:.2f}")
+    print(f"batch: {results['batch_requests_per_second']:,.0f} requests/s; peak RSS {results['peak_rss_mb'] or 0:.0f} MB")
+    print(f"wrote {args.output}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Pricing engine benchmarks")
+    parser.add_argument("--seed", type=int, default=0, help="Random seed for synthetic data")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    entries = commands.add_parser("entries", help="Row layout memory and attribute-access speed")
+    entries.add_argument("--rows", type=int, default=200_000)
+    entries.add_argument("--entries-per-product", type=int, default=10)
+    entries.set_defaults(func=bench_entries)
+
+    batch = commands.add_parser("batch", help="Scalar vs vectorized batch pricing throughput")
+    batch.add_argument("--rows", type=int, default=500_000)
+    batch.add_argument("--products", type=int, default=20_000)
+    batch.add_argument("--entries-per-product", type=int, default=10)
+    batch.set_defaults(func=bench_batch)
+
+    normal = commands.add_parser("normal", help="Scalar lookups with and without the NORMAL-only fast path")
+    normal.add_argument("--rows", type=int, default=200_000)
+    normal.add_argument("--products", type=int, default=20_000)
+    normal.add_argument("--entries-per-product", type=int, default=6)
+    normal.add_argument("--normal-share", type=float, default=0.8, help="Fraction of products with only NORMAL prices")
+    normal.set_defaults(func=bench_normal)
+
+    async_ = commands.add_parser("async", help="asyncio service throughput with micro-batching")
+    async_.add_argument("--rows", type=int, default=200_000)
+    async_.add_argument("--products", type=int, default=20_000)
+    async_.add_argument("--entries-per-product", type=int, default=10)
+    async_.add_argument("--clients", type=int, default=1000, help="Concurrent client coroutines")
+    async_.add_argument("--window", type=float, default=0.0005, help="Micro-batch window in seconds")
+    async_.add_argument("--offload", type=int, default=256, help="Batch size priced on the worker thread (0 = price inline)")
+    async_.set_defaults(func=bench_async)
+
+    cart = commands.add_parser("cart", help="price_cart latency percentiles")
+    cart.add_argument("--carts", type=int, default=1000)
+    cart.add_argument("--lines", type=int, default=300)
+    cart.add_argument("--cart-products", type=int, default=0,
+                      help="Draw each cart's lines from the first N products, so products repeat (0 = all products)")
+    cart.add_argument("--products", type=int, default=20_000)
+    cart.add_argument("--entries-per-product", type=int, default=10)
+    cart.set_defaults(func=bench_cart)
+
+    load = commands.add_parser("load", help="Bulk price-file load and engine construction time")
+    load.add_argument("--rows", type=int, default=1_000_000)
+    load.add_argument("--entries-per-product", type=int, default=10)
+    load.set_defaults(func=bench_load)
+
+    startup = commands.add_parser("startup", help="Time to first quote with eager vs lazy indexing")
+    startup.add_argument("--rows", type=int, default=1_000_000)
+    startup.add_argument("--entries-per-product", type=int, default=10)
+    startup.add_argument("--quotes", type=int, default=1000, help="Quotes after construction")
+    startup.add_argument("--grouped", action="store_true", help="Keep each product's rows together instead of shuffling")
+    startup.set_defaults(func=bench_startup)
+
+    parallel = commands.add_parser("parallel", help="Process-pool pricing throughput by worker count")
+    parallel.add_argument("--rows", type=int, default=500_000)
+    parallel.add_argument("--products", type=int, default=20_000)
+    parallel.add_argument("--entries-per-product", type=int, default=10)
+    parallel.add_argument("--chunk-size", type=int, default=10_000)
+    parallel.add_argument("--max-workers", type=int, default=0, help="Largest pool size (default: CPU count)")
+    parallel.set_defaults(func=bench_parallel)
+
+    suite = commands.add_parser("suite", help="Construction, latency percentiles, batch throughput and peak RSS as JSON")
+    suite.add_argument("--products", type=int, default=20_000)
+    suite.add_argument("--entries-per-product", type=int, default=12)
+    suite.add_argument("--mix", default="0.1,0.2,0.2,0.5", help="CUSTOMER,TIER,GROUP,NORMAL segment weights")
+    suite.add_argument("--break-depth", type=int, default=3, help="Quantity breaks per segment")
+    suite.add_argument("--requests", type=int, default=200_000)
+    suite.add_argument("--skew", type=float, default=1.1, help="Zipf exponent of product popularity (0 = uniform)")
+    suite.add_argument("--customers", type=int, default=10_000)
+    suite.add_argument("--output", default="bench_results.json", help="JSON results file")
+    suite.set_defaults(func=bench_suite)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,224 @@
+"""
+asyncio front end for the pricing engine.
+
+AsyncPricingService.get_best_price is a coroutine with the same result (and
+PricingError) as PricingEngine.get_best_price. Concurrent requests are not
+priced one by one: identical requests already in flight share one answer, and
+the rest are collected for a short window and priced with one get_best_prices
+call, so per-request work on the event loop is a dict lookup and a future.
+Large batches are priced on a worker thread so the loop keeps serving.
+"""
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Set, Tuple, Union
+
+from pricing_engine import ErrorCode, PricingEngine, PricingError
+from pricing_io import PRICE_TYPE_NAMES, _product_code
+
+# Coalescing key: identical in-flight requests share one batch row
+RequestKey = Tuple[Union[int, str], int, int]
+
+
+class AsyncPricingService:
+    """
+    Micro-batching, request-coalescing wrapper around one engine (any object
+    with get_best_prices, e.g. a PricingEngine, SnapshotEngine or
+    VersionedEngine). The first request of a batch starts a timer of `window`
+    seconds; the batch is priced when the timer fires or when it reaches
+    max_batch requests, whichever is first. Batches of at least `offload`
+    distinct requests are priced on one worker thread (so batch pricing, and
+    building the engine's columnar index on the first batch, do not stall the
+    loop); smaller ones are priced inline. Use as an async context manager, or
+    call start() and close().
+    """
+
+    def __init__(self, engine: PricingEngine, window: float = 0.0005, max_batch: int = 2048, lag_interval: float = 0.1,
+                 offload: Optional[int] = 256):
+        """
+        Wrap an engine.
+        :param window: Seconds to collect requests before pricing them
+        :param max_batch: Distinct requests that trigger an immediate batch
+        :param lag_interval: Seconds between event-loop lag samples (0 disables them)
+        :param offload: Batch size priced on the worker thread (None prices every batch inline)
+        """
+        if window < 0 or max_batch <= 0:
+            raise ValueError("window must be >= 0 and max_batch greater than zero.")
+        self.engine = engine
+        self.window = window
+        self.max_batch = max_batch
+        self.lag_interval = lag_interval
+        self.offload = offload
+        self._pending: Dict[RequestKey, List[asyncio.Future]] = {}   # request -> its waiters
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._monitor: Optional[asyncio.Task] = None
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._offloaded: Set[asyncio.Task] = set()
+        self._codes: Dict[object, str] = {}   # raw product_id -> normalized code, for results
+
+        # Metrics
+        self.requests = 0
+        self.coalesced = 0
+        self.batches = 0
+        self.batched_rows = 0
+        self.max_batch_seen = 0
+        self.lag_samples = 0
+        self.lag_total = 0.0
+        self.lag_max = 0.0
+        self.lag_last = 0.0
+
+    async def start(self) -> None:
+        """Start sampling event-loop lag (pricing works without it)."""
+        if self._monitor is None and self.lag_interval > 0:
+            self._monitor = asyncio.get_running_loop().create_task(self._sample_lag())
+
+    async def close(self) -> None:
+        """Price anything still pending, wait for offloaded batches and stop the lag sampler."""
+        self._flush()
+        while self._offloaded:
+            await asyncio.gather(*self._offloaded)
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+        if self._monitor is not None:
+            self._monitor.cancel()
+            try:
+                await self._monitor
+            except asyncio.CancelledError:
+                pass
+            self._monitor = None
+
+    async def __aenter__(self) -> "AsyncPricingService":
+        await self.start()
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        await self.close()
+
+    async def get_best_price(self, product_id: Union[int, str], quantity: int, customer_id: int) -> dict:
+        """
+        Price one request in the next batch. Returns the get_best_price result
+        dict (price as float) or raises PricingError with the same message.
+        """
+        self.requests += 1
+        key = (product_id, quantity, customer_id)
+        try:
+            waiters = self._pending.get(key)
+        except TypeError:   # unhashable input: price it alone, it will fail anyway
+            outcome = self._price([key])[0]
+            if type(outcome) is not dict:
+                raise PricingError(outcome)
+            return outcome
+        # Each caller waits on its own future, so cancelling one leaves the others alone
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        if waiters is not None:
+            self.coalesced += 1
+            waiters.append(future)
+        else:
+            self._pending[key] = [future]
+            if len(self._pending) >= self.max_batch:
+                self._flush()
+            elif self._timer is None:
+                self._timer = loop.call_later(self.window, self._flush)
+        return await future
+
+    def metrics(self) -> dict:
+        """Snapshot of request, batch-size and event-loop lag counters (lag in seconds)."""
+        return {
+            "requests": self.requests,
+            "coalesced": self.coalesced,
+            "batches": self.batches,
+            "mean_batch_size": self.batched_rows / self.batches if self.batches else 0.0,
+            "max_batch_size": self.max_batch_seen,
+            "pending": len(self._pending),
+            "loop_lag_last": self.lag_last,
+            "loop_lag_mean": self.lag_total / self.lag_samples if self.lag_samples else 0.0,
+            "loop_lag_max": self.lag_max,
+        }
+
+    # Helper method: price every pending request with one batch call
+    def _flush(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        pending, self._pending = self._pending, {}
+        if not pending:
+            return
+        self.batches += 1
+        self.batched_rows += len(pending)
+        self.max_batch_seen = max(self.max_batch_seen, len(pending))
+        if self.offload is not None and len(pending) >= self.offload:
+            task = asyncio.get_running_loop().create_task(self._price_offloaded(pending))
+            self._offloaded.add(task)
+            task.add_done_callback(self._offloaded.discard)
+            return
+        try:
+            outcomes = self._price(list(pending))
+        except Exception as e:
+            outcomes = e
+        self._settle(pending, outcomes)
+
+    # Helper method: price a batch on the worker thread (one at a time, in flush order)
+    async def _price_offloaded(self, pending: Dict[RequestKey, List[asyncio.Future]]) -> None:
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="pricing-async")
+        try:
+            outcomes = await asyncio.get_running_loop().run_in_executor(self._executor, self._price, list(pending))
+        except Exception as e:
+            outcomes = e
+        self._settle(pending, outcomes)
+
+    # Helper method: one get_best_prices call -> a result dict or error message per request
+    def _price(self, keys: List[RequestKey]) -> List[Union[dict, str]]:
+        prices, types, errors = self.engine.get_best_prices([key[0] for key in keys], [key[1] for key in keys],
+                                                            [key[2] for key in keys])
+        # Plain lists and int constants keep the per-row loop cheap
+        prices, types, errors = prices.tolist(), types.tolist(), errors.tolist()
+        ok, invalid_quantity, invalid_product = int(ErrorCode.OK), int(ErrorCode.INVALID_QUANTITY), int(ErrorCode.INVALID_PRODUCT)
+        codes, names = self._codes, PRICE_TYPE_NAMES
+        outcomes: List[Union[dict, str]] = []
+        for position, (product_id, quantity, _) in enumerate(keys):
+            error = errors[position]
+            if error == ok:
+                outcomes.append({"product_id": _product_code(codes, product_id), "price": prices[position],
+                                 "price_type": names[types[position]]})
+            elif error == invalid_quantity:
+                outcomes.append("Quantity must be greater than zero.")
+            elif error == invalid_product:
+                outcomes.append(f"Invalid product_id: {product_id}")
+            else:
+                outcomes.append(f"No price found for {_product_code(codes, product_id)} with quantity {quantity}.")
+        return outcomes
+
+    # Helper method: resolve a batch's waiters with its outcomes (or fail them all with an exception)
+    @staticmethod
+    def _settle(pending: Dict[RequestKey, List[asyncio.Future]], outcomes: Union[List[Union[dict, str]], Exception]) -> None:
+        for position, waiters in enumerate(pending.values()):
+            for future in waiters:
+                if future.done():       # cancelled while waiting
+                    continue
+                if isinstance(outcomes, Exception):
+                    future.set_exception(outcomes)
+                elif type(outcomes[position]) is dict:
+                    future.set_result(outcomes[position])
+                else:
+                    future.set_exception(PricingError(outcomes[position]))
+
+    # Background task: how late the loop runs a sleep that should take lag_interval
+    async def _sample_lag(self) -> None:
+        while True:
+            start = time.perf_counter()
+            await asyncio.sleep(self.lag_interval)
+            lag = max(0.0, time.perf_counter() - start - self.lag_interval)
+            self.lag_samples += 1
+            self.lag_total += lag
+            self.lag_max = max(self.lag_max, lag)
+            self.lag_last = lag
+
+
+async def price_concurrently(service: AsyncPricingService, rows: List[dict]) -> List[object]:
+    """Price order lines as concurrent requests; failures come back as PricingError objects."""
+    return await asyncio.gather(*(
+        service.get_best_price(row.get("product_id"), row.get("quantity"), row.get("customer_id")) for row in rows
+    ), return_exceptions=True)
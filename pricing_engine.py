@@ -1,6 +1,15 @@
+from array import array
+from bisect import bisect_left, bisect_right
+from collections import OrderedDict
 from dataclasses import dataclass
-from typing import List, Dict, Union, Optional
-from enum import Enum
+from typing import List, Dict, Iterable, Iterator, NamedTuple, Sequence, Set, Tuple, Union, Optional
+from enum import Enum, IntEnum
+from time import perf_counter_ns
+
+try:
+    import numpy as np
+except ImportError:  # NumPy is optional; batch pricing falls back to a scalar loop
+    np = None
 
 
 # Custom exception for errors
@@ -14,6 +23,12 @@ class PriceType(Enum):
     GROUP = "GROUP"        # Price specific to a customer group
     NORMAL = "NORMAL"      # Default/general price
 
+    # Every index key is (product id, PriceType, key), so each lookup hashes a
+    # PriceType. Enum's default __hash__ is a Python-level hash(self._name_);
+    # members are singletons compared by identity, so the C-level identity hash
+    # is equivalent and makes each segment lookup about twice as fast
+    __hash__ = object.__hash__
+
 # Data class to represent a single price entry
 @dataclass
 class PriceEntry:
@@ -23,6 +38,773 @@ class PriceEntry:
     source: PriceType                    # Source/type of price (CUSTOMER/TIER/GROUP/NORMAL)
     key: Optional[Union[int, str]] = None  # Identifier: customer_id (int), tier/group (str), None for NORMAL
 
+# Slotted, immutable variant of PriceEntry: no per-instance __dict__, hashable,
+# and constructed with exactly the same positional/keyword arguments
+@dataclass(frozen=True, slots=True)
+class FrozenPriceEntry:
+    product_id: str                     # Canonical product code (e.g., "P001")
+    min_qty: int                        # Minimum quantity for this price to apply
+    price: float                        # Price value
+    source: PriceType                   # Source/type of price (CUSTOMER/TIER/GROUP/NORMAL)
+    key: Optional[Union[int, str]] = None  # Identifier: customer_id (int), tier/group (str), None for NORMAL
+
+    @classmethod
+    def from_entry(cls, entry: PriceEntry) -> "FrozenPriceEntry":
+        """Build a frozen copy of a PriceEntry."""
+        return cls(entry.product_id, entry.min_qty, entry.price, entry.source, entry.key)
+
+# Any row type the engine and PriceBook accept
+PriceRecord = Union[PriceEntry, FrozenPriceEntry]
+
+# Index key for a bucket of price entries: (product id, source, key), where
+# product id is the dense integer a ProductCodeInterner assigned the code
+SegmentKey = Tuple[int, PriceType, Optional[Union[int, str]]]
+
+# Compiled bucket: (ascending min_qty breakpoints, running minimum price at each)
+StepTable = Tuple[Tuple[int, ...], Tuple[float, ...]]
+
+# Result cache key: (product id, customer_id, quantity band)
+CacheKey = Tuple[int, int, int]
+
+# Precomputed customer context: (tier name, group name, has CUSTOMER prices);
+# names that can never match a TIER/GROUP bucket are stored as None
+CustomerProfile = Tuple[Optional[str], Optional[str], bool]
+
+# Profile of a customer with no tier, no group and no customer-specific prices
+NO_PROFILE: CustomerProfile = (None, None, False)
+
+# A customer's bucket probes: (source, key) pairs in priority order (see probe_order)
+Probes = Tuple[Tuple[PriceType, Optional[Union[int, str]]], ...]
+
+# Probes of a customer with no profile
+NORMAL_PROBES: Probes = ((PriceType.NORMAL, None),)
+
+# Per-row status codes returned by batch APIs
+class ErrorCode(IntEnum):
+    OK = 0                # Price found
+    INVALID_QUANTITY = 1  # Quantity missing, non-numeric, or not greater than zero
+    INVALID_PRODUCT = 2   # product_id has an invalid format
+    NO_PRICE = 3          # No applicable price for the product/quantity/customer
+
+# Price reported for failed lookups
+NAN = float("nan")
+
+# PriceType -> its string value, without going through the Enum value descriptor
+PRICE_TYPE_VALUES = {source: source.value for source in PriceType}
+
+# Outcome of a non-raising lookup: the fields of a get_best_price result plus
+# an ErrorCode, with the error message only formatted when asked for. A tuple
+# subclass, so building one costs far less than raising and catching an exception
+class PriceResult(NamedTuple):
+    product_id: Union[int, str]             # Canonical code, or the raw input if it is invalid
+    quantity: object                        # Quantity as given
+    price: float = NAN                      # Best price (NaN on failure)
+    price_type: Optional[PriceType] = None  # Source of the price (None on failure)
+    error: ErrorCode = ErrorCode.OK         # Why the lookup failed
+
+    @property
+    def ok(self) -> bool:
+        return self.error == ErrorCode.OK
+
+    @property
+    def message(self) -> Optional[str]:
+        """The message get_best_price would raise for this lookup (None on success)."""
+        if self.error == ErrorCode.INVALID_QUANTITY:
+            return "Quantity must be greater than zero."
+        if self.error == ErrorCode.INVALID_PRODUCT:
+            return f"Invalid product_id: {self.product_id}"
+        if self.error == ErrorCode.NO_PRICE:
+            return f"No price found for {self.product_id} with quantity {self.quantity}."
+        return None
+
+    def to_dict(self) -> dict:
+        """get_best_price's result dict, or {"product_id", "error"} on failure."""
+        if self.error == ErrorCode.OK:
+            return {"product_id": self.product_id, "price": self.price, "price_type": self.price_type.value}
+        return {"product_id": self.product_id, "error": self.message}
+
+# Helper function: normalize product_id
+def normalize_product_code(product_id: Union[int, str]) -> str:
+    """
+    Convert input product_id to canonical "P###" format.
+    Accepts int (1 -> "P001"), string with/without 'P', or numeric string.
+    Raises PricingError for invalid format.
+    """
+    if isinstance(product_id, int):
+        return f"P{product_id:03d}"  # pad integers with zeros, e.g., 1 -> P001
+    if isinstance(product_id, str) and product_id.upper().startswith("P"):
+        return product_id.upper()    # already in "P###" form
+    if isinstance(product_id, str) and product_id.isdigit():
+        try:
+            return f"P{int(product_id):03d}"  # numeric string -> P###
+        except ValueError:   # digits int() refuses: over its 4300-digit limit, or e.g. superscripts
+            pass
+    raise PricingError(f"Invalid product_id: {product_id}")
+
+# Product code interner: canonical "P###" codes <-> dense integer ids
+class ProductCodeInterner:
+    """
+    Assigns each canonical product code a dense integer id (0, 1, 2, ...).
+    Raw inputs that resolved to a known code are remembered, so repeat callers
+    passing the same int or str skip normalize_product_code entirely.
+    """
+    # Raw inputs remembered per type beyond one per product: "1", "01", "001",
+    # ... all name P001, so without a cap callers could grow the memo without bound
+    MAX_REMEMBERED = 100_000
+
+    def __init__(self, codes: Iterable[str] = ()):
+        """
+        Create an interner, optionally pre-seeded with codes in id order.
+        :param codes: Canonical product codes; the i-th code gets id i
+        """
+        self.codes: List[str] = []          # id -> canonical code
+        self._ids: Dict[str, int] = {}      # canonical code -> id
+        self._int_ids: Dict[int, int] = {}  # raw int input -> id
+        self._str_ids: Dict[str, int] = {}  # raw str input -> id
+        for code in codes:
+            self.intern(code)
+
+    def intern(self, code: str) -> int:
+        """Return the id of a canonical code, assigning the next id if it is new."""
+        product = self._ids.get(code)
+        if product is None:
+            # Append the code before publishing its id, so concurrent readers
+            # that find the id can always read the code back
+            product = len(self.codes)
+            self.codes.append(code)
+            self._ids[code] = product
+        return product
+
+    def find(self, code: str) -> Optional[int]:
+        """
+        Return the id of a code taken exactly as given (no normalization, so
+        "p001" is not "P001"), or None if it was never interned.
+        Raises TypeError for an unhashable code.
+        """
+        return self._ids.get(code)
+
+    def lookup(self, product_id: Union[int, str]) -> Optional[int]:
+        """
+        Return the id for a raw product_id, or None if its code was never interned.
+        Raises PricingError if product_id has an invalid format.
+        """
+        # Fast path: exact int/str inputs seen before (type() so True and 1.0 stay on the slow path)
+        if type(product_id) is int:
+            product = self._int_ids.get(product_id)
+        elif type(product_id) is str:
+            product = self._str_ids.get(product_id)
+        else:
+            product = None
+        if product is not None:
+            return product
+
+        product = self._ids.get(normalize_product_code(product_id))
+        if product is not None:
+            self._remember(product_id, product)
+        return product
+
+    def resolve(self, product_id: Union[int, str]) -> Tuple[Optional[int], Optional[str]]:
+        """
+        Like lookup, but never raises and also returns the canonical code:
+        (id or None if never interned, code or None if product_id is invalid).
+        """
+        if type(product_id) is int:
+            product = self._int_ids.get(product_id)
+        elif type(product_id) is str:
+            product = self._str_ids.get(product_id)
+        else:
+            product = None
+        if product is not None:
+            return product, self.codes[product]
+
+        try:
+            code = normalize_product_code(product_id)
+        except PricingError:
+            return None, None
+        product = self._ids.get(code)
+        if product is not None:
+            self._remember(product_id, product)
+        return product, code
+
+    # Helper method: remember a raw input for the fast path. Only inputs for
+    # known codes are remembered, and at most one per product plus MAX_REMEMBERED of each type
+    def _remember(self, product_id: Union[int, str], product: int) -> None:
+        limit = len(self.codes) + self.MAX_REMEMBERED
+        if type(product_id) is int:
+            if len(self._int_ids) < limit:
+                self._int_ids[product_id] = product
+        elif type(product_id) is str:
+            if len(self._str_ids) < limit:
+                self._str_ids[product_id] = product
+
+    def __len__(self) -> int:
+        return len(self.codes)
+
+# Columnar store of price rows: one typed array per field instead of one
+# PriceEntry object per row
+class PriceBook:
+    """
+    Array-backed price rows. Product codes and keys are interned to ints, and
+    each field lives in its own column:
+      product (int32 product code id), min_qty (int32), price (float64),
+      source (uint8 index into SOURCES), key (int32 key id, 0 = no key).
+    PriceEntry objects are only built on demand by indexing or iterating.
+    """
+    SOURCES = list(PriceType)
+
+    def __init__(self, entries: Iterable[PriceRecord] = ()):
+        """
+        Create a price book, optionally filled from existing PriceEntry objects.
+        :param entries: PriceEntry objects to append
+        """
+        self.products = ProductCodeInterner()               # product code <-> product id
+        self.keys: List[Optional[Union[int, str]]] = [None]  # key id -> key (0 = None)
+        self._key_ids: Dict[tuple, int] = {(type(None), None): 0}
+        self._source_ids = {source: index for index, source in enumerate(self.SOURCES)}
+
+        self.product = array("i")
+        self.min_qty = array("i")
+        self.price = array("d")
+        self.source = array("B")
+        self.key = array("i")
+
+        self.extend(entries)
+
+    def append_row(self, product_id: str, min_qty: int, price: float, source: PriceType, key: Optional[Union[int, str]] = None) -> None:
+        """Append one price row; arguments mirror the PriceEntry fields."""
+        self.product.append(self.products.intern(product_id))
+        self.min_qty.append(min_qty)
+        self.price.append(price)
+        self.source.append(self._source_ids[source])
+        self.key.append(self.intern_key(key))
+
+    def extend_columns(self, products: Sequence[int], min_qtys: Sequence[int], prices: Sequence[float],
+                       sources: Sequence[int], keys: Sequence[int]) -> None:
+        """
+        Append many rows given column-wise as ids: products from products.intern,
+        sources as indexes into SOURCES and keys from intern_key. Used by bulk
+        loaders to fill the arrays without per-row method calls.
+        """
+        if not len(products) == len(min_qtys) == len(prices) == len(sources) == len(keys):
+            raise ValueError("All columns must have the same length.")
+        self.product.extend(products)
+        self.min_qty.extend(min_qtys)
+        self.price.extend(prices)
+        self.source.extend(sources)
+        self.key.extend(keys)
+
+    def intern_key(self, key: Optional[Union[int, str]]) -> int:
+        """Return the key id for key, assigning the next id if it is new."""
+        # Intern keys by (type, value) so 6 and "6" stay distinct keys
+        key_id = self._key_ids.get((type(key), key))
+        if key_id is None:
+            key_id = self._key_ids[(type(key), key)] = len(self.keys)
+            self.keys.append(key)
+        return key_id
+
+    def append(self, entry: PriceRecord) -> None:
+        """Append one PriceEntry."""
+        self.append_row(entry.product_id, entry.min_qty, entry.price, entry.source, entry.key)
+
+    def extend(self, entries: Iterable[PriceRecord]) -> None:
+        """Append every PriceEntry in entries."""
+        for entry in entries:
+            self.append_row(entry.product_id, entry.min_qty, entry.price, entry.source, entry.key)
+
+    @property
+    def product_codes(self) -> List[str]:
+        """Product code id -> canonical "P###" code."""
+        return self.products.codes
+
+    def rows(self) -> Iterator[Tuple[str, int, float, PriceType, Optional[Union[int, str]]]]:
+        """Yield (product_id, min_qty, price, source, key) tuples without building PriceEntry objects."""
+        codes = self.products.codes
+        for product, min_qty, price, source, key in self.id_rows():
+            yield codes[product], min_qty, price, source, key
+
+    def id_rows(self) -> Iterator[Tuple[int, int, float, PriceType, Optional[Union[int, str]]]]:
+        """Like rows(), but yield the interned product id instead of the product code."""
+        sources, keys = self.SOURCES, self.keys
+        for product, min_qty, price, source, key in zip(self.product, self.min_qty, self.price, self.source, self.key):
+            yield product, min_qty, price, sources[source], keys[key]
+
+    def __len__(self) -> int:
+        return len(self.product)
+
+    def __getitem__(self, index: int) -> PriceEntry:
+        return PriceEntry(
+            product_id=self.products.codes[self.product[index]],
+            min_qty=self.min_qty[index],
+            price=self.price[index],
+            source=self.SOURCES[self.source[index]],
+            key=self.keys[self.key[index]],
+        )
+
+    def __iter__(self) -> Iterator[PriceEntry]:
+        for product_id, min_qty, price, source, key in self.rows():
+            yield PriceEntry(product_id, min_qty, price, source, key)
+
+
+# Bounded LRU cache of best-price results
+class PriceCache:
+    """
+    LRU cache of resolved prices keyed by (product id, customer_id, band), where
+    band is the quantity's position among the product's quantity breaks (every
+    quantity in a band gets the same answer). Keys are also tracked per product
+    and per customer so a price or mapping change drops only the entries it
+    affects. hits/misses/evictions/invalidations counters help size the cache.
+    """
+
+    def __init__(self, maxsize: int):
+        """
+        Create an empty cache.
+        :param maxsize: Maximum number of cached results; least recently used go first
+        """
+        if maxsize <= 0:
+            raise ValueError("maxsize must be greater than zero.")
+        self.maxsize = maxsize
+        self._entries: "OrderedDict[CacheKey, Tuple[float, PriceType]]" = OrderedDict()
+        self._by_product: Dict[int, Set[CacheKey]] = {}
+        self._by_customer: Dict[int, Set[CacheKey]] = {}
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def get(self, key: CacheKey) -> Optional[Tuple[float, PriceType]]:
+        """Return the cached (price, source) for key, or None on a miss."""
+        value = self._entries.get(key)
+        if value is None:
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def put(self, key: CacheKey, value: Tuple[float, PriceType]) -> None:
+        """Cache (price, source) for key, evicting the least recently used entry when full."""
+        if key in self._entries:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            return
+        if len(self._entries) >= self.maxsize:
+            oldest, _ = self._entries.popitem(last=False)
+            self._forget(oldest)
+            self.evictions += 1
+        self._entries[key] = value
+        self._by_product.setdefault(key[0], set()).add(key)
+        self._by_customer.setdefault(key[1], set()).add(key)
+
+    def invalidate_product(self, product: int) -> None:
+        """Drop every cached result for one product id."""
+        for key in self._by_product.pop(product, ()):
+            del self._entries[key]
+            self._discard(self._by_customer, key[1], key)
+            self.invalidations += 1
+
+    def invalidate_customer(self, customer_id: int) -> None:
+        """Drop every cached result for one customer."""
+        for key in self._by_customer.pop(customer_id, ()):
+            del self._entries[key]
+            self._discard(self._by_product, key[0], key)
+            self.invalidations += 1
+
+    def clear(self) -> None:
+        """Drop every cached result (counters are kept)."""
+        self.invalidations += len(self._entries)
+        self._entries.clear()
+        self._by_product.clear()
+        self._by_customer.clear()
+
+    def info(self) -> dict:
+        """Snapshot of cache size and counters."""
+        return {
+            "size": len(self._entries),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+        }
+
+    # Helper method: remove an evicted key from both secondary indexes
+    def _forget(self, key: CacheKey) -> None:
+        self._discard(self._by_product, key[0], key)
+        self._discard(self._by_customer, key[1], key)
+
+    @staticmethod
+    def _discard(index: dict, owner, key: CacheKey) -> None:
+        keys = index.get(owner)
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del index[owner]
+
+
+# Log2-bucketed latency histogram for instrumentation
+class LatencyHistogram:
+    """
+    Counts durations in power-of-two nanosecond buckets: bucket k holds
+    durations d with 2**(k-1) <= d < 2**k (bucket 0 holds d == 0), so
+    recording is one bit_length() and one list increment.
+    """
+    BUCKETS = 64
+
+    def __init__(self):
+        self.counts = [0] * self.BUCKETS
+        self.count = 0
+        self.total_ns = 0
+
+    def record(self, ns: int) -> None:
+        self.counts[min(ns.bit_length(), self.BUCKETS - 1)] += 1
+        self.count += 1
+        self.total_ns += ns
+
+    def percentile(self, fraction: float) -> int:
+        """Upper bound (ns) of the bucket holding the given fraction of samples."""
+        wanted = fraction * self.count
+        seen = 0
+        for bucket, count in enumerate(self.counts):
+            seen += count
+            if count and seen >= wanted:
+                return (1 << bucket) - 1
+        return 0
+
+    def snapshot(self) -> dict:
+        """Count, total/mean, approximate p50/p99 and non-empty buckets keyed by upper bound (ns)."""
+        return {
+            "count": self.count,
+            "total_ns": self.total_ns,
+            "mean_ns": self.total_ns / self.count if self.count else 0.0,
+            "p50_ns": self.percentile(0.5),
+            "p99_ns": self.percentile(0.99),
+            "buckets": {(1 << bucket) - 1: count for bucket, count in enumerate(self.counts) if count},
+        }
+
+
+# Counters and per-stage timers collected by an instrumented engine
+class EngineStats:
+    """
+    Instrumentation state for get_best_price. Stages, in call order:
+      normalize   product_id -> interned product id
+      cache       result-cache probe (only with the cache on)
+      customer    customer profile lookup
+      candidates  collecting the product's buckets that apply to the customer
+      select      quantity-break search over the candidates, in priority order
+    plus total for the whole call. candidate_sizes counts how many buckets
+    were left to search per call.
+    """
+    STAGES = ("normalize", "cache", "customer", "candidates", "select", "total")
+
+    def __init__(self):
+        self.calls = 0
+        self.errors = {code.name: 0 for code in ErrorCode if code != ErrorCode.OK}
+        self.cache_hits = 0
+        self.normal_only = 0
+        self.stages = {stage: LatencyHistogram() for stage in self.STAGES}
+        self.candidate_sizes = [0] * (len(PriceType) + 1)
+
+    def snapshot(self) -> dict:
+        return {
+            "calls": self.calls,
+            "errors": dict(self.errors),
+            "cache_hits": self.cache_hits,
+            "normal_only": self.normal_only,
+            "stages": {stage: histogram.snapshot() for stage, histogram in self.stages.items()},
+            "candidate_sizes": {size: count for size, count in enumerate(self.candidate_sizes)},
+        }
+
+
+# Flat, array-backed copy of the engine's index for vectorized batch lookups
+class ColumnarIndex:
+    """
+    The compiled step tables laid out as flat typed arrays:
+      segment_codes  sorted int64 code per bucket: ((product id * 4 + source) << 32) | key id
+      offsets        int64, bucket i owns breaks/prices [offsets[i], offsets[i + 1])
+      break_codes    int64 (bucket number << 32) | min_qty, so one global sorted
+                     search finds the last break <= quantity within a bucket
+      prices         float64 running minimum price at each break
+    plus normal_segment (product id -> its NORMAL bucket number, -1 = none) and
+    per-customer key ids (customer_key, tier_key, group_key; -1 = none)
+    addressed through customer_rows. Sources are numbered by SOURCE_CODES.
+    Quantities and breaks are clamped to [0, MAX_QTY].
+    """
+    SOURCE_CODES = {PriceType.CUSTOMER: 0, PriceType.TIER: 1, PriceType.GROUP: 2, PriceType.NORMAL: 3}
+    MAX_QTY = (1 << 32) - 1
+    # Array attributes and their typecodes; anything supporting len() and
+    # indexing (array.array, memoryview, NumPy) can back them
+    ARRAYS = {
+        "segment_codes": "q", "offsets": "q", "break_codes": "q", "prices": "d",
+        "normal_segment": "q", "customer_key": "q", "tier_key": "q", "group_key": "q",
+    }
+
+    def __init__(self, segments: Dict[SegmentKey, StepTable], customer_tiers: Dict[int, str], customer_groups: Dict[int, str]):
+        """
+        Flatten an engine's buckets and customer mappings.
+        :param segments: (product id, source, key) -> compiled step table
+        :param customer_tiers: Mapping of customer_id -> tier name
+        :param customer_groups: Mapping of customer_id -> group name
+        """
+        # Key ids: customer ids for CUSTOMER buckets, tier/group names for the rest
+        self.customer_key_ids: Dict[int, int] = {}
+        self.name_ids: Dict[str, int] = {}
+        coded = [(self._segment_code(segment), table) for segment, table in segments.items()]
+        coded.sort(key=lambda item: item[0])
+
+        self.segment_codes = array("q")
+        self.offsets = array("q", [0])
+        self.break_codes = array("q")
+        self.prices = array("d")
+        products = 1 + max((segment[0] for segment in segments), default=-1)
+        self.normal_segment = array("q", [-1]) * products
+        normal = self.SOURCE_CODES[PriceType.NORMAL]
+        for number, (code, (breaks, prices)) in enumerate(coded):
+            if (code >> 32) & 3 == normal:
+                self.normal_segment[code >> 34] = number
+            self.segment_codes.append(code)
+            self.break_codes.extend((number << 32) | min(max(int(b), 0), self.MAX_QTY) for b in breaks)
+            self.prices.extend(prices)
+            self.offsets.append(len(self.prices))
+
+        # One row per known customer: their own key id plus tier/group name ids
+        self.customer_rows: Dict[int, int] = {}
+        for customer_id in (*self.customer_key_ids, *customer_tiers, *customer_groups):
+            self.customer_rows.setdefault(customer_id, len(self.customer_rows))
+        self.customer_key = array("q", [-1]) * len(self.customer_rows)
+        self.tier_key = array("q", [-1]) * len(self.customer_rows)
+        self.group_key = array("q", [-1]) * len(self.customer_rows)
+        for customer_id, row in self.customer_rows.items():
+            self.customer_key[row] = self.customer_key_ids.get(customer_id, -1)
+            tier = customer_tiers.get(customer_id)
+            group = customer_groups.get(customer_id)
+            if isinstance(tier, str):
+                self.tier_key[row] = self.name_ids.get(tier, -1)
+            if isinstance(group, str):
+                self.group_key[row] = self.name_ids.get(group, -1)
+
+    # Helper method: a bucket's segment code, assigning key ids to new keys
+    def _segment_code(self, segment: SegmentKey) -> int:
+        product, source, key = segment
+        if source == PriceType.CUSTOMER:
+            key_id = self.customer_key_ids.setdefault(key, len(self.customer_key_ids))
+        elif source == PriceType.NORMAL:
+            key_id = 0
+        else:
+            key_id = self.name_ids.setdefault(key, len(self.name_ids))
+        return ((product * 4 + self.SOURCE_CODES[source]) << 32) | key_id
+
+    # Incremental update: splice changed buckets and customers into a copy (requires NumPy)
+    def patched(self, changes: Dict[SegmentKey, Optional[StepTable]], customer_tiers: Dict[int, str],
+                customer_groups: Dict[int, str], customers: Iterable[int] = ()) -> "ColumnarIndex":
+        """
+        Return a copy with some buckets replaced, added or dropped and some
+        customers' key ids re-read. Arrays that do not change are shared with
+        this index, which is left untouched for readers still using it; the rest
+        are rebuilt with a few vectorized passes instead of flattening every
+        bucket again.
+        :param changes: (product id, source, key) -> new step table, or None for a removed bucket
+        :param customer_tiers: Mapping of customer_id -> tier name after the change
+        :param customer_groups: Mapping of customer_id -> group name after the change
+        :param customers: Customer ids whose tier or group changed
+        """
+        index = self.__class__.__new__(self.__class__)
+        for name in self.ARRAYS:
+            setattr(index, name, getattr(self, name))
+        index.customer_key_ids = dict(self.customer_key_ids)
+        index.name_ids = dict(self.name_ids)
+        index.customer_rows = dict(self.customer_rows)
+        names = len(index.name_ids)
+        customers = set(customers)
+        if changes:
+            coded = []
+            for segment, table in changes.items():
+                coded.append((index._segment_code(segment), table))
+                if segment[1] == PriceType.CUSTOMER:
+                    customers.add(segment[2])
+            coded.sort(key=lambda item: item[0])
+            index._splice(coded)
+        if len(index.name_ids) > names:
+            # Customers already mapped to a name that just got its first bucket
+            fresh = set(list(index.name_ids)[names:])
+            customers.update(customer_id for customer_id, tier in customer_tiers.items() if tier in fresh)
+            customers.update(customer_id for customer_id, group in customer_groups.items() if group in fresh)
+        if customers:
+            index._refresh_customers(customers, customer_tiers, customer_groups)
+        return index
+
+    # Helper method: rebuild the bucket arrays with the given (code, table or None) buckets swapped in
+    def _splice(self, coded: List[Tuple[int, Optional[StepTable]]]) -> None:
+        old_codes = np.frombuffer(self.segment_codes, dtype=np.int64)
+        old_lengths = np.diff(np.frombuffer(self.offsets, dtype=np.int64))
+        kept = ~np.isin(old_codes, [code for code, _ in coded])
+        added = [(code, table) for code, table in coded if table is not None]
+        added_codes = np.array([code for code, _ in added], dtype=np.int64)
+        kept_codes = old_codes[kept]
+        # Both code lists are sorted, so each added bucket's slot is one search away
+        slots = np.searchsorted(kept_codes, added_codes)
+        segment_codes = np.insert(kept_codes, slots, added_codes)
+        lengths = np.insert(old_lengths[kept], slots, np.array([len(table[0]) for _, table in added], dtype=np.int64))
+        offsets = np.zeros(len(segment_codes) + 1, dtype=np.int64)
+        np.cumsum(lengths, out=offsets[1:])
+
+        # Kept buckets keep their relative order, so their breaks are copied in one
+        # masked assignment; the added buckets' breaks fill the remaining positions
+        added_breaks = np.zeros(len(segment_codes), dtype=bool)
+        added_breaks[slots + np.arange(len(slots))] = True
+        added_breaks = np.repeat(added_breaks, lengths)
+        kept_breaks = np.repeat(kept, old_lengths)
+        quantities = np.empty(offsets[-1], dtype=np.int64)
+        prices = np.empty(offsets[-1], dtype=np.float64)
+        quantities[~added_breaks] = np.frombuffer(self.break_codes, dtype=np.int64)[kept_breaks] & self.MAX_QTY
+        prices[~added_breaks] = np.frombuffer(self.prices, dtype=np.float64)[kept_breaks]
+        quantities[added_breaks] = [min(max(int(b), 0), self.MAX_QTY) for _, (breaks, _) in added for b in breaks]
+        prices[added_breaks] = [price for _, (_, table_prices) in added for price in table_prices]
+        break_codes = (np.repeat(np.arange(len(segment_codes), dtype=np.int64), lengths) << 32) | quantities
+
+        products = max(len(self.normal_segment), 1 + max((code >> 34 for code, _ in added), default=-1))
+        normal_segment = np.full(products, -1, dtype=np.int64)
+        normal = ((segment_codes >> 32) & 3) == self.SOURCE_CODES[PriceType.NORMAL]
+        normal_segment[segment_codes[normal] >> 34] = np.flatnonzero(normal)
+
+        for name, values in (("segment_codes", segment_codes), ("offsets", offsets), ("break_codes", break_codes),
+                             ("prices", prices), ("normal_segment", normal_segment)):
+            typed = array(self.ARRAYS[name])
+            typed.frombytes(values.tobytes())
+            setattr(self, name, typed)
+
+    # Helper method: re-read customers' key ids into copies of the customer arrays
+    def _refresh_customers(self, customers: Set[int], customer_tiers: Dict[int, str], customer_groups: Dict[int, str]) -> None:
+        for customer_id in customers:
+            self.customer_rows.setdefault(customer_id, len(self.customer_rows))
+        added = len(self.customer_rows) - len(self.customer_key)
+        self.customer_key = array("q", self.customer_key) + array("q", [-1]) * added
+        self.tier_key = array("q", self.tier_key) + array("q", [-1]) * added
+        self.group_key = array("q", self.group_key) + array("q", [-1]) * added
+        for customer_id in customers:
+            row = self.customer_rows[customer_id]
+            self.customer_key[row] = self.customer_key_ids.get(customer_id, -1)
+            tier = customer_tiers.get(customer_id)
+            group = customer_groups.get(customer_id)
+            self.tier_key[row] = self.name_ids.get(tier, -1) if isinstance(tier, str) else -1
+            self.group_key[row] = self.name_ids.get(group, -1) if isinstance(group, str) else -1
+
+    # Alternate constructor: wrap existing arrays (e.g., views into a mapped snapshot)
+    @classmethod
+    def from_arrays(cls, arrays: Dict[str, Sequence], customer_rows: Dict[int, int]) -> "ColumnarIndex":
+        """
+        Build an index over ready-made arrays without copying them.
+        :param arrays: One entry per ARRAYS name
+        :param customer_rows: customer_id -> row in customer_key/tier_key/group_key
+        """
+        index = cls.__new__(cls)
+        for name in cls.ARRAYS:
+            setattr(index, name, arrays[name])
+        index.customer_rows = customer_rows
+        return index
+
+    # Scalar lookup straight over the arrays
+    def probe(self, product: int, quantity: int, customer_id: int) -> Optional[Tuple[float, PriceType]]:
+        """
+        Return (price, source) of the best applicable price for a product id, or
+        None if no price applies. Same answer as PricingEngine._resolve.
+        """
+        quantity = min(int(quantity), self.MAX_QTY)
+        row = self.customer_rows.get(customer_id)
+        segment_codes, offsets = self.segment_codes, self.offsets
+        for source, code in self.SOURCE_CODES.items():
+            if source == PriceType.NORMAL:
+                if product >= len(self.normal_segment):
+                    return None
+                segment = self.normal_segment[product]
+                if segment < 0:
+                    return None
+            else:
+                if row is None:
+                    continue
+                key = (self.customer_key, self.tier_key, self.group_key)[code][row]
+                if key < 0:
+                    continue
+                wanted = ((product * 4 + code) << 32) | key
+                segment = bisect_left(segment_codes, wanted)
+                if segment == len(segment_codes) or segment_codes[segment] != wanted:
+                    continue
+            # Last break <= quantity inside the bucket
+            start = offsets[segment]
+            position = bisect_right(self.break_codes, (segment << 32) | quantity, start, offsets[segment + 1]) - 1
+            if position >= start:
+                return self.prices[position], source
+        return None
+
+    # Vectorized lookup (requires NumPy)
+    def evaluate(self, products, quantities, customers):
+        """
+        Resolve many rows at once.
+        :param products: int64 array of product ids (negative = skip row)
+        :param quantities: int64 array of positive quantities
+        :param customers: int64 array of customer rows (-1 = unknown customer)
+        :return: (float64 prices, int8 price type codes); unresolved rows get NaN and 0
+        """
+        segment_codes = np.frombuffer(self.segment_codes, dtype=np.int64)
+        offsets = np.frombuffer(self.offsets, dtype=np.int64)
+        break_codes = np.frombuffer(self.break_codes, dtype=np.int64)
+        flat_prices = np.frombuffer(self.prices, dtype=np.float64)
+        normal_segment = np.frombuffer(self.normal_segment, dtype=np.int64)
+
+        # Work in product order: the bucket and break searches then walk their
+        # sorted arrays front to back instead of jumping around them, which is
+        # several times faster for large random batches
+        order = np.argsort(products)
+        products = products[order]
+        quantities = np.clip(quantities, 0, self.MAX_QTY)[order]
+        customers = customers[order]
+
+        prices = np.full(len(products), np.nan)
+        types = np.zeros(len(products), dtype=np.int8)
+        # Each pass only touches rows that higher-priority sources left unresolved
+        pending = np.flatnonzero(products >= 0)
+        done = np.zeros(len(products), dtype=bool)
+        key_columns = (self.customer_key, self.tier_key, self.group_key)
+        for source, priority in PricingEngine.PRIORITY.items():
+            if not len(pending) or not len(segment_codes):
+                break
+            if source == PriceType.NORMAL:
+                # Every product has at most one NORMAL bucket: a direct array read
+                # (products interned after the index was built have no slot)
+                rows = pending
+                row_products = products[rows]
+                inside = row_products < len(normal_segment)
+                segment = normal_segment[np.minimum(row_products, len(normal_segment) - 1)]
+                candidates = inside & (segment >= 0)
+            else:
+                # Only rows whose customer has a key of this source can match;
+                # dropping the rest first keeps sparse sources (CUSTOMER) cheap
+                column = np.frombuffer(key_columns[self.SOURCE_CODES[source]], dtype=np.int64)
+                row_customers = customers[pending]
+                keys = np.full(len(pending), -1, dtype=np.int64)
+                known = row_customers >= 0
+                keys[known] = column[row_customers[known]]
+                keyed = keys >= 0
+                rows, keys = pending[keyed], keys[keyed]
+                codes = ((products[rows] * 4 + self.SOURCE_CODES[source]) << 32) | keys
+                segment = np.minimum(np.searchsorted(segment_codes, codes), len(segment_codes) - 1)
+                candidates = segment_codes[segment] == codes
+            rows, segment = rows[candidates], segment[candidates]
+            # Last break <= quantity inside the bucket, found by one global search
+            position = np.searchsorted(break_codes, (segment << 32) | quantities[rows], side="right") - 1
+            hit = position >= offsets[segment]
+            rows = rows[hit]
+            prices[rows] = flat_prices[position[hit]]
+            types[rows] = priority
+            done[rows] = True
+            pending = pending[~done[pending]]
+
+        # Back to input order
+        result_prices = np.empty_like(prices)
+        result_types = np.empty_like(types)
+        result_prices[order] = prices
+        result_types[order] = types
+        return result_prices, result_types
+
 # Pricing engine class
 class PricingEngine:
     # Priority map for price types: lower number = higher priority
@@ -33,32 +815,134 @@ class PricingEngine:
         PriceType.NORMAL: 4,
     }
 
-    def __init__(self, prices: List[PriceEntry], customer_tiers: Dict[int, str], customer_groups: Dict[int, str]):
+    def __init__(self, prices: Union[List[PriceRecord], "PriceBook"], customer_tiers: Dict[int, str], customer_groups: Dict[int, str],
+                 cache_size: int = 0, instrument: bool = False):
         """
         Initialize the pricing engine.
-        :param prices: List of all PriceEntry objects
+        :param prices: List of all PriceEntry (or FrozenPriceEntry) objects, or a columnar PriceBook
         :param customer_tiers: Mapping of customer_id -> tier name
         :param customer_groups: Mapping of customer_id -> group name
+        :param cache_size: Maximum number of memoized results (0 disables the cache).
+        Tier and group mappings are folded into per-customer profiles here; change
+        them through set_customer_tier and set_customer_group afterwards so the
+        profiles (and, with the cache on, cached results) stay current.
+        :param instrument: Start with instrumentation on (see enable_instrumentation)
         """
         self.prices = prices
         self.customer_tiers = customer_tiers
         self.customer_groups = customer_groups
 
-    # Helper method: normalize product_id
+        # Product codes are interned to dense ints; the index is keyed on those.
+        # A PriceBook's ids are reused as-is and its rows read straight from the
+        # columns, so no PriceEntry objects are created while indexing
+        if isinstance(prices, PriceBook):
+            self._products = ProductCodeInterner(prices.product_codes)
+            rows = prices.id_rows()
+        else:
+            self._products = ProductCodeInterner()
+            intern = self._products.intern
+            rows = ((intern(p.product_id), p.min_qty, p.price, p.source, p.key) for p in prices)
+
+        # Index: (product id, source, key) -> compiled quantity-break table, built
+        # once so a lookup probes at most four buckets with one bisect each
+        buckets: Dict[SegmentKey, List[Tuple[int, float]]] = {}
+        for product_id, min_qty, price, source, key in rows:
+            segment = self._segment_key(product_id, source, key)
+            if segment is not None:
+                buckets.setdefault(segment, []).append((min_qty, price))
+
+        self._segments: Dict[SegmentKey, StepTable] = {
+            segment: self._compile_step_table(breaks) for segment, breaks in buckets.items()
+        }
+        # Raw rows are kept per bucket so incremental updates recompile only the buckets they touch
+        self._buckets = buckets
+
+        # Customer profiles: one dict lookup replaces the tier and group lookups,
+        # and customers without contract prices skip the CUSTOMER probe
+        self._contract_segments: Dict[int, int] = {}   # customer_id -> number of CUSTOMER buckets
+        for _, source, key in self._segments:
+            if source == PriceType.CUSTOMER:
+                self._contract_segments[key] = self._contract_segments.get(key, 0) + 1
+        self._profiles: Dict[int, CustomerProfile] = {}
+        self._customer_probes: Dict[int, Probes] = {}   # customer_id -> probe_order of its profile
+        for customer_id in {*self._contract_segments, *customer_tiers, *customer_groups}:
+            self._refresh_profile(customer_id)
+
+        # NORMAL-only fast path: products without CUSTOMER/TIER/GROUP buckets map
+        # straight to their NORMAL table and skip customer resolution entirely
+        self._special_segments: Dict[int, int] = {}   # product id -> number of non-NORMAL buckets
+        for product, source, _ in self._segments:
+            if source != PriceType.NORMAL:
+                self._special_segments[product] = self._special_segments.get(product, 0) + 1
+        self._normal_only: Dict[int, StepTable] = {
+            product: table for (product, source, _), table in self._segments.items()
+            if source == PriceType.NORMAL and product not in self._special_segments
+        }
+
+        # Columnar copy of the index for batch pricing, built on first use
+        self._columnar: Optional[ColumnarIndex] = None
+
+        # Optional result cache; each product's bands are the union of its buckets' breaks
+        self._cache: Optional[PriceCache] = None
+        if cache_size:
+            self._cache = PriceCache(cache_size)
+            product_breaks: Dict[int, Set[int]] = {}
+            for segment, (breaks, _) in self._segments.items():
+                product_breaks.setdefault(segment[0], set()).update(breaks)
+            self._product_breaks: Dict[int, Tuple[int, ...]] = {
+                product: tuple(sorted(breaks)) for product, breaks in product_breaks.items()
+            }
+
+        # Instrumentation is off unless asked for; see enable_instrumentation
+        self._stats: Optional[EngineStats] = None
+        if instrument:
+            self.enable_instrumentation()
+
+    # Helper method: bucket key for a price row
     @staticmethod
-    def normalize_product_code(product_id: Union[int, str]) -> str:
+    def _segment_key(product_id: int, source: PriceType, key: Optional[Union[int, str]]) -> Optional[SegmentKey]:
         """
-        Convert input product_id to canonical "P###" format.
-        Accepts int (1 -> "P001"), string with/without 'P', or numeric string.
-        Raises PricingError for invalid format.
+        Return the (product id, source, key) bucket a price row belongs to.
+        Rows whose key can never match a lookup (e.g., a CUSTOMER price with a
+        string key) return None; NORMAL rows ignore their key entirely.
         """
-        if isinstance(product_id, int):
-            return f"P{product_id:03d}"  # pad integers with zeros, e.g., 1 -> P001
-        if isinstance(product_id, str) and product_id.upper().startswith("P"):
-            return product_id.upper()    # already in "P###" form
-        if isinstance(product_id, str) and product_id.isdigit():
-            return f"P{int(product_id):03d}"  # numeric string -> P###
-        raise PricingError(f"Invalid product_id: {product_id}")
+        if source == PriceType.CUSTOMER and isinstance(key, int):
+            return (product_id, source, key)
+        if source in (PriceType.TIER, PriceType.GROUP) and isinstance(key, str):
+            return (product_id, source, key)
+        if source == PriceType.NORMAL:
+            return (product_id, source, None)
+        return None
+
+    # Helper method: compile a bucket into a quantity-break step function
+    @staticmethod
+    def _compile_step_table(rows: List[Tuple[int, float]]) -> StepTable:
+        """
+        Compile a bucket's (min_qty, price) rows into (breaks, prices): the
+        distinct min_qty values in ascending order, and for each one the lowest
+        price among all rows with min_qty <= that break. The best price for a
+        quantity is then prices[bisect_right(breaks, quantity) - 1].
+        """
+        breaks: List[int] = []
+        prices: List[float] = []
+        for min_qty, price in sorted(rows, key=lambda row: row[0]):
+            if breaks and breaks[-1] == min_qty:
+                if price < prices[-1]:
+                    prices[-1] = price     # same break: keep the cheaper price
+            elif prices and prices[-1] <= price:
+                continue                   # never cheaper than an earlier break
+            else:
+                breaks.append(min_qty)
+                prices.append(price)
+        return tuple(breaks), tuple(prices)
+
+    # Helper method: normalize product_id
+    normalize_product_code = staticmethod(normalize_product_code)
+
+    # Interned product codes: product id -> canonical code
+    @property
+    def product_codes(self) -> List[str]:
+        return self._products.codes
 
     # Core method: find the best price for a given product, quantity, and customer
     def get_best_price(self, product_id: Union[int, str], quantity: int, customer_id: int) -> dict:
@@ -69,43 +953,671 @@ class PricingEngine:
         if quantity <= 0:
             raise PricingError("Quantity must be greater than zero.")
 
-        # Normalize product_id to P### format
-        prod_code = self.normalize_product_code(product_id)
+        # Resolve product_id to its interned id (None if the catalog lacks it)
+        product = self._products.lookup(product_id)
+        if product is None:
+            raise PricingError(f"No price found for {normalize_product_code(product_id)} with quantity {quantity}.")
+
+        try:
+            found = self._lookup(product, quantity, customer_id)
+        except TypeError:
+            # Unhashable customer_id (e.g. a JSON list): an unknown customer, as in get_best_prices
+            found = self._lookup(product, quantity, _known_customer(customer_id))
+
+        # Raise error if no applicable price
+        if found is None:
+            raise PricingError(f"No price found for {self._products.codes[product]} with quantity {quantity}.")
+
+        # Return result as dict with double-quoted price_type
+        price, source = found
+        return {"product_id": self._products.codes[product], "price": price, "price_type": source.value}
+
+    # Non-raising variant for batch callers: failures come back as error codes
+    def try_get_best_price(self, product_id: Union[int, str], quantity: int, customer_id: int) -> PriceResult:
+        """
+        Same lookup as get_best_price, but returns a PriceResult instead of
+        raising; result.error is ErrorCode.OK on success. Quantities that are not
+        numbers are reported as INVALID_QUANTITY and unhashable customer ids are priced
+        as unknown customers, as in get_best_prices.
+        """
+        product, code = self._products.resolve(product_id)
+        if not _valid_quantity(quantity):
+            return PriceResult(product_id if code is None else code, quantity, NAN, None, ErrorCode.INVALID_QUANTITY)
+        if code is None:
+            return PriceResult(product_id, quantity, NAN, None, ErrorCode.INVALID_PRODUCT)
+        try:
+            found = None if product is None else self._lookup(product, quantity, customer_id)
+        except TypeError:   # unhashable customer_id
+            found = self._lookup(product, quantity, _known_customer(customer_id))
+        if found is None:
+            return PriceResult(code, quantity, NAN, None, ErrorCode.NO_PRICE)
+        return PriceResult(code, quantity, found[0], found[1], ErrorCode.OK)
+
+    # Helper method: resolve an interned product id, through the result cache when enabled
+    def _lookup(self, product: int, quantity: int, customer_id: int) -> Optional[Tuple[float, PriceType]]:
+        # Serve repeat (product, customer, quantity band) lookups from the cache
+        cache = self._cache
+        if cache is None or product in self._normal_only:   # NORMAL-only products are cheaper to resolve than to cache
+            return self._resolve(product, quantity, customer_id)
+        cache_key = self._cache_key(product, quantity, customer_id)
+        found = cache.get(cache_key)
+        if found is None:
+            found = self._resolve(product, quantity, customer_id)
+            if found is not None:
+                cache.put(cache_key, found)
+        return found
+
+    # Helper method: the result cache key; quantities in one band between price breaks share an answer
+    def _cache_key(self, product: int, quantity: int, customer_id: int) -> CacheKey:
+        return product, customer_id, bisect_right(self._product_breaks.get(product, ()), quantity)
 
-        # Get customer tier/group from mappings (if any)
+    # Helper method: probe a product's buckets for the best price
+    def _resolve(self, product: int, quantity: int, customer_id: int) -> Optional[Tuple[float, PriceType]]:
+        """
+        Return (price, source) of the best applicable price for an interned
+        product id, or None if no price applies.
+        """
+        # Products with only NORMAL prices never need the customer's context
+        table = self._normal_only.get(product)
+        if table is not None:
+            breaks, prices = table
+            index = bisect_right(breaks, quantity)
+            return (prices[index - 1], PriceType.NORMAL) if index else None
+        return self._probe(product, quantity, self._probes(customer_id))
+
+    # Helper method: the first probed bucket with an entry applicable to quantity
+    def _probe(self, product: int, quantity: int, probes: Probes) -> Optional[Tuple[float, PriceType]]:
+        """
+        Probe buckets in priority order; the first one with an applicable
+        entry wins, and the lowest price among its applicable entries is best.
+        """
+        segments = self._product_segments(product)
+        for source, key in probes:
+            table = segments.get((product, source, key))
+            if table is not None:
+                breaks, prices = table
+                # Breaks [0, index) have min_qty <= quantity; the last holds the best price
+                index = bisect_right(breaks, quantity)
+                if index:
+                    return prices[index - 1], source
+        return None
+
+    # Helper method: a customer's bucket probes in priority order
+    def _probes(self, customer_id: int) -> Probes:
+        return self._customer_probes.get(customer_id, NORMAL_PROBES)
+
+    # Helper method: the segment dict holding a product's buckets
+    def _product_segments(self, product: int) -> Dict[SegmentKey, StepTable]:
+        return self._segments
+
+    # Helper method: the product's existing buckets among the probes, in the same order
+    def _candidates(self, product: int, probes: Probes) -> List[Tuple[StepTable, PriceType]]:
+        segments = self._product_segments(product)
+        candidates = []
+        for source, key in probes:
+            table = segments.get((product, source, key))
+            if table is not None:
+                candidates.append((table, source))
+        return candidates
+
+    # Helper method: recompute one customer's profile after a mapping or contract change
+    def _refresh_profile(self, customer_id: int) -> None:
         tier = self.customer_tiers.get(customer_id)
         group = self.customer_groups.get(customer_id)
+        profile = (
+            tier if isinstance(tier, str) else None,      # TIER/GROUP buckets only hold str keys
+            group if isinstance(group, str) else None,
+            customer_id in self._contract_segments,
+        )
+        if profile == NO_PROFILE:
+            self._profiles.pop(customer_id, None)
+            self._customer_probes.pop(customer_id, None)
+        else:
+            self._profiles[customer_id] = profile
+            self._customer_probes[customer_id] = probe_order(customer_id, profile)
 
-        # Filter all price entries to find applicable ones
-        applicable = [
-            p for p in self.prices
-            if p.product_id == prod_code                 # Must match product
-            and quantity >= p.min_qty                    # Quantity must meet min_qty
-            and (
-                # Check if price is for this specific customer
-                (p.source == PriceType.CUSTOMER and isinstance(p.key, int) and p.key == customer_id) or
-                # Check if price is for the customer's tier
-                (p.source == PriceType.TIER and isinstance(p.key, str) and p.key == tier) or
-                # Check if price is for the customer's group
-                (p.source == PriceType.GROUP and isinstance(p.key, str) and p.key == group) or
-                # Normal price always applies if nothing else
-                (p.source == PriceType.NORMAL)
-            )
-        ]
+    # Cart pricing: many lines for one customer in a single pass
+    def price_cart(self, customer_id: int, lines: Iterable[Tuple[Union[int, str], int]]) -> dict:
+        """
+        Price (product_id, quantity) lines for one customer without raising, in
+        one pass. The customer's probes are resolved once for the whole cart,
+        and lines are grouped by product: each product's candidate buckets are
+        looked up once however many lines name it. Failures are classified (and
+        their messages formatted) only for failed lines. An unhashable
+        customer_id is priced as an unknown customer.
+        :return: {"customer_id", "lines", "total", "errors"}: one result per line
+            in input order, either {"product_id", "quantity", "price",
+            "price_type", "line_total"} or {"product_id", "quantity", "error"};
+            total is the sum of line_total over priced lines
+        """
+        resolve = self._cart_resolver(_known_customer(customer_id))
+        resolve_code = self._products.resolve
+        names = PRICE_TYPE_VALUES
+        results = []
+        total = 0.0
+        errors = 0
+        for product_id, quantity in lines:
+            product, code = resolve_code(product_id)
+            if product is not None and _valid_quantity(quantity):
+                found = resolve(product, quantity)
+                if found is not None:
+                    price, source = found
+                    try:
+                        line_total = price * quantity
+                        total += line_total
+                    except TypeError:   # e.g. a Decimal quantity does not mix with float prices
+                        line_total = float(price) * float(quantity)
+                        total += line_total
+                    results.append({"product_id": code, "quantity": quantity, "price": price, "price_type": names[source],
+                                    "line_total": line_total})
+                    continue
+            # Failed line: classify it in get_best_price's order
+            errors += 1
+            if not _valid_quantity(quantity):
+                error = ErrorCode.INVALID_QUANTITY
+            elif code is None:
+                error = ErrorCode.INVALID_PRODUCT
+            else:
+                error = ErrorCode.NO_PRICE
+            shown = product_id if code is None else code
+            results.append({"product_id": shown, "quantity": quantity,
+                            "error": PriceResult(shown, quantity, NAN, None, error).message})
+        return {"customer_id": customer_id, "lines": results, "total": total, "errors": errors}
 
-        # Raise error if no applicable price
-        if not applicable:
-            raise PricingError(f"No price found for {prod_code} with quantity {quantity}.")
+    # Helper method: product id, quantity -> (price, source) for one customer's cart
+    def _cart_resolver(self, customer_id: int):
+        """
+        Return a resolve(product, quantity) function for one cart, with the
+        customer's probes read once. It groups the cart's lines by product: a
+        product's candidate buckets are collected once, when a second line names
+        it, and reused for the rest. NORMAL-only products are answered from
+        their one table.
+        """
+        probes = self._probes(customer_id)
+        probe = self._probe
+        candidates_for = self._candidates
+        normal_only = self._normal_only
+        normal = PriceType.NORMAL
+        grouped: Dict[int, Optional[List[Tuple[StepTable, PriceType]]]] = {}   # product -> its candidates (None after one line)
 
-        # Select the best price: prioritize by price source, then lowest price
-        best = min(applicable, key=lambda p: (self.PRIORITY[p.source], p.price))
+        def resolve(product: int, quantity) -> Optional[Tuple[float, PriceType]]:
+            table = normal_only.get(product)
+            if table is not None:
+                index = bisect_right(table[0], quantity)
+                return (table[1][index - 1], normal) if index else None
+            candidates = grouped.get(product)
+            if candidates is None:
+                if product not in grouped:
+                    # First line for the product: probing stops at the first hit,
+                    # cheaper than collecting candidates it may never reuse
+                    grouped[product] = None
+                    return probe(product, quantity, probes)
+                candidates = grouped[product] = candidates_for(product, probes)
+            for (breaks, prices), source in candidates:
+                # Breaks [0, index) have min_qty <= quantity; the last holds the best price
+                index = bisect_right(breaks, quantity)
+                if index:
+                    return prices[index - 1], source
+            return None
 
-        # Return result as dict with double-quoted price_type
-        return {"product_id": best.product_id, "price": best.price, "price_type": best.source.value}
+        return resolve
 
+    # Whole-index hook: an eager engine has nothing left to compile (see pricing_lazy)
+    def compile_all(self) -> None:
+        """Make sure every product's buckets are compiled before reading the whole index."""
 
-# Main program to demonstrate functionality
-def main():
+    # Columnar index: built from the compiled buckets on first use
+    def columnar_index(self) -> ColumnarIndex:
+        """Return the flat array form of the index (rebuilt after mapping changes)."""
+        if self._columnar is None:
+            self._columnar = ColumnarIndex(self._segments, self.customer_tiers, self.customer_groups)
+        return self._columnar
+
+    # Batch method: price many rows without raising
+    def get_best_prices(self, product_ids: Sequence[Union[int, str]], quantities: Sequence[int], customer_ids: Sequence[int]):
+        """
+        Price parallel sequences (or arrays) of rows. Failures are reported per
+        row instead of raised.
+        :return: (prices, price_types, errors) parallel arrays: price as float64
+            (NaN on failure), price type as int8 PRIORITY value (0 on failure),
+            and an int8 ErrorCode. NumPy arrays when NumPy is installed,
+            otherwise array.array.
+        """
+        count = len(product_ids)
+        if len(quantities) != count or len(customer_ids) != count:
+            raise ValueError("product_ids, quantities and customer_ids must have the same length.")
+
+        # Per-row Python work is limited to dict lookups for product and customer
+        # ids, done once per distinct value when NumPy can deduplicate them
+        errors = array("b", bytes(count))
+        products = array("q", bytes(8 * count))
+        distinct, inverse = self._distinct(product_ids)
+        resolved = array("q", bytes(8 * len(distinct)))
+        invalid = array("b", bytes(len(distinct)))
+        lookup = self._products.lookup
+        for position, product_id in enumerate(distinct):
+            try:
+                product = lookup(product_id)
+            except PricingError:
+                invalid[position] = ErrorCode.INVALID_PRODUCT
+                product = None
+            resolved[position] = -1 if product is None else product
+        if inverse is None:
+            products, errors = resolved, invalid
+        else:
+            products = array("q", np.frombuffer(resolved, dtype=np.int64)[inverse].tobytes())
+            errors = array("b", np.frombuffer(invalid, dtype=np.int8)[inverse].tobytes())
+
+        if np is None:
+            return self._get_best_prices_scalar(products, quantities, customer_ids, errors)
+
+        quantities, bad_quantity = self._quantity_array(quantities)
+        errors = np.frombuffer(errors, dtype=np.int8).copy()
+        errors[bad_quantity] = ErrorCode.INVALID_QUANTITY   # checked first, as in get_best_price
+        products = np.frombuffer(products, dtype=np.int64).copy()
+        products[errors != ErrorCode.OK] = -1
+
+        index = self.columnar_index()
+        customer_rows = index.customer_rows
+        distinct, inverse = self._distinct(customer_ids)
+        customers = np.fromiter((self._customer_row(customer_rows, c) for c in distinct), dtype=np.int64, count=len(distinct))
+        if inverse is not None:
+            customers = customers[inverse]
+        prices, types = index.evaluate(products, quantities, customers)
+        errors[(errors == ErrorCode.OK) & (types == 0)] = ErrorCode.NO_PRICE
+        return prices, types, errors
+
+    # Helper method: distinct values of an id column plus the inverse mapping
+    @staticmethod
+    def _distinct(values):
+        """
+        Return (distinct values as Python objects, inverse index array) for an
+        integer id column, or (values, None) when NumPy is missing or the column
+        is not purely integer (mixed str/int ids must be looked up one by one).
+        """
+        if np is None:
+            return values, None
+        try:
+            column = np.asarray(values) if not isinstance(values, np.ndarray) else values
+        except (ValueError, TypeError):   # ragged rows, e.g. a list among the ids
+            return values, None
+        if column.ndim != 1 or column.dtype.kind not in "iu" or not len(column):
+            return values, None
+        # Small non-negative ids (the usual case): count them instead of sorting
+        low, high = int(column.min()), int(column.max())
+        if low >= 0 and high <= 4 * len(column) + 65_536:
+            distinct = np.flatnonzero(np.bincount(column))
+            positions = np.empty(high + 1, dtype=np.int64)
+            positions[distinct] = np.arange(len(distinct))
+            return distinct.tolist(), positions[column]
+        distinct, inverse = np.unique(column, return_inverse=True)
+        return distinct.tolist(), inverse
+
+    # Helper method: a customer's row in the columnar index; ids that cannot be dict keys are unknown customers
+    @staticmethod
+    def _customer_row(customer_rows: Dict[int, int], customer_id) -> int:
+        try:
+            return customer_rows.get(customer_id, -1)
+        except TypeError:
+            return -1
+
+    # Helper method: quantities as clamped whole numbers, plus which of them get_best_price would reject
+    @classmethod
+    def _quantity_array(cls, quantities):
+        """
+        :return: (int64 quantities floored and clamped to [0, MAX_QTY], bool mask
+            of quantities that are not numbers greater than zero)
+        """
+        try:
+            values = np.asarray(quantities)
+        except (ValueError, TypeError):   # ragged rows, e.g. a list among the quantities
+            values = None
+        if values is not None and values.ndim == 1 and values.dtype.kind in "iu":
+            # Whole numbers already: clamp without a float round trip
+            return np.clip(values, 0, ColumnarIndex.MAX_QTY).astype(np.int64), values <= 0
+        if values is None or values.ndim != 1 or values.dtype.kind not in "iuf":
+            # Mixed/object input: only numbers are usable, as in get_best_price.
+            # Read the original items; NumPy may have coerced them all to strings
+            items = quantities.tolist() if isinstance(quantities, np.ndarray) and quantities.ndim == 1 else list(quantities)
+            values = np.zeros(len(items), dtype=np.float64)
+            for position, value in enumerate(items):
+                if _valid_quantity(value):
+                    try:
+                        values[position] = value
+                    except OverflowError:   # an int too large for a float
+                        values[position] = np.inf
+                    except (TypeError, ValueError):   # compares like a number but is not one
+                        pass
+        values = values.astype(np.float64)
+        # Checked before flooring: 0.5 is a valid quantity (NaN is not)
+        invalid = ~(values > 0)
+        # Breaks are whole numbers, so flooring a quantity never changes which apply
+        values = np.floor(np.clip(np.nan_to_num(values, nan=0.0), 0, ColumnarIndex.MAX_QTY))
+        return values.astype(np.int64), invalid
+
+    # Helper method: batch fallback without NumPy, one probe per row
+    def _get_best_prices_scalar(self, products: array, quantities, customer_ids, errors: array):
+        count = len(products)
+        prices = array("d", [float("nan")]) * count
+        types = array("b", bytes(count))
+        for row in range(count):
+            quantity = quantities[row]
+            if not _valid_quantity(quantity):
+                errors[row] = ErrorCode.INVALID_QUANTITY
+                continue
+            if errors[row]:
+                continue
+            if products[row] < 0:
+                found = None
+            else:
+                try:
+                    found = self._resolve(products[row], quantity, customer_ids[row])
+                except TypeError:   # unhashable customer id: an unknown customer, as with NumPy
+                    found = self._resolve(products[row], quantity, None)
+            if found is None:
+                errors[row] = ErrorCode.NO_PRICE
+            else:
+                prices[row] = found[0]
+                types[row] = self.PRIORITY[found[1]]
+        return prices, types, errors
+
+    # Customer mapping updates: change a mapping and drop only that customer's cached results
+    def set_customer_tier(self, customer_id: int, tier: Optional[str]) -> None:
+        """Assign (or with None, remove) a customer's tier."""
+        self._set_mapping(self.customer_tiers, customer_id, tier)
+
+    def set_customer_group(self, customer_id: int, group: Optional[str]) -> None:
+        """Assign (or with None, remove) a customer's group."""
+        self._set_mapping(self.customer_groups, customer_id, group)
+
+    def _set_mapping(self, mapping: Dict[int, str], customer_id: int, value: Optional[str]) -> None:
+        if value is None:
+            mapping.pop(customer_id, None)
+        else:
+            mapping[customer_id] = value
+        self._refresh_profile(customer_id)
+        self._patch_columnar({}, (customer_id,))
+        if self._cache is not None:
+            self._cache.invalidate_customer(customer_id)
+
+    # Incremental price updates: change rows without rebuilding the whole index
+    def upsert_price(self, entry: PriceRecord) -> None:
+        """
+        Add a price row, replacing any existing rows with the same product,
+        source, key and min_qty. Only the row's bucket is recompiled.
+        """
+        self.apply_delta([("upsert", entry)])
+
+    def remove_price(self, entry: PriceRecord) -> None:
+        """Remove the rows with entry's product, source, key and min_qty (entry.price is ignored)."""
+        self.apply_delta([("remove", entry)])
+
+    def apply_delta(self, batch: Iterable[Tuple[str, PriceRecord]]) -> dict:
+        """
+        Apply a batch of ("upsert" | "remove", entry) operations in order, then
+        recompile each touched bucket once and drop cached results for the
+        touched products; a columnar index already built is patched, not rebuilt.
+        As at construction, product ids are taken exactly as given and rows that
+        could never match a lookup are ignored. A malformed entry raises
+        PricingError before any operation is applied.
+        self.prices keeps the rows the engine was built from and is not updated.
+        :return: {"upserted", "removed", "segments"} counts
+        """
+        touched, upserted, removed = self._edit_buckets(batch, lambda product: self._buckets)
+        cache = self._cache
+        for segment in touched:
+            rows = self._buckets[segment]
+            existed = segment in self._segments
+            if rows:
+                self._segments[segment] = table = self._compile_step_table(rows)
+            else:
+                del self._buckets[segment]
+                self._segments.pop(segment, None)
+                table = None
+            if segment[1] == PriceType.CUSTOMER and existed != bool(rows):
+                self._count_contract(segment[2], 1 if rows else -1)
+            if segment[1] != PriceType.NORMAL and existed != bool(rows):
+                self._count_special(segment[0], 1 if rows else -1)
+            else:
+                self._refresh_normal_only(segment[0])
+            if cache is not None:
+                # A superset of the real breaks still gives bands with one answer each
+                product = segment[0]
+                if table is not None:
+                    self._product_breaks[product] = tuple(sorted(set(self._product_breaks.get(product, ())).union(table[0])))
+                cache.invalidate_product(product)
+        if touched:
+            self._patch_columnar({segment: self._segments.get(segment) for segment in touched})
+        return {"upserted": upserted, "removed": removed, "segments": len(touched)}
+
+    # Helper method: carry a built columnar index over an edit instead of flattening everything again
+    def _patch_columnar(self, changes: Dict[SegmentKey, Optional[StepTable]], customers: Iterable[int] = ()) -> None:
+        if self._columnar is None:
+            return
+        if np is None:
+            # Without NumPy only snapshots read the index; rebuild it when one is taken
+            self._columnar = None
+            return
+        self._columnar = self._columnar.patched(changes, self.customer_tiers, self.customer_groups, customers)
+
+    # Helper method: track how many CUSTOMER buckets a customer has
+    def _count_contract(self, customer_id: int, change: int) -> None:
+        count = self._contract_segments.get(customer_id, 0) + change
+        if count:
+            self._contract_segments[customer_id] = count
+        else:
+            del self._contract_segments[customer_id]
+        self._refresh_profile(customer_id)
+
+    # Helper method: track how many non-NORMAL buckets a product has
+    def _count_special(self, product: int, change: int) -> None:
+        count = self._special_segments.get(product, 0) + change
+        if count:
+            self._special_segments[product] = count
+        else:
+            del self._special_segments[product]
+        self._refresh_normal_only(product)
+
+    # Helper method: add or drop a product's NORMAL-only fast-path entry
+    def _refresh_normal_only(self, product: int) -> None:
+        table = self._segments.get((product, PriceType.NORMAL, None))
+        if table is not None and product not in self._special_segments:
+            self._normal_only[product] = table
+        else:
+            self._normal_only.pop(product, None)
+
+    # Helper method: apply delta operations to raw bucket rows
+    def _edit_buckets(self, batch: Iterable[Tuple[str, PriceRecord]], buckets_for) -> Tuple[Set[SegmentKey], int, int]:
+        """
+        Edit raw rows for a batch of delta operations without compiling anything.
+        Row lists are replaced, never modified in place, so callers may share
+        them with other indexes (see pricing_versioned).
+        :param buckets_for: product id -> the writable bucket dict holding its rows
+        :return: (touched segments, rows upserted, rows removed)
+        """
+        # Validate the whole batch before editing anything, so a bad entry leaves no partial update
+        operations = []
+        for operation, entry in batch:
+            if operation not in ("upsert", "remove"):
+                raise ValueError(f"Unknown price delta operation: {operation!r}")
+            operations.append((operation, self._delta_row(entry)))
+
+        touched: Set[SegmentKey] = set()
+        upserted = removed = 0
+        for operation, (code, source, key, min_qty, price) in operations:
+            # Product codes are matched exactly, as at construction (so "p001" is not "P001")
+            if operation == "upsert":
+                product = self._products.intern(code)
+                segment = self._segment_key(product, source, key)
+                if segment is None:
+                    continue
+                buckets = buckets_for(product)
+                rows = [row for row in buckets.get(segment, ()) if row[0] != min_qty]
+                rows.append((min_qty, price))
+                buckets[segment] = rows
+                upserted += 1
+            else:
+                product = self._products.find(code)
+                segment = None if product is None else self._segment_key(product, source, key)
+                if segment is None:
+                    continue
+                buckets = buckets_for(product)
+                rows = buckets.get(segment, ())
+                kept = [row for row in rows if row[0] != min_qty]
+                if len(kept) == len(rows):
+                    continue
+                buckets[segment] = kept
+                removed += len(rows) - len(kept)
+            touched.add(segment)
+        return touched, upserted, removed
+
+    # Helper method: a delta entry's (product code, source, key, min_qty, price), checked so it can be applied
+    @staticmethod
+    def _delta_row(entry: PriceRecord) -> Tuple[Union[int, str], PriceType, Optional[Union[int, str]], int, float]:
+        try:
+            code, source, key = entry.product_id, entry.source, entry.key
+            min_qty, price = entry.min_qty, entry.price
+            hash(code), hash(key)
+        except (AttributeError, TypeError):
+            raise PricingError(f"Invalid price delta entry: {entry!r}")
+        if not isinstance(min_qty, int) or isinstance(min_qty, bool) or not isinstance(price, (int, float)):
+            raise PricingError(f"Invalid price delta entry: {entry!r}")
+        return code, source, key, min_qty, price
+
+    # Instrumentation: per-stage timers swapped in only while enabled
+    def enable_instrumentation(self) -> None:
+        """
+        Route get_best_price through an instrumented copy that records per-stage
+        timings, error counts and candidate-set sizes (see EngineStats). The
+        plain method is replaced on this instance only, so an engine that never
+        enables instrumentation runs no instrumentation code at all.
+        """
+        if self._stats is None:
+            self._stats = EngineStats()
+        self.get_best_price = self._instrumented_get_best_price
+
+    def disable_instrumentation(self) -> None:
+        """Go back to the plain get_best_price; stats() keeps the last counters."""
+        self.__dict__.pop("get_best_price", None)
+
+    def stats(self) -> Optional[dict]:
+        """Snapshot of the instrumentation counters, or None if it was never enabled."""
+        return self._stats.snapshot() if self._stats is not None else None
+
+    def reset_stats(self) -> None:
+        """Zero the instrumentation counters."""
+        if self._stats is not None:
+            self._stats = EngineStats()
+
+    # Instrumented twin of get_best_price: same results and errors, timed stage by stage
+    def _instrumented_get_best_price(self, product_id: Union[int, str], quantity: int, customer_id: int) -> dict:
+        stats = self._stats
+        stages = stats.stages
+        stats.calls += 1
+        start = perf_counter_ns()
+        customer_id = _known_customer(customer_id)
+        try:
+            if quantity <= 0:
+                stats.errors["INVALID_QUANTITY"] += 1
+                raise PricingError("Quantity must be greater than zero.")
+            try:
+                product = self._products.lookup(product_id)
+            except PricingError:
+                stats.errors["INVALID_PRODUCT"] += 1
+                raise
+            now = perf_counter_ns()
+            stages["normalize"].record(now - start)
+            if product is None:
+                stats.errors["NO_PRICE"] += 1
+                raise PricingError(f"No price found for {normalize_product_code(product_id)} with quantity {quantity}.")
+
+            found = cache_key = None
+            cache = self._cache
+            if cache is not None and product not in self._normal_only:
+                mark = now
+                cache_key = self._cache_key(product, quantity, customer_id)
+                found = cache.get(cache_key)
+                now = perf_counter_ns()
+                stages["cache"].record(now - mark)
+                stats.cache_hits += found is not None
+            if found is None:
+                found = self._instrumented_resolve(stats, product, quantity, customer_id, now)
+                if found is not None and cache_key is not None:
+                    cache.put(cache_key, found)
+            if found is None:
+                stats.errors["NO_PRICE"] += 1
+                raise PricingError(f"No price found for {self._products.codes[product]} with quantity {quantity}.")
+            price, source = found
+            return {"product_id": self._products.codes[product], "price": price, "price_type": source.value}
+        finally:
+            stages["total"].record(perf_counter_ns() - start)
+
+    # Helper method: _resolve split into timed customer / candidates / select stages
+    def _instrumented_resolve(self, stats: EngineStats, product: int, quantity: int, customer_id: int,
+                              start: int) -> Optional[Tuple[float, PriceType]]:
+        stages = stats.stages
+        table = self._normal_only.get(product)
+        if table is not None:
+            stats.normal_only += 1
+            candidates = [(table, PriceType.NORMAL)]
+            mark = perf_counter_ns()
+            stages["candidates"].record(mark - start)
+        else:
+            probes = self._probes(customer_id)
+            mark = perf_counter_ns()
+            stages["customer"].record(mark - start)
+            candidates = self._candidates(product, probes)
+            now = perf_counter_ns()
+            stages["candidates"].record(now - mark)
+            mark = now
+        stats.candidate_sizes[len(candidates)] += 1
+
+        found = None
+        for (breaks, prices), source in candidates:
+            index = bisect_right(breaks, quantity)
+            if index:
+                found = prices[index - 1], source
+                break
+        stages["select"].record(perf_counter_ns() - mark)
+        return found
+
+    # Cache statistics: None when the cache is disabled
+    def cache_info(self) -> Optional[dict]:
+        """Return the result cache's size and hit/miss/eviction/invalidation counters."""
+        return self._cache.info() if self._cache is not None else None
+
+# Helper function: the one definition of the CUSTOMER -> TIER -> GROUP -> NORMAL
+# probe order, leaving out the probes a customer with this profile can never hit
+def probe_order(customer_id: int, profile: CustomerProfile) -> Probes:
+    tier, group, has_contract = profile
+    probes = []
+    if has_contract:
+        probes.append((PriceType.CUSTOMER, customer_id))  # Price for this specific customer
+    if tier is not None:
+        probes.append((PriceType.TIER, tier))             # Price for the customer's tier
+    if group is not None:
+        probes.append((PriceType.GROUP, group))           # Price for the customer's group
+    probes.append((PriceType.NORMAL, None))               # Normal price always applies if nothing else
+    return tuple(probes)
+
+# Helper function: whether get_best_price accepts a quantity. Anything that
+# compares greater than zero does (int, float, Decimal, NumPy scalars, ...)
+def _valid_quantity(quantity) -> bool:
+    try:
+        return bool(quantity > 0)
+    except (TypeError, ValueError):   # not comparable with 0, or an array with no single truth value
+        return False
+
+# Helper function: customer_id itself if it can key the customer dicts, else None (an unknown customer)
+def _known_customer(customer_id):
+    try:
+        hash(customer_id)
+    except TypeError:
+        return None
+    return customer_id
+
+# Sample engine used by the demo and as the default for the command line
+def build_sample_engine() -> PricingEngine:
     # Define sample prices
     prices = [
         PriceEntry(product_id="P002", min_qty=1, price=5, source=PriceType.CUSTOMER, key=6),   # Customer-specific
@@ -120,8 +1632,10 @@ def main():
     customer_groups = {6: "GRP1"}               # customer_id -> group
 
     # Initialize the pricing engine
-    engine = PricingEngine(prices, customer_tiers, customer_groups)
+    return PricingEngine(prices, customer_tiers, customer_groups)
 
+# Main program to demonstrate functionality
+def demo(engine: PricingEngine):
     # Input data: product, quantity, customer
     input_data = [
         {"product_id": 1, "quantity": 4, "customer_id": 2},  # Should pick TIER price
@@ -130,23 +1644,102 @@ def main():
         {"product_id": 5, "quantity": 2, "customer_id": 6},  # No price → error
     ]
 
-    # Process each input row
+    # Process each input row; failed rows carry the normalized product_id + error message
     outputs = []
     for row in input_data:
-        try:
-            # Try to get best price
-            result = engine.get_best_price(row["product_id"], row["quantity"], row["customer_id"])
-            outputs.append(result)
-        except PricingError as e:
-            # On error, return normalized product_id + error message
-            outputs.append({
-                "product_id": PricingEngine.normalize_product_code(row["product_id"]),
-                "error": str(e)
-            })
+        result = engine.try_get_best_price(row["product_id"], row["quantity"], row["customer_id"])
+        outputs.append(result.to_dict())
 
     # Print all results
     print(outputs)
 
-# Entry point
+# Command line helpers: engine source options shared by the pricing CLI and server
+def add_engine_arguments(parser) -> None:
+    """Add --prices/--price-format/--customers/--snapshot to an argparse parser."""
+    from pricing_io import PRICE_FORMATS
+
+    parser.add_argument("--prices", metavar="PATH", help="Price file to load (CSV or JSONL) instead of the sample prices")
+    parser.add_argument("--price-format", choices=PRICE_FORMATS, help="Price file format (default: from the file extension, else csv)")
+    parser.add_argument("--customers", metavar="PATH", help="customer_id,tier,group CSV to use with --prices")
+    parser.add_argument("--snapshot", metavar="PATH", help="Serve from a memory-mapped engine snapshot instead of a price file")
+
+
+def load_engine(args) -> PricingEngine:
+    """Build the engine named by add_engine_arguments options (the sample engine by default)."""
+    import sys
+    from pricing_io import load_customers, load_price_book
+
+    if args.snapshot:
+        from pricing_snapshot import SnapshotEngine
+        return SnapshotEngine.open(args.snapshot)
+    if args.prices:
+        book, stats = load_price_book(args.prices, args.price_format)
+        customer_tiers, customer_groups = load_customers(args.customers) if args.customers else ({}, {})
+        print(f"Loaded {stats['rows']} prices in {stats['seconds']:.2f}s ({stats['rows_per_second']:,.0f} rows/s)", file=sys.stderr)
+        return PricingEngine(book, customer_tiers, customer_groups)
+    return build_sample_engine()
+
+# Command line: demo by default, or stream an order file through the engine
+def main(argv: Optional[List[str]] = None):
+    import argparse
+    import sys
+    from pricing_io import ORDER_FORMATS
+    from pricing_profile import PROFILERS
+
+    parser = argparse.ArgumentParser(description="Best-price calculator")
+    add_engine_arguments(parser)
+    parser.add_argument("--save-snapshot", metavar="PATH", help="Write the loaded engine to a snapshot file")
+    parser.add_argument("--orders", metavar="PATH", help="Order lines to price (CSV or JSONL; '-' for stdin)")
+    parser.add_argument("--format", choices=ORDER_FORMATS, help="Order file format (default: from the file extension, else jsonl)")
+    parser.add_argument("--output", metavar="PATH", default="-", help="Where to write JSON-lines results (default: stdout)")
+    parser.add_argument("--chunk-size", type=int, default=10_000, help="Order lines priced per batch")
+    parser.add_argument("--profile", metavar="PATH", help="Profile the run: write collapsed stacks (flame graph input) to PATH "
+                                                          "and a hot-function table to stderr")
+    parser.add_argument("--profiler", choices=PROFILERS, default="sample", help="Stack sampler or cProfile (default: sample)")
+    parser.add_argument("--profile-interval", type=float, default=0.001, help="Seconds between stack samples")
+    parser.add_argument("--profile-top", type=int, default=20, help="Rows in the hot-function table")
+    args = parser.parse_args(argv)
+
+    if args.profile is None:
+        _run(args)
+        return
+
+    from functools import partial
+    from pricing_profile import format_hot_functions, profile_call, write_collapsed
+    _, report = profile_call(partial(_run, args), args.profiler, args.profile_interval)
+    lines = write_collapsed(report.stacks, args.profile)
+    print(format_hot_functions(report, args.profile_top), file=sys.stderr)
+    print(f"Wrote {lines:,} collapsed stacks to {args.profile}", file=sys.stderr)
+
+
+# Helper: load the engine and price the orders (or run the demo) as main's options say
+def _run(args) -> None:
+    import sys
+    from pricing_io import guess_format, open_stream, stream_orders
+
+    engine = load_engine(args)
+    if args.save_snapshot:
+        from pricing_snapshot import save_snapshot
+        size = save_snapshot(engine, args.save_snapshot)
+        print(f"Wrote {size:,} byte snapshot to {args.save_snapshot}", file=sys.stderr)
+    if args.orders is None:
+        demo(engine)
+        return
+
+    fmt = args.format or guess_format(args.orders)
+    source = open_stream(args.orders, "r")
+    sink = open_stream(args.output, "w")
+    try:
+        summary = stream_orders(engine, source, sink, fmt, args.chunk_size)
+    finally:
+        if source is not sys.stdin:
+            source.close()
+        if sink is not sys.stdout:
+            sink.close()
+    print(f"Priced {summary['rows']} rows ({summary['errors']} errors) in {summary['seconds']:.2f}s", file=sys.stderr)
+
+# Entry point: run main() from the importable module so that pricing_io and
+# this script share one set of classes (not a second copy under __main__)
 if __name__ == "__main__":
-    main()
+    import pricing_engine
+    pricing_engine.main()
@@ -0,0 +1,476 @@
+"""
+File input/output for the pricing engine: bulk price-book and customer
+loading, and streaming order-line pricing.
+"""
+import csv
+import json
+import sys
+import time
+from itertools import islice, repeat
+from typing import IO, Dict, Iterable, Iterator, List, Optional, Tuple, Union
+
+from pricing_engine import ErrorCode, PriceBook, PriceType, PricingEngine, PricingError, normalize_product_code
+
+# Price type code (PricingEngine.PRIORITY value) -> price_type string
+PRICE_TYPE_NAMES = {code: source.value for source, code in PricingEngine.PRIORITY.items()}
+
+# Supported order-line and price-file formats
+ORDER_FORMATS = ("csv", "jsonl")
+PRICE_FORMATS = ("csv", "jsonl")
+
+# Price file columns, in PriceEntry field order
+PRICE_COLUMNS = ("product_id", "min_qty", "price", "source", "key")
+
+# Source name -> index into PriceBook.SOURCES
+SOURCE_IDS = {source.value: index for index, source in enumerate(PriceBook.SOURCES)}
+
+# Bad rows quoted in a load error message
+MAX_REPORTED_ERRORS = 5
+
+# Range of the PriceBook's int32 columns
+INT32_MIN, INT32_MAX = -(1 << 31), (1 << 31) - 1
+
+
+# Bulk loader: price file -> PriceBook columns
+def load_price_book(source: Union[str, IO[str]], fmt: Optional[str] = None, chunk_size: int = 65_536) -> Tuple[PriceBook, dict]:
+    """
+    Parse a price file straight into a columnar PriceBook, one chunk of rows at
+    a time, without building PriceEntry objects. Columns are product_id,
+    min_qty, price, source and key (CSV needs a header row; JSONL uses the same
+    names). Every chunk is validated column-wise: source must name a PriceType,
+    CUSTOMER keys must be integers, TIER/GROUP keys non-empty strings; NORMAL
+    keys are ignored. Product ids are normalized to "P###".
+    :param source: Path, or an open text stream
+    :param fmt: "csv" or "jsonl" (default: from the file extension, else csv)
+    :return: (price book, {"rows", "seconds", "rows_per_second"} load stats)
+    Raises PricingError listing the first bad data rows (1-based) if any row is invalid.
+    """
+    start = time.perf_counter()
+    if isinstance(source, str):
+        fmt = fmt or guess_format(source, default="csv")
+        with open(source, newline="", encoding="utf-8") as stream:
+            book = _load_price_chunks(_price_chunks(stream, fmt, chunk_size))
+    else:
+        book = _load_price_chunks(_price_chunks(source, fmt or "csv", chunk_size))
+    seconds = time.perf_counter() - start
+    return book, {"rows": len(book), "seconds": seconds, "rows_per_second": len(book) / seconds if seconds else 0.0}
+
+
+# Helper: price file -> chunks of columns (product_ids, min_qtys, prices, sources, keys)
+def _price_chunks(stream: IO[str], fmt: str, chunk_size: int) -> Iterator[tuple]:
+    if fmt == "csv":
+        header_line = stream.readline()
+        if not header_line:
+            return
+        header = next(csv.reader([header_line]))
+        try:
+            positions = [header.index(column) for column in PRICE_COLUMNS[:4]]
+        except ValueError:
+            raise PricingError(f"Price file header must include {', '.join(PRICE_COLUMNS[:4])}.")
+        positions.append(header.index("key") if "key" in header else len(header))
+        if header == list(PRICE_COLUMNS):
+            yield from _standard_csv_chunks(stream, chunk_size)
+        else:
+            rows = (_pick(row, positions) for row in csv.reader(stream) if row)
+            yield from _transpose_chunks(rows, chunk_size)
+    elif fmt == "jsonl":
+        rows = (_json_price_row(text) for text in stream if text.strip())
+        yield from _transpose_chunks(rows, chunk_size)
+    else:
+        raise ValueError(f"Unsupported price format: {fmt}")
+
+
+# A JSONL price line that is not a JSON object; travels in the product_id column
+class _UnreadableRow:
+    __slots__ = ("reason",)
+
+    def __init__(self, reason: str):
+        self.reason = reason
+
+
+# Helper: JSONL price line -> row tuple (an _UnreadableRow in place of the product_id if unreadable)
+def _json_price_row(text: str) -> tuple:
+    try:
+        record = json.loads(text)
+    except ValueError as e:
+        return (_UnreadableRow(f"invalid JSON ({e})"), None, None, None, None)
+    if not isinstance(record, dict):
+        return (_UnreadableRow(f"expected a JSON object, got {type(record).__name__}"), None, None, None, None)
+    return tuple(map(record.get, PRICE_COLUMNS))
+
+
+# Helper: standard-layout CSV split into columns with string slicing
+def _standard_csv_chunks(stream: IO[str], chunk_size: int) -> Iterator[tuple]:
+    """
+    Read blocks of whole lines and, when a block has no quoting, split every
+    field at once and take each column as a stride-5 slice, so no per-row
+    list is ever built. Blocks with quotes or ragged rows go through csv.
+    """
+    width = len(PRICE_COLUMNS)
+    while True:
+        lines = stream.readlines(chunk_size * 32)
+        if not lines:
+            return
+        text = "".join(lines)
+        if '"' not in text:
+            records = text.replace("\r", "").split("\n")
+            records = [record for record in records if record] if "" in records else records
+            # Every record must have exactly width fields: a total count alone would
+            # let a short row and a long row cancel out and shift the columns
+            if set(map(str.count, records, repeat(","))) == {width - 1}:
+                fields = ",".join(records).split(",")
+                yield tuple(fields[column::width] for column in range(width))
+                continue
+        rows = (_pick(row, range(width)) for row in csv.reader(lines) if row)
+        yield from _transpose_chunks(rows, len(lines))
+
+
+# Helper: row -> fields at positions, padding missing cells with ""
+def _pick(row: List[str], positions) -> tuple:
+    return tuple(row[p] if p < len(row) else "" for p in positions)
+
+
+# Helper: rows -> chunks of columns
+def _transpose_chunks(rows: Iterator[tuple], chunk_size: int) -> Iterator[tuple]:
+    while True:
+        chunk = list(islice(rows, chunk_size))
+        if not chunk:
+            return
+        yield tuple(zip(*chunk))
+
+
+# Helper: validate and append price rows chunk by chunk
+def _load_price_chunks(chunks: Iterator[tuple]) -> PriceBook:
+    """
+    Per-row Python work is limited to list comprehensions over dict lookups:
+    product ids, sources and keys are parsed and validated once per distinct
+    value, and numeric columns are converted with map().
+    """
+    book = PriceBook()
+    product_map: Dict[object, Optional[int]] = {}   # raw product_id -> product id (None = invalid)
+    source_map: Dict[object, Optional[int]] = {}    # raw source -> SOURCES index (None = unknown)
+    key_maps: Dict[Optional[int], Dict[object, Optional[int]]] = {   # source index -> raw key -> key id (None = invalid)
+        source: {} for source in (*range(len(PriceBook.SOURCES)), None)
+    }
+    errors: List[str] = []
+    error_count = 0
+    first_row = 1
+    for product_ids, min_qtys, prices, sources, keys in chunks:
+        problems: Dict[int, str] = {}
+
+        source_ids = _map_column(sources, source_map, lambda value: SOURCE_IDS.get(_source_name(value)))
+        if None in source_ids:
+            problems.update((row, f"unknown source {sources[row]!r}") for row, value in enumerate(source_ids) if value is None)
+
+        products = _map_column(product_ids, product_map, lambda value: _intern_product(book, value))
+        unreadable: Dict[int, str] = {}
+        if None in products:
+            problems.update((row, f"invalid product_id {product_ids[row]!r}") for row, value in enumerate(products) if value is None)
+            unreadable = {row: value.reason for row, value in enumerate(product_ids) if type(value) is _UnreadableRow}
+
+        try:
+            key_ids = [key_maps[source][key] for source, key in zip(source_ids, keys)]
+        except KeyError:
+            for source, key in zip(source_ids, keys):
+                if key not in key_maps[source]:
+                    parsed = _parse_key(source, key)
+                    key_maps[source][key] = None if parsed is _BAD_KEY else book.intern_key(parsed)
+            key_ids = [key_maps[source][key] for source, key in zip(source_ids, keys)]
+        if None in key_ids:
+            problems.update((row, f"invalid key {keys[row]!r} for {sources[row]}")
+                            for row, value in enumerate(key_ids) if value is None and source_ids[row] is not None)
+
+        min_qtys, qty_problems = _convert_quantities(min_qtys, "min_qty")
+        prices, price_problems = _convert_column(prices, float, "price")
+        problems.update(qty_problems)
+        problems.update(price_problems)
+        problems.update(unreadable)   # one message for a line that is not a price row at all
+
+        if problems:
+            error_count += len(problems)
+            for row in sorted(problems)[:MAX_REPORTED_ERRORS - len(errors)]:
+                errors.append(f"row {first_row + row}: {problems[row]}")
+        elif not error_count:   # after an error, keep scanning only to count bad rows
+            book.extend_columns(products, min_qtys, prices, source_ids, key_ids)
+        first_row += len(product_ids)
+    if error_count:
+        raise PricingError(f"{error_count} invalid price rows; " + "; ".join(errors))
+    return book
+
+
+# Helper: [mapping[value] for value in values], resolving values not seen before
+def _map_column(values: tuple, mapping: dict, resolve) -> list:
+    try:
+        return [mapping[value] for value in values]
+    except KeyError:
+        for value in values:
+            if value not in mapping:
+                mapping[value] = resolve(value)
+        return [mapping[value] for value in values]
+
+
+# Helper: raw product_id -> interned product id, or None if invalid
+def _intern_product(book: PriceBook, product_id) -> Optional[int]:
+    try:
+        return book.products.intern(normalize_product_code(product_id))
+    except PricingError:
+        return None
+
+
+# Sentinel for a key that does not fit its source
+_BAD_KEY = object()
+
+
+# Helper: source cell -> PriceType name ("normal" and PriceType.NORMAL are accepted)
+def _source_name(value) -> str:
+    if isinstance(value, PriceType):
+        return value.value
+    return str(value).strip().upper()
+
+
+# Helper: convert a whole column with map(), re-checking row by row only on failure
+def _convert_column(values: tuple, convert, name: str) -> Tuple[list, Dict[int, str]]:
+    """Return (converted values, {row: problem}); values are only valid without problems."""
+    try:
+        return list(map(convert, values)), {}
+    except (TypeError, ValueError):
+        problems = {}
+        for row, value in enumerate(values):
+            try:
+                convert(value)
+            except (TypeError, ValueError):
+                problems[row] = f"invalid {name} {value!r}"
+        return [], problems
+
+
+# Helper: _convert_column for int32 columns; bools, fractions (2.7) and out-of-range values are problems
+def _convert_quantities(values: tuple, name: str) -> Tuple[list, Dict[int, str]]:
+    if set(map(type, values)) <= {str, int}:   # CSV text or JSON integers: int() accepts exactly the valid cells
+        converted, problems = _convert_column(values, int, name)
+        if problems or not converted or (INT32_MIN <= min(converted) and max(converted) <= INT32_MAX):
+            return converted, problems
+    problems = {}
+    converted = []
+    for row, value in enumerate(values):
+        number = _whole_number(value)
+        if number is None or not INT32_MIN <= number <= INT32_MAX:
+            problems[row] = f"invalid {name} {value!r}"
+        else:
+            converted.append(number)
+    return ([] if problems else converted), problems
+
+
+# Helper: cell -> int if it holds a whole number (not a bool), else None
+def _whole_number(value) -> Optional[int]:
+    if isinstance(value, bool):
+        return None
+    if isinstance(value, int):
+        return value
+    if isinstance(value, float):
+        return int(value) if value.is_integer() else None
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+# Helper: key cell -> int customer id, tier/group name, or None for NORMAL
+def _parse_key(source: Optional[int], key):
+    source = PriceBook.SOURCES[source] if source is not None else None
+    if source == PriceType.CUSTOMER:
+        if isinstance(key, bool):
+            return _BAD_KEY
+        if isinstance(key, int):
+            return key
+        try:
+            return int(key)
+        except (TypeError, ValueError):
+            return _BAD_KEY
+    if source in (PriceType.TIER, PriceType.GROUP):
+        if key is None or isinstance(key, bool) or str(key).strip() == "":
+            return _BAD_KEY
+        return str(key).strip()
+    return None
+
+
+# Loader: customer tier/group mappings
+def load_customers(source: Union[str, IO[str]]) -> Tuple[Dict[int, str], Dict[int, str]]:
+    """
+    Read a customer_id,tier,group CSV (blank tier/group = none).
+    :return: (customer_tiers, customer_groups)
+    """
+    if isinstance(source, str):
+        with open(source, newline="", encoding="utf-8") as stream:
+            return load_customers(stream)
+    tiers: Dict[int, str] = {}
+    groups: Dict[int, str] = {}
+    for line, row in enumerate(csv.DictReader(source), start=2):
+        try:
+            customer_id = int(row["customer_id"])
+        except (KeyError, TypeError, ValueError):
+            raise PricingError(f"line {line}: invalid customer_id {row.get('customer_id')!r}")
+        if (row.get("tier") or "").strip():
+            tiers[customer_id] = row["tier"].strip()
+        if (row.get("group") or "").strip():
+            groups[customer_id] = row["group"].strip()
+    return tiers, groups
+
+
+# Reader: order lines from CSV (with a header row) or JSON lines
+def read_order_lines(stream: IO[str], fmt: str) -> Iterator[dict]:
+    """
+    Lazily yield {"product_id", "quantity", "customer_id"} dicts from a text stream.
+    CSV values arrive as strings; quantity and customer_id are converted to int
+    where possible and left as-is otherwise (the engine then reports the row).
+    """
+    if fmt == "csv":
+        for row in csv.DictReader(stream):
+            yield {
+                "product_id": row.get("product_id"),
+                "quantity": _to_number(row.get("quantity")),
+                "customer_id": _to_number(row.get("customer_id")),
+            }
+    elif fmt == "jsonl":
+        for number, line in enumerate(stream, start=1):
+            if line.strip():
+                yield parse_order_line(line, number)
+    else:
+        raise ValueError(f"Unsupported order format: {fmt}")
+
+
+# An order line that could not be read; priced as its own error result
+class UnreadableLine(dict):
+    """{"product_id": None, "error": message} for a JSON line that is not a JSON object."""
+
+    def __init__(self, number: int, reason: str):
+        super().__init__(product_id=None, error=f"line {number}: {reason}")
+
+
+def parse_order_line(line: Union[str, bytes], number: int) -> dict:
+    """
+    Parse one JSON order line. Invalid JSON or a value other than an object
+    gives an UnreadableLine instead of raising, so one bad line does not stop
+    a run.
+    :param number: 1-based line number, used in the error message
+    """
+    try:
+        row = json.loads(line)
+    except ValueError as e:   # includes JSONDecodeError and undecodable bytes
+        return UnreadableLine(number, f"invalid JSON ({e})")
+    if not isinstance(row, dict):
+        return UnreadableLine(number, "order line must be a JSON object")
+    return row
+
+
+# Helper: CSV cell -> int/float when numeric
+def _to_number(value: Optional[str]):
+    if value is None:
+        return None
+    try:
+        return int(value)
+    except ValueError:
+        try:
+            return float(value)
+        except ValueError:
+            return value
+
+
+# Pricing: fixed-size chunks through the batch API
+def price_order_lines(engine: PricingEngine, rows: Iterable[dict], chunk_size: int = 10_000) -> Iterator[dict]:
+    """
+    Price order lines chunk by chunk, yielding one result dict per input row in
+    input order. Successes look like get_best_price results; failures are
+    {"product_id": normalized code (raw value if invalid), "error": message}.
+    UnreadableLine rows are passed through as their own error results.
+    Only one chunk is held in memory at a time.
+    """
+    codes: Dict[object, str] = {}   # raw product_id -> normalized code, for output
+    rows = iter(rows)
+    while True:
+        chunk: List[dict] = list(islice(rows, chunk_size))
+        if not chunk:
+            return
+        product_ids = [row.get("product_id") for row in chunk]
+        quantities = [row.get("quantity") for row in chunk]
+        customer_ids = [row.get("customer_id") for row in chunk]
+        prices, types, errors = engine.get_best_prices(product_ids, quantities, customer_ids)
+
+        # Plain lists and int constants: per-element reads of NumPy arrays and
+        # comparisons with IntEnum members would dominate the loop
+        prices, types, errors = prices.tolist(), types.tolist(), errors.tolist()
+        invalid_quantity, invalid_product, no_price = int(ErrorCode.INVALID_QUANTITY), int(ErrorCode.INVALID_PRODUCT), int(ErrorCode.NO_PRICE)
+        names = PRICE_TYPE_NAMES
+        for position, product_id in enumerate(product_ids):
+            row = chunk[position]
+            if type(row) is UnreadableLine:
+                yield dict(row)
+                continue
+            error = errors[position]
+            code = None if error == invalid_product else _product_code(codes, product_id)
+            if error == invalid_quantity:
+                yield {"product_id": product_id if code is None else code, "error": "Quantity must be greater than zero."}
+            elif code is None:
+                yield {"product_id": product_id, "error": f"Invalid product_id: {product_id}"}
+            elif error == no_price:
+                yield {"product_id": code, "error": f"No price found for {code} with quantity {quantities[position]}."}
+            else:
+                yield {"product_id": code, "price": prices[position], "price_type": names[types[position]]}
+
+
+# Helper: memoized normalize_product_code that returns None for invalid ids
+def _product_code(codes: Dict[object, str], product_id) -> Optional[str]:
+    try:
+        return codes[product_id]
+    except KeyError:
+        pass
+    except TypeError:   # unhashable input
+        return None
+    try:
+        code = normalize_product_code(product_id)
+    except PricingError:
+        return None
+    if type(product_id) in (int, str) and len(codes) < 100_000:
+        codes[product_id] = code
+    return code
+
+
+# Entry point: stream a whole file (or stdin) to JSON lines
+def stream_orders(engine: PricingEngine, source: IO[str], sink: IO[str], fmt: str = "jsonl", chunk_size: int = 10_000) -> dict:
+    """
+    Price every order line in source and write one JSON result per line to sink,
+    flushing after each chunk. Memory use is bounded by chunk_size, not input size.
+    :return: {"rows", "errors", "seconds", "rows_per_second"} summary
+    """
+    start = time.perf_counter()
+    count = failed = 0
+    lines: List[str] = []
+    for result in price_order_lines(engine, read_order_lines(source, fmt), chunk_size):
+        count += 1
+        failed += "error" in result
+        lines.append(json.dumps(result))
+        if len(lines) >= chunk_size:
+            sink.write("\n".join(lines) + "\n")
+            sink.flush()
+            lines.clear()
+    if lines:
+        sink.write("\n".join(lines) + "\n")
+        sink.flush()
+    seconds = time.perf_counter() - start
+    return {"rows": count, "errors": failed, "seconds": seconds, "rows_per_second": count / seconds if seconds else 0.0}
+
+
+# Helper: open a path for streaming, with "-" meaning stdin/stdout
+def open_stream(path: str, mode: str = "r") -> IO[str]:
+    if path == "-":
+        return sys.stdin if "r" in mode else sys.stdout
+    return open(path, mode, newline="" if "r" in mode else None, encoding="utf-8")
+
+
+# Helper: order format from a file extension
+def guess_format(path: str, default: str = "jsonl") -> str:
+    lowered = path.lower()
+    if lowered.endswith(".csv"):
+        return "csv"
+    if lowered.endswith((".jsonl", ".ndjson")):
+        return "jsonl"
+    return default
@@ -0,0 +1,225 @@
+"""
+Lazily indexed pricing engine for fast startup.
+
+PricingEngine compiles every product's buckets up front, which dominates
+startup for big price books. LazyPricingEngine only groups the raw rows by
+product at construction (one dict append per row for PriceEntry lists, a
+counting sort of the product column for a PriceBook) and compiles a product's
+buckets the first time a lookup touches it. Compiling fills the same
+structures an eager engine builds, so once a product is compiled it is
+priced by exactly the same code.
+
+Compilation happens once per product, under a lock: a thread that finds a
+product still pending waits for (or does) its compilation, and a product
+leaves the pending set only after all of its buckets are in place, so
+concurrent readers never see a half-built product.
+"""
+import threading
+from array import array
+from collections import Counter
+from itertools import accumulate, islice
+from operator import le
+from typing import Dict, Iterator, List, Optional, Set, Tuple, Union
+
+from pricing_engine import (PriceBook, PriceCache, PriceRecord, PriceType, PricingEngine, ProductCodeInterner, SegmentKey,
+                            StepTable, np)
+
+
+class LazyPricingEngine(PricingEngine):
+    """
+    PricingEngine that compiles each product's buckets on first use. Lookups,
+    batch pricing, carts, updates and instrumentation behave as on
+    PricingEngine. Whole-index operations (the columnar index, snapshots,
+    EngineVersion.from_engine) call compile_all() first. The price rows given
+    to the constructor must not change while products are still pending.
+    """
+
+    def __init__(self, prices: Union[List[PriceRecord], PriceBook], customer_tiers: Dict[int, str],
+                 customer_groups: Dict[int, str], cache_size: int = 0, instrument: bool = False):
+        """
+        Group the price rows by product without compiling anything.
+        Parameters are as for PricingEngine.
+        """
+        self.prices = prices
+        self.customer_tiers = customer_tiers
+        self.customer_groups = customer_groups
+
+        # Pending rows per product: a PriceBook's rows are found through a
+        # counting sort of its product column; PriceEntry lists are grouped by
+        # product_id, which is interned exactly as given, as in PricingEngine
+        self._entries: Optional[Dict[int, List[PriceRecord]]] = None
+        self._book_offsets: Optional[array] = None   # product id -> first position in _book_order
+        self._book_order: Optional[array] = None     # row indexes grouped by product id (None: identity)
+        if isinstance(prices, PriceBook):
+            self._products = ProductCodeInterner(prices.product_codes)
+            self._book_offsets, self._book_order = _group_rows(prices.product, len(self._products))
+            self._pending: Set[int] = set(range(len(self._products.codes)))
+        else:
+            self._products = ProductCodeInterner()
+            by_product_id: Dict[object, List[PriceRecord]] = {}
+            for entry in prices:
+                rows = by_product_id.get(entry.product_id)
+                if rows is None:
+                    by_product_id[entry.product_id] = [entry]
+                else:
+                    rows.append(entry)
+            intern = self._products.intern
+            self._entries = {intern(product_id): rows for product_id, rows in by_product_id.items()}
+            self._pending = set(self._entries)
+        self._lock = threading.Lock()
+
+        # The index starts empty and is filled product by product (see _compile)
+        self._segments: Dict[SegmentKey, StepTable] = {}
+        self._buckets: Dict[SegmentKey, List[Tuple[int, float]]] = {}
+        self._contract_segments: Dict[int, int] = {}
+        self._profiles = {}
+        self._customer_probes = {}
+        for customer_id in {*customer_tiers, *customer_groups}:
+            self._refresh_profile(customer_id)
+        self._special_segments: Dict[int, int] = {}
+        self._normal_only: Dict[int, StepTable] = {}
+        self._columnar = None
+        self._cache: Optional[PriceCache] = None
+        if cache_size:
+            self._cache = PriceCache(cache_size)
+            self._product_breaks: Dict[int, Tuple[int, ...]] = {}
+        self._stats = None
+        if instrument:
+            self.enable_instrumentation()
+
+    @property
+    def pending(self) -> int:
+        """Number of products not compiled yet."""
+        return len(self._pending)
+
+    def compile_all(self) -> None:
+        """Compile every pending product."""
+        for product in list(self._pending):
+            self._compile(product)
+
+    # Helper method: compile one product's buckets into the shared index, once
+    def _compile(self, product: int) -> None:
+        with self._lock:
+            if product not in self._pending:
+                return   # compiled by another thread while this one waited
+            buckets: Dict[SegmentKey, List[Tuple[int, float]]] = {}
+            for min_qty, price, source, key in self._product_rows(product):
+                segment = self._segment_key(product, source, key)
+                if segment is not None:
+                    buckets.setdefault(segment, []).append((min_qty, price))
+            breaks: Set[int] = set()
+            for segment, rows in buckets.items():
+                self._segments[segment] = table = self._compile_step_table(rows)
+                self._buckets[segment] = rows
+                breaks.update(table[0])
+                if segment[1] == PriceType.CUSTOMER:
+                    self._count_contract(segment[2], 1)
+                if segment[1] != PriceType.NORMAL:
+                    self._count_special(product, 1)
+            self._refresh_normal_only(product)
+            if self._cache is not None:
+                self._product_breaks[product] = tuple(sorted(breaks))
+            if self._entries is not None:
+                self._entries.pop(product, None)
+            # Last step: from here on readers treat the product as compiled
+            self._pending.discard(product)
+            if not self._pending:
+                self._entries = self._book_offsets = self._book_order = None
+
+    # Helper method: a pending product's raw (min_qty, price, source, key) rows
+    def _product_rows(self, product: int) -> Iterator[Tuple[int, float, PriceType, Optional[Union[int, str]]]]:
+        if self._entries is not None:
+            for entry in self._entries.get(product, ()):
+                yield entry.min_qty, entry.price, entry.source, entry.key
+            return
+        book = self.prices
+        start, stop = self._book_offsets[product], self._book_offsets[product + 1]
+        rows = range(start, stop) if self._book_order is None else self._book_order[start:stop]
+        sources, key_values = book.SOURCES, book.keys
+        for row in rows:
+            yield book.min_qty[row], book.price[row], sources[book.source[row]], key_values[book.key[row]]
+
+    # Entry points that read a product's buckets compile it first
+    def _lookup(self, product: int, quantity: int, customer_id: int) -> Optional[Tuple[float, PriceType]]:
+        if product in self._pending:
+            self._compile(product)
+        if self._cache is None:
+            return super()._resolve(product, quantity, customer_id)   # skip the second pending check
+        return super()._lookup(product, quantity, customer_id)
+
+    def _resolve(self, product: int, quantity: int, customer_id: int) -> Optional[Tuple[float, PriceType]]:
+        if product in self._pending:
+            self._compile(product)
+        return super()._resolve(product, quantity, customer_id)
+
+    def _cart_resolver(self, customer_id: int):
+        # Compiling a product can change the customer's profile, so it is read per line
+        return lambda product, quantity: self._resolve(product, quantity, customer_id)
+
+    def _instrumented_get_best_price(self, product_id: Union[int, str], quantity: int, customer_id: int) -> dict:
+        product, _ = self._products.resolve(product_id)
+        if product is not None and product in self._pending:
+            self._compile(product)
+        return super()._instrumented_get_best_price(product_id, quantity, customer_id)
+
+    def columnar_index(self):
+        self.compile_all()
+        return super().columnar_index()
+
+    def apply_delta(self, batch) -> dict:
+        # Compile touched products from their original rows before editing them
+        batch = list(batch)
+        for _, entry in batch:
+            try:
+                product = self._products.find(entry.product_id)   # exact code, as in _edit_buckets
+            except (AttributeError, TypeError):
+                continue   # malformed; rejected by apply_delta below
+            if product is not None and product in self._pending:
+                self._compile(product)
+        return super().apply_delta(batch)
+
+    # Pickling (e.g. for ParallelPricer workers): pending products stay pending
+    def __getstate__(self) -> dict:
+        state = self.__dict__.copy()
+        del state["_lock"]
+        return state
+
+    def __setstate__(self, state: dict) -> None:
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+
+# Helper function: counting sort of a product id column
+def _group_rows(column: array, products: int) -> Tuple[array, Optional[array]]:
+    """
+    Group row indexes by dense product id in O(rows + products) time. Product
+    p's rows are order[offsets[p]:offsets[p + 1]]; order is None when the rows
+    are already grouped in id order (the usual case: ids are assigned in order
+    of first appearance), and the rows are range(offsets[p], offsets[p + 1]).
+    :param column: Product id of each row, each in range(products)
+    :return: (offsets, order) as int64 arrays
+    """
+    if np is not None:
+        values = np.frombuffer(column, dtype=np.dtype(column.typecode)) if len(column) else np.zeros(0, np.int64)
+        offsets = array("q", [0])
+        offsets.frombytes(np.cumsum(np.bincount(values, minlength=products), dtype=np.int64).tobytes())
+        if len(values) < 2 or bool(np.all(values[1:] >= values[:-1])):
+            return offsets, None
+        order = array("q")
+        order.frombytes(np.argsort(values, kind="stable").astype(np.int64).tobytes())
+        return offsets, order
+
+    counts = array("q", bytes(8 * (products + 1)))
+    for product, count in Counter(column).items():
+        counts[product + 1] = count
+    offsets = array("q", accumulate(counts))
+    if all(map(le, column, islice(column, 1, None))):
+        return offsets, None
+    # Stable placement: each row goes to its product's next free position
+    cursor = offsets.tolist()
+    order = array("q", bytes(8 * len(column)))
+    for row, product in enumerate(column):
+        position = cursor[product]
+        order[position] = row
+        cursor[product] = position + 1
+    return offsets, order
@@ -0,0 +1,111 @@
+"""
+Load generator for pricing_server.
+
+Each client thread holds one keep-alive HTTP connection and sends requests
+back to back, either single lookups (GET /price) or batches (POST /prices).
+Prints throughput and latency percentiles, e.g.:
+    python pricing_server.py --snapshot engine.snap --port 8080 &
+    python pricing_loadgen.py --url http://127.0.0.1:8080 --clients 8 --requests 20000
+"""
+import argparse
+import http.client
+import json
+import random
+import threading
+import time
+from typing import List
+from urllib.parse import urlencode, urlsplit
+
+
+def run_client(url: str, requests: List[dict], batch_size: int, latencies: List[float]) -> int:
+    """
+    Send requests over one connection, appending each request's latency in
+    seconds to latencies.
+    :return: Number of priced order lines
+    """
+    parts = urlsplit(url)
+    connection = http.client.HTTPConnection(parts.hostname, parts.port or 80)
+    priced = 0
+    try:
+        if batch_size <= 1:
+            for row in requests:
+                start = time.perf_counter()
+                connection.request("GET", "/price?" + urlencode(row))
+                connection.getresponse().read()
+                latencies.append(time.perf_counter() - start)
+                priced += 1
+        else:
+            for offset in range(0, len(requests), batch_size):
+                batch = requests[offset:offset + batch_size]
+                body = "".join(json.dumps(row) + "\n" for row in batch).encode()
+                start = time.perf_counter()
+                connection.request("POST", "/prices", body, {"Content-Type": "application/x-ndjson"})
+                priced += connection.getresponse().read().count(b"\n")
+                latencies.append(time.perf_counter() - start)
+    finally:
+        connection.close()
+    return priced
+
+
+def percentile(values: List[float], fraction: float) -> float:
+    """Nearest-rank percentile of already sorted values."""
+    if not values:
+        return 0.0
+    return values[min(len(values) - 1, int(fraction * len(values)))]
+
+
+def generate_load(url: str, clients: int, requests: int, batch_size: int = 1, products: int = 1000,
+                  customers: int = 10_000, seed: int = 0) -> dict:
+    """
+    Run `clients` threads sending `requests` order lines in total.
+    :return: {"lines", "requests", "seconds", "lines_per_second", "p50_ms", "p99_ms", "max_ms"}
+    """
+    rng = random.Random(seed)
+    rows = [{"product_id": rng.randint(1, products), "quantity": rng.choice((1, 5, 10, 50, 100)),
+             "customer_id": rng.randint(1, customers)} for _ in range(requests)]
+    share = -(-requests // clients)
+    latencies: List[List[float]] = [[] for _ in range(clients)]
+    counts = [0] * clients
+
+    def client(number: int) -> None:
+        counts[number] = run_client(url, rows[number * share:(number + 1) * share], batch_size, latencies[number])
+
+    threads = [threading.Thread(target=client, args=(number,)) for number in range(clients)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    seconds = time.perf_counter() - start
+
+    merged = sorted(latency for client_latencies in latencies for latency in client_latencies)
+    return {
+        "lines": sum(counts),
+        "requests": len(merged),
+        "seconds": seconds,
+        "lines_per_second": sum(counts) / seconds if seconds else 0.0,
+        "p50_ms": percentile(merged, 0.50) * 1e3,
+        "p99_ms": percentile(merged, 0.99) * 1e3,
+        "max_ms": merged[-1] * 1e3 if merged else 0.0,
+    }
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description="Load generator for pricing_server")
+    parser.add_argument("--url", default="http://127.0.0.1:8080")
+    parser.add_argument("--clients", type=int, default=4, help="Concurrent keep-alive connections")
+    parser.add_argument("--requests", type=int, default=10_000, help="Order lines to send in total")
+    parser.add_argument("--batch-size", type=int, default=1, help="Order lines per POST /prices (1 = GET /price)")
+    parser.add_argument("--products", type=int, default=1000, help="Product ids are drawn from 1..N")
+    parser.add_argument("--customers", type=int, default=10_000, help="Customer ids are drawn from 1..N")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    stats = generate_load(args.url, args.clients, args.requests, args.batch_size, args.products, args.customers, args.seed)
+    print(f"{stats['lines']:,} lines in {stats['requests']:,} requests over {stats['seconds']:.2f}s "
+          f"({stats['lines_per_second']:,.0f} lines/s)")
+    print(f"latency ms: p50 {stats['p50_ms']:.2f}, p99 {stats['p99_ms']:.2f}, max {stats['max_ms']:.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+"""
+Process-pool batch pricing.
+
+Rows are split into chunks and priced across worker processes that each load
+the engine once, in their pool initializer: from a pickled PricingEngine, by
+memory-mapping a snapshot file, or by attaching to a shared-memory publisher.
+Results come back in input order with the same shape as pricing_io's
+streaming output.
+"""
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+from typing import Iterable, Iterator, List, Optional
+
+from pricing_engine import PricingEngine
+from pricing_io import price_order_lines
+
+# Engine of the current worker process, set once by _init_worker
+_worker_engine = None
+
+
+# Worker initializer: load the engine once per process
+def _init_worker(engine: Optional[PricingEngine], snapshot: Optional[str], shared: Optional[str]) -> None:
+    global _worker_engine
+    if snapshot is not None:
+        from pricing_snapshot import SnapshotEngine
+        _worker_engine = SnapshotEngine.open(snapshot)
+    elif shared is not None:
+        from pricing_shared import SharedEngine
+        _worker_engine = SharedEngine(shared)
+    else:
+        _worker_engine = engine
+
+
+# Worker task: price one chunk of order lines
+def _price_chunk(rows: List[dict]) -> List[dict]:
+    return list(price_order_lines(_worker_engine, rows, chunk_size=len(rows) or 1))
+
+
+class ParallelPricer:
+    """
+    A pool of pricing worker processes. Exactly one engine source is given:
+    an engine (pickled to each worker), a snapshot file path, or the name of a
+    SharedEnginePublisher. The pool is started once and reused by price().
+    """
+
+    def __init__(self, engine: Optional[PricingEngine] = None, *, snapshot: Optional[str] = None,
+                 shared: Optional[str] = None, workers: Optional[int] = None, chunk_size: int = 10_000):
+        """
+        Start the worker pool.
+        :param engine: Engine to copy into each worker
+        :param snapshot: Snapshot file each worker memory-maps instead
+        :param shared: Shared-memory publisher name each worker attaches to instead
+        :param workers: Number of processes (default: CPU count)
+        :param chunk_size: Rows per task
+        """
+        if sum(source is not None for source in (engine, snapshot, shared)) != 1:
+            raise ValueError("Give exactly one of engine, snapshot or shared.")
+        self.workers = workers or os.cpu_count() or 1
+        self.chunk_size = chunk_size
+        self._pool = ProcessPoolExecutor(self.workers, initializer=_init_worker, initargs=(engine, snapshot, shared))
+
+    def price(self, rows: Iterable[dict]) -> Iterator[dict]:
+        """
+        Price order lines ({"product_id", "quantity", "customer_id"} dicts),
+        yielding results in input order. At most two chunks per worker are in
+        flight, so arbitrarily long inputs are streamed, not buffered.
+        """
+        rows = iter(rows)
+        pending = deque()
+        while True:
+            while len(pending) < 2 * self.workers:
+                chunk = list(islice(rows, self.chunk_size))
+                if not chunk:
+                    break
+                pending.append(self._pool.submit(_price_chunk, chunk))
+            if not pending:
+                return
+            yield from pending.popleft().result()
+
+    def close(self) -> None:
+        """Shut the worker pool down."""
+        self._pool.shutdown()
+
+    def __enter__(self) -> "ParallelPricer":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+
+def price_rows_parallel(rows: Iterable[dict], engine: Optional[PricingEngine] = None, *, snapshot: Optional[str] = None,
+                        shared: Optional[str] = None, workers: Optional[int] = None, chunk_size: int = 10_000) -> List[dict]:
+    """One-shot helper: start a pool, price every row in order, and stop the pool."""
+    with ParallelPricer(engine, snapshot=snapshot, shared=shared, workers=workers, chunk_size=chunk_size) as pricer:
+        return list(pricer.price(rows))
@@ -0,0 +1,210 @@
+"""
+Profiling support for the pricing command line (pricing_engine --profile).
+
+Runs a callable under one of two profilers and reports where the time went:
+
+  sample    a background thread snapshots the calling thread's stack every
+            `interval` seconds (sys._current_frames). Low overhead, wall-clock
+            weights; stack counts are exact call paths. The profiled thread
+            only hands over the GIL at calls and loop back-edges, so time in
+            short calls into C code is charged to the Python frame making them.
+  cprofile  the standard library's deterministic profiler. Exact call counts
+            and CPU times; stacks are rebuilt from its caller/callee edges,
+            splitting each function's time across callers in proportion.
+
+Both give a collapsed-stack profile ("root;caller;callee weight" per line, the
+input format of flamegraph.pl, speedscope and inferno) and a hot-function
+table sorted by self time.
+"""
+import cProfile
+import os
+import pstats
+import sys
+import threading
+import time
+from collections import Counter
+from typing import Callable, Dict, List, NamedTuple, Optional, Tuple
+
+PROFILERS = ("sample", "cprofile")
+
+# pstats function key: (filename, first line, function name)
+FunctionKey = Tuple[str, int, str]
+
+
+# One row of the hot-function table
+class HotFunction(NamedTuple):
+    function: str
+    self_seconds: float
+    total_seconds: float
+    calls: Optional[int] = None   # only the cprofile mode counts calls
+
+
+# Collapsed-stack profile plus its hot-function table
+class ProfileReport(NamedTuple):
+    profiler: str
+    seconds: float
+    stacks: Dict[str, int]    # "root;...;leaf" -> samples (sample) or microseconds (cprofile)
+    functions: List[HotFunction]
+
+
+# Helper: frame label used in stacks and tables, e.g. "_resolve (pricing_engine.py:874)"
+def _label(filename: str, line: int, name: str) -> str:
+    if filename == "~":   # built-in function or method
+        return name.replace(";", ":")
+    return f"{name} ({os.path.basename(filename)}:{line})".replace(";", ":")
+
+
+class StackSampler:
+    """
+    Samples one thread's Python stack from a background thread. Stacks are
+    cut at `stop_code`'s frame (exclusive) so the profiler's own frames and
+    everything above the profiled call are left out.
+    """
+
+    def __init__(self, thread_id: int, interval: float = 0.001, stop_code=None):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stop_code = stop_code
+        self.stacks: Counter = Counter()
+        self.samples = 0
+        self._stopped = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        self._thread = threading.Thread(target=self._run, name="stack-sampler", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stopped.set()
+        self._thread.join()
+
+    def _run(self) -> None:
+        labels: Dict[object, str] = {}
+        while not self._stopped.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            path = []
+            while frame is not None and frame.f_code is not self.stop_code:
+                code = frame.f_code
+                label = labels.get(code)
+                if label is None:
+                    label = labels[code] = _label(code.co_filename, code.co_firstlineno, code.co_name)
+                path.append(label)
+                frame = frame.f_back
+            if path:
+                self.stacks[";".join(reversed(path))] += 1
+                self.samples += 1
+
+
+def profile_call(func: Callable[[], object], profiler: str = "sample", interval: float = 0.001) -> Tuple[object, ProfileReport]:
+    """
+    Call func() under a profiler.
+    :param profiler: "sample" or "cprofile"
+    :param interval: Seconds between stack samples (sample mode)
+    :return: (func's return value, ProfileReport)
+    """
+    if profiler == "sample":
+        return _sampled_call(func, interval)
+    if profiler == "cprofile":
+        return _cprofiled_call(func)
+    raise ValueError(f"Unknown profiler {profiler!r}; expected one of {', '.join(PROFILERS)}.")
+
+
+def _sampled_call(func: Callable[[], object], interval: float) -> Tuple[object, ProfileReport]:
+    def target():
+        return func()
+
+    sampler = StackSampler(threading.get_ident(), interval, target.__code__)
+    # The sampler only runs when it gets the GIL; switch at least as often as it samples
+    switch_interval = sys.getswitchinterval()
+    sys.setswitchinterval(min(switch_interval, interval))
+    sampler.start()
+    start = time.perf_counter()
+    try:
+        result = target()
+    finally:
+        seconds = time.perf_counter() - start
+        sampler.stop()
+        sys.setswitchinterval(switch_interval)
+
+    stacks = dict(sampler.stacks)
+    per_sample = seconds / sampler.samples if sampler.samples else 0.0
+    own: Counter = Counter()
+    total: Counter = Counter()
+    for stack, count in stacks.items():
+        frames = stack.split(";")
+        own[frames[-1]] += count
+        for frame in set(frames):
+            total[frame] += count
+    functions = [HotFunction(function, own[function] * per_sample, count * per_sample)
+                 for function, count in total.items()]
+    functions.sort(key=lambda row: (-row.self_seconds, -row.total_seconds))
+    return result, ProfileReport("sample", seconds, stacks, functions)
+
+
+def _cprofiled_call(func: Callable[[], object]) -> Tuple[object, ProfileReport]:
+    profile = cProfile.Profile()
+    start = time.perf_counter()
+    try:
+        result = profile.runcall(func)
+    finally:
+        seconds = time.perf_counter() - start
+    stats = pstats.Stats(profile).stats
+    stats.pop(("~", 0, "<method 'disable' of '_lsprof.Profiler' objects>"), None)   # the profiler stopping itself
+    functions = [HotFunction(_label(*key), tt, ct, nc) for key, (cc, nc, tt, ct, callers) in stats.items()]
+    functions.sort(key=lambda row: (-row.self_seconds, -row.total_seconds))
+    return result, ProfileReport("cprofile", seconds, collapse_call_graph(stats), functions)
+
+
+def collapse_call_graph(stats: dict, min_seconds: float = 1e-6, max_depth: int = 64) -> Dict[str, int]:
+    """
+    Turn pstats data into collapsed stacks weighted in microseconds. cProfile
+    only records caller -> callee edges, so a function's time is split across
+    its callers in proportion to the time each edge accounts for; paths
+    re-entering a function already on the stack (recursion) are cut there.
+    :param min_seconds: Drop paths carrying less time than this
+    """
+    callees: Dict[FunctionKey, List[Tuple[FunctionKey, float]]] = {}
+    for callee, (_, _, _, _, callers) in stats.items():
+        for caller, edge in callers.items():
+            callees.setdefault(caller, []).append((callee, edge[3]))
+    stacks: Counter = Counter()
+
+    def walk(key: FunctionKey, seconds: float, path: List[str], on_stack: set) -> None:
+        _, _, tt, ct, _ = stats[key]
+        share = seconds / ct if ct else 0.0
+        path.append(_label(*key))
+        own = tt * share
+        if own >= min_seconds:
+            stacks[";".join(path)] += round(own * 1e6)
+        if len(path) < max_depth:
+            on_stack.add(key)
+            for callee, edge_seconds in callees.get(key, ()):
+                if callee not in on_stack and callee in stats and edge_seconds * share >= min_seconds:
+                    walk(callee, edge_seconds * share, path, on_stack)
+            on_stack.discard(key)
+        path.pop()
+
+    for key, (_, _, _, ct, callers) in stats.items():
+        if not callers:
+            walk(key, ct, [], set())
+    return {stack: weight for stack, weight in stacks.items() if weight > 0}
+
+
+def write_collapsed(stacks: Dict[str, int], path: str) -> int:
+    """Write stacks in collapsed format, heaviest first. :return: Lines written"""
+    with open(path, "w", encoding="utf-8") as stream:
+        for stack, weight in sorted(stacks.items(), key=lambda item: -item[1]):
+            stream.write(f"{stack} {weight}\n")
+    return len(stacks)
+
+
+def format_hot_functions(report: ProfileReport, top: int = 20) -> str:
+    """Top functions by self time as a fixed-width table."""
+    lines = [f"{report.profiler} profile, {report.seconds:.3f}s wall"
+             + (f", {sum(report.stacks.values()):,} samples" if report.profiler == "sample" else ""),
+             f"{'self s':>9} {'self %':>7} {'total s':>9} {'calls':>10}  function"]
+    for row in report.functions[:top]:
+        percent = 100 * row.self_seconds / report.seconds if report.seconds else 0.0
+        calls = "" if row.calls is None else f"{row.calls:,}"
+        lines.append(f"{row.self_seconds:9.4f} {percent:6.1f}% {row.total_seconds:9.4f} {calls:>10}  {row.function}")
+    return "\n".join(lines)
@@ -0,0 +1,229 @@
+"""
+Local HTTP/JSON pricing server.
+
+Built on the standard library's ThreadingHTTPServer speaking HTTP/1.1, so
+clients can keep connections alive across requests. One engine, loaded once
+at startup (a price file, a memory-mapped snapshot or the sample prices), is
+shared by every connection:
+
+  GET  /price?product_id=1&quantity=4&customer_id=2   one lookup
+  POST /price     {"product_id", "quantity", "customer_id"}   one lookup
+  POST /prices    JSON-lines order lines -> JSON-lines results, streamed back
+                  with chunked transfer encoding as each chunk is priced
+  GET  /health    {"status": "ok"}
+
+Single lookups answer 200 with the get_best_price result, or 400 (invalid
+quantity or product_id) / 404 (no price) with {"product_id", "error"}. Batch
+results have the same shape as pricing_io's streaming output.
+
+Connections are served on separate threads; give the server an engine without
+a result cache (the default), a SnapshotEngine or a VersionedEngine.
+"""
+import json
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from itertools import islice
+from typing import Iterator, Optional
+from urllib.parse import parse_qs, urlsplit
+
+from pricing_engine import ErrorCode, PricingEngine
+from pricing_io import UnreadableLine, _to_number, parse_order_line, price_order_lines
+
+# HTTP status per lookup outcome
+STATUS = {
+    ErrorCode.OK: 200,
+    ErrorCode.INVALID_QUANTITY: 400,
+    ErrorCode.INVALID_PRODUCT: 400,
+    ErrorCode.NO_PRICE: 404,
+}
+
+# Largest single-lookup request body accepted, in bytes
+MAX_BODY = 64 * 1024
+
+# JSON values accepted as a customer_id; lists and objects are rejected
+CUSTOMER_ID_TYPES = (int, float, str, type(None))
+INVALID_CUSTOMER = "customer_id must be a number or a string."
+
+
+class PricingRequestHandler(BaseHTTPRequestHandler):
+    """Routes requests to the server's engine; one instance per connection."""
+    protocol_version = "HTTP/1.1"   # keep-alive by default
+    disable_nagle_algorithm = True  # headers and body go out as separate writes; don't stall on delayed ACKs
+    server_version = "PricingServer/1.0"
+
+    def do_GET(self) -> None:
+        url = urlsplit(self.path)
+        if url.path == "/health":
+            self._send_json(200, {"status": "ok"})
+        elif url.path == "/price":
+            query = {name: values[-1] for name, values in parse_qs(url.query).items()}
+            self._price_one(query.get("product_id"), _to_number(query.get("quantity")), _to_number(query.get("customer_id")))
+        else:
+            self._send_json(404, {"error": f"Unknown path: {url.path}"})
+
+    def do_POST(self) -> None:
+        path = urlsplit(self.path).path
+        length = self._content_length()
+        if length is None:
+            return
+        if path == "/price":
+            if length > MAX_BODY:
+                self._discard(length)
+                self._send_json(413, {"error": "Request body too large."})
+                return
+            try:
+                row = json.loads(self.rfile.read(length))
+                if not isinstance(row, dict):
+                    raise ValueError
+            except ValueError:
+                self._send_json(400, {"error": "Body must be a JSON object."})
+                return
+            self._price_one(row.get("product_id"), row.get("quantity"), row.get("customer_id"))
+        elif path == "/prices":
+            self._price_many(length)
+        else:
+            self._discard(length)
+            self._send_json(404, {"error": f"Unknown path: {path}"})
+
+    # Single lookup through the non-raising API
+    def _price_one(self, product_id, quantity, customer_id) -> None:
+        if not isinstance(customer_id, CUSTOMER_ID_TYPES):
+            self._send_json(400, {"product_id": product_id, "error": INVALID_CUSTOMER})
+            return
+        result = self.server.engine.try_get_best_price(product_id, quantity, customer_id)
+        self._send_json(STATUS[result.error], result.to_dict())
+
+    # Batch lookup: read, price and write one chunk at a time
+    def _price_many(self, length: int) -> None:
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        lines = _body_lines(self.rfile, length)
+        # Unreadable lines come back in place as {"product_id": null, "error": "line N: ..."}
+        rows = (_order_row(line, number) for number, line in enumerate(lines, start=1) if line.strip())
+        results = price_order_lines(self.server.engine, rows, self.server.chunk_size)
+        try:
+            while True:
+                chunk = list(islice(results, self.server.chunk_size))
+                if not chunk:
+                    break
+                self._write_chunk("".join(json.dumps(result) + "\n" for result in chunk).encode())
+        except Exception as e:
+            # The 200 is already sent: report the failure in-band, end the body
+            # cleanly and drop the connection
+            self.log_error("Batch pricing failed: %r", e)
+            self._write_chunk((json.dumps({"error": "Pricing failed; the remaining lines were not priced."}) + "\n").encode())
+            self.close_connection = True
+            for _ in lines:   # consume the rest of the body
+                pass
+        self._write_chunk(b"")
+
+    # Helper method: a Content-Length-delimited body's length, or None after replying 411/400
+    def _content_length(self) -> Optional[int]:
+        if "chunked" in self.headers.get("Transfer-Encoding", ""):
+            self.close_connection = True
+            self._send_json(411, {"error": "Chunked request bodies are not supported; send Content-Length."})
+            return None
+        try:
+            length = int(self.headers.get("Content-Length", 0))
+            if length < 0:
+                raise ValueError
+        except ValueError:
+            self.close_connection = True
+            self._send_json(400, {"error": "Invalid Content-Length."})
+            return None
+        return length
+
+    def _discard(self, length: int) -> None:
+        while length > 0:
+            data = self.rfile.read(min(length, 65_536))
+            if not data:
+                return
+            length -= len(data)
+
+    def _send_json(self, status: int, body: dict) -> None:
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _write_chunk(self, data: bytes) -> None:
+        self.wfile.write(b"%x\r\n%s\r\n" % (len(data), data))
+
+    def log_message(self, format: str, *args) -> None:
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+
+class PricingServer(ThreadingHTTPServer):
+    """
+    HTTP server bound to one engine. Port 0 picks a free port; read the bound
+    address from server_address. Run with serve_forever() and stop with
+    shutdown() from another thread.
+    """
+    daemon_threads = True
+
+    def __init__(self, engine: PricingEngine, host: str = "127.0.0.1", port: int = 8080, chunk_size: int = 1000,
+                 verbose: bool = False):
+        """
+        Bind the server.
+        :param engine: Engine shared by every connection
+        :param chunk_size: Order lines priced (and streamed back) per batch chunk
+        :param verbose: Log each request to stderr
+        """
+        self.engine = engine
+        self.chunk_size = chunk_size
+        self.verbose = verbose
+        super().__init__((host, port), PricingRequestHandler)
+
+    @property
+    def url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+
+# Helper: lines of a request body, read incrementally without passing its end
+def _body_lines(stream, length: int) -> Iterator[bytes]:
+    while length > 0:
+        line = stream.readline(min(length, 1 << 20))
+        if not line:
+            return
+        length -= len(line)
+        yield line
+
+
+# Helper: one /prices body line -> order row, or an UnreadableLine reported in its place
+def _order_row(line: bytes, number: int) -> dict:
+    row = parse_order_line(line, number)
+    if type(row) is not UnreadableLine and not isinstance(row.get("customer_id"), CUSTOMER_ID_TYPES):
+        return UnreadableLine(number, INVALID_CUSTOMER)
+    return row
+
+
+def main(argv=None) -> None:
+    import argparse
+    import sys
+    from pricing_engine import add_engine_arguments, load_engine
+
+    parser = argparse.ArgumentParser(description="HTTP/JSON pricing server")
+    add_engine_arguments(parser)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--chunk-size", type=int, default=1000, help="Order lines priced per batch chunk")
+    parser.add_argument("--verbose", action="store_true", help="Log every request")
+    args = parser.parse_args(argv)
+
+    server = PricingServer(load_engine(args), args.host, args.port, args.chunk_size, args.verbose)
+    print(f"Serving on {server.url}", file=sys.stderr)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
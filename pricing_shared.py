@@ -0,0 +1,217 @@
+"""
+Shared-memory engine serving for multi-process workers.
+
+One process publishes engine snapshots (see pricing_snapshot) into
+multiprocessing.shared_memory segments; any number of worker processes attach
+to them by name and price straight from the shared pages, so memory per host
+stays flat as workers are added. A small control segment holds a generation
+counter and the name of the current data segment; publishing a new price book
+writes a whole new data segment first and then flips the control block, so
+readers switch atomically between complete snapshots.
+"""
+import struct
+import sys
+import time
+from multiprocessing import shared_memory
+from typing import Optional, Tuple
+
+from pricing_engine import PricingEngine, PricingError
+from pricing_snapshot import SnapshotEngine, snapshot_bytes
+
+# Control block: sequence (odd while being written), generation, data segment name
+CONTROL = struct.Struct("<QQ64s")
+
+# After the control block: pid of the publisher's resource tracker (0 = unknown)
+TRACKER = struct.Struct("<Q")
+
+# Longest publisher name whose "<name>-<generation>" data segment names fit CONTROL's 64-byte field
+MAX_NAME_BYTES = 64 - len(f"-{2 ** 64}")
+
+# Attempts to attach to the current data segment before giving up
+ATTACH_ATTEMPTS = 100
+
+# Torn reads of the control block to retry before assuming its publisher died mid-update
+CONTROL_READ_ATTEMPTS = 10_000
+
+
+# Helper: pid of this process's resource tracker, or None if it is not known here
+def _tracker_pid() -> Optional[int]:
+    from multiprocessing import resource_tracker
+    return getattr(resource_tracker._resource_tracker, "_pid", None)
+
+
+# Helper: attach to an existing segment by name
+def _attach(name: str) -> shared_memory.SharedMemory:
+    if sys.version_info >= (3, 13):
+        return shared_memory.SharedMemory(name=name, track=False)
+    return shared_memory.SharedMemory(name=name)
+
+
+# Helper: keep the resource tracker from owning a segment this process attached to
+def _untrack(segment: shared_memory.SharedMemory, publisher_tracker: int) -> None:
+    """
+    Before Python 3.13 every attaching process registers the segment with its
+    resource tracker, which unlinks it once the processes sharing that tracker
+    have exited. A tracker shared with the publisher (the publisher's own
+    process, or workers it forked) already holds the publisher's registration,
+    which must stay for crash cleanup, so the registration is only dropped
+    from a different tracker. Python 3.13 attaches with track=False instead.
+    :param publisher_tracker: The publisher's tracker pid from the control segment
+    """
+    if sys.version_info >= (3, 13):
+        return
+    tracker = _tracker_pid()
+    if tracker is not None and tracker != publisher_tracker:
+        from multiprocessing import resource_tracker
+        resource_tracker.unregister(segment._name, "shared_memory")
+
+
+# Writer: owns the control block and the current data segment
+class SharedEnginePublisher:
+    """
+    Publishes engines under a fixed name. Each publish() creates a data segment
+    "<name>-<generation>", then points the control segment "<name>" at it and
+    unlinks the previous data segment (readers still attached to it keep their
+    mapping until they move on).
+    """
+
+    def __init__(self, name: str):
+        """
+        Create the control segment.
+        :param name: Shared-memory name readers attach with (at most MAX_NAME_BYTES bytes)
+        """
+        if len(name.lstrip("/").encode()) > MAX_NAME_BYTES:
+            raise PricingError(f"Shared engine name {name!r} is longer than {MAX_NAME_BYTES} bytes.")
+        self.name = name
+        self.generation = 0
+        self._control = shared_memory.SharedMemory(name=name, create=True, size=CONTROL.size + TRACKER.size)
+        CONTROL.pack_into(self._control.buf, 0, 0, 0, b"")
+        TRACKER.pack_into(self._control.buf, CONTROL.size, _tracker_pid() or 0)
+        self._data: Optional[shared_memory.SharedMemory] = None
+
+    def publish(self, engine: PricingEngine) -> int:
+        """
+        Make engine the current price book for every reader.
+        :return: The new generation number
+        """
+        data = snapshot_bytes(engine)
+        generation = self.generation + 1
+        segment = shared_memory.SharedMemory(name=f"{self.name}-{generation}", create=True, size=len(data))
+        segment.buf[:len(data)] = data
+
+        # Seqlock update: readers retry while the sequence is odd or has moved
+        sequence = CONTROL.unpack_from(self._control.buf, 0)[0]
+        struct.pack_into("<Q", self._control.buf, 0, sequence + 1)
+        CONTROL.pack_into(self._control.buf, 0, sequence + 1, generation, segment.name.lstrip("/").encode())
+        struct.pack_into("<Q", self._control.buf, 0, sequence + 2)
+
+        previous, self._data, self.generation = self._data, segment, generation
+        if previous is not None:
+            previous.close()
+            previous.unlink()
+        return generation
+
+    def close(self) -> None:
+        """Unlink the control and data segments."""
+        for segment in (self._data, self._control):
+            if segment is not None:
+                segment.close()
+                segment.unlink()
+        self._data = None
+
+    def __enter__(self) -> "SharedEnginePublisher":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+
+# Reader: follows the publisher's current generation
+class SharedEngine:
+    """
+    Read-only view of a published engine. engine() checks the control block's
+    generation (one small struct read) and re-attaches when it has moved, so a
+    new price book is picked up on the next call. The engine it replaced stays
+    attached for one more generation so lookups already running on it finish.
+    """
+
+    def __init__(self, name: str, timeout: float = 5.0):
+        """
+        Attach to a publisher's control segment.
+        :param name: Name the publisher was created with
+        :param timeout: Seconds to wait for a first publish
+        """
+        self.name = name
+        self._control = _attach(name)
+        self._current: Optional[Tuple[int, shared_memory.SharedMemory, SnapshotEngine]] = None
+        self._retired: Optional[Tuple[int, shared_memory.SharedMemory, SnapshotEngine]] = None
+        deadline = time.monotonic() + timeout
+        while self._read_control()[0] == 0 and time.monotonic() <= deadline:
+            time.sleep(0.01)
+        # The publisher wrote its tracker pid before its first publish
+        self._publisher_tracker = TRACKER.unpack_from(self._control.buf, CONTROL.size)[0]
+        _untrack(self._control, self._publisher_tracker)
+        if self._read_control()[0] == 0:
+            self._control.close()
+            raise PricingError(f"No engine published under {name!r}.")
+
+    @property
+    def generation(self) -> int:
+        """Generation of the engine currently attached (0 before the first lookup)."""
+        return self._current[0] if self._current else 0
+
+    def engine(self) -> SnapshotEngine:
+        """Return the engine for the latest published generation."""
+        current = self._current
+        for _ in range(ATTACH_ATTEMPTS):
+            generation, segment_name = self._read_control()
+            if current is not None and current[0] == generation:
+                return current[2]
+            try:
+                segment = _attach(segment_name)
+            except FileNotFoundError:
+                continue   # superseded between reading the control block and attaching; retry
+            _untrack(segment, self._publisher_tracker)
+            attached = (generation, segment, SnapshotEngine(segment.buf))
+            self._release(self._retired)
+            self._retired, self._current = current, attached
+            return attached[2]
+        raise PricingError(f"Could not attach to the engine published under {self.name!r}; was the publisher closed?")
+
+    def get_best_price(self, product_id, quantity, customer_id) -> dict:
+        return self.engine().get_best_price(product_id, quantity, customer_id)
+
+    def try_get_best_price(self, product_id, quantity, customer_id):
+        return self.engine().try_get_best_price(product_id, quantity, customer_id)
+
+    def get_best_prices(self, product_ids, quantities, customer_ids):
+        return self.engine().get_best_prices(product_ids, quantities, customer_ids)
+
+    def close(self) -> None:
+        """Detach from every segment (nothing is unlinked)."""
+        self._release(self._retired)
+        self._release(self._current)
+        self._retired = self._current = None
+        self._control.close()
+
+    def __enter__(self) -> "SharedEngine":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    # Helper method: consistent (generation, data segment name) from the control block
+    def _read_control(self) -> Tuple[int, str]:
+        buf = self._control.buf
+        for _ in range(CONTROL_READ_ATTEMPTS):
+            before, generation, name = CONTROL.unpack_from(buf, 0)
+            if before % 2 == 0 and CONTROL.unpack_from(buf, 0)[0] == before:
+                return generation, name.rstrip(b"\0").decode()
+            time.sleep(0)   # let the writer finish, even on a single core
+        raise PricingError(f"The control block of {self.name!r} stayed mid-update; did its publisher stop while publishing?")
+
+    @staticmethod
+    def _release(attached) -> None:
+        if attached is not None:
+            attached[2].close()
+            attached[1].close()
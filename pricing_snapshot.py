@@ -0,0 +1,165 @@
+"""
+Binary snapshots of a compiled PricingEngine.
+
+A snapshot is the engine's ColumnarIndex written to one file: a fixed header,
+a JSON table of product codes and customer ids, and the index arrays, each
+8-byte aligned. SnapshotEngine memory-maps the file and answers lookups
+straight from views into the mapping, so every process that opens the same
+snapshot shares one physical copy of the arrays through the page cache.
+"""
+import json
+import mmap
+import struct
+from array import array
+from typing import Dict, List, Optional, Tuple
+
+from pricing_engine import ColumnarIndex, PriceType, PricingEngine, PricingError, ProductCodeInterner
+
+# File layout: header, metadata JSON, padding, arrays
+MAGIC = b"PRCSNAP\0"
+VERSION = 1
+HEADER = struct.Struct("<8sIIQ")   # magic, version, reserved, metadata length
+ALIGNMENT = 8
+
+
+# Writer: engine -> snapshot bytes
+def snapshot_bytes(engine: PricingEngine) -> bytes:
+    """Serialize an engine's compiled index, product codes and customer mappings."""
+    index = engine.columnar_index()
+    customers = list(index.customer_rows)
+    if not all(type(customer_id) in (int, str) for customer_id in customers):
+        raise PricingError("Snapshots only support int or str customer ids.")
+
+    # Lay the arrays out after the metadata; offsets are relative to the array area
+    layout: Dict[str, List] = {}
+    offset = 0
+    for name, typecode in ColumnarIndex.ARRAYS.items():
+        values = getattr(index, name)
+        layout[name] = [offset, len(values), typecode]
+        offset += _aligned(len(values) * array(typecode).itemsize)
+    meta = json.dumps({
+        "products": engine.product_codes,
+        "customers": customers,
+        "arrays": layout,
+    }, separators=(",", ":")).encode("utf-8")
+
+    parts = [HEADER.pack(MAGIC, VERSION, 0, len(meta)), meta]
+    parts.append(b"\0" * (_aligned(HEADER.size + len(meta)) - HEADER.size - len(meta)))
+    for name, typecode in ColumnarIndex.ARRAYS.items():
+        data = array(typecode, getattr(index, name)).tobytes()
+        parts.append(data)
+        parts.append(b"\0" * (_aligned(len(data)) - len(data)))
+    return b"".join(parts)
+
+
+def save_snapshot(engine: PricingEngine, path: str) -> int:
+    """
+    Write an engine snapshot to path.
+    :return: Number of bytes written
+    """
+    data = snapshot_bytes(engine)
+    with open(path, "wb") as stream:
+        stream.write(data)
+    return len(data)
+
+
+# Helper: round up to the array alignment
+def _aligned(size: int) -> int:
+    return (size + ALIGNMENT - 1) // ALIGNMENT * ALIGNMENT
+
+
+# Reader: an engine served from a snapshot buffer
+class SnapshotEngine(PricingEngine):
+    """
+    Read-only PricingEngine over a snapshot buffer (an mmap, shared memory, or
+    bytes). Only the product-code and customer-id tables are decoded into
+    dicts; the index arrays are memoryviews into the buffer and are never
+    copied. Those two tables are private to each process, so opening costs
+    time and memory proportional to the number of products and customers. get_best_price and get_best_prices behave as on the source engine;
+    mapping and price updates raise PricingError. Call close() (or use a with block)
+    before releasing the buffer.
+    """
+
+    def __init__(self, buffer):
+        """
+        Attach to a snapshot.
+        :param buffer: Any bytes-like object holding snapshot_bytes() output
+        """
+        self._view = memoryview(buffer).toreadonly()
+        magic, version, _, meta_length = HEADER.unpack_from(self._view, 0)
+        if magic != MAGIC:
+            raise PricingError("Not a pricing engine snapshot.")
+        if version != VERSION:
+            raise PricingError(f"Unsupported snapshot version {version} (expected {VERSION}).")
+        meta = json.loads(bytes(self._view[HEADER.size:HEADER.size + meta_length]))
+        base = _aligned(HEADER.size + meta_length)
+
+        self._arrays: Dict[str, memoryview] = {}
+        for name, (offset, count, typecode) in meta["arrays"].items():
+            size = count * array(typecode).itemsize
+            self._arrays[name] = self._view[base + offset:base + offset + size].cast(typecode)
+        customer_rows = {customer_id: row for row, customer_id in enumerate(meta["customers"])}
+
+        self.prices = None
+        self.customer_tiers = None
+        self.customer_groups = None
+        self._products = ProductCodeInterner(meta["products"])
+        self._columnar = ColumnarIndex.from_arrays(self._arrays, customer_rows)
+        self._cache = None
+        self._stats = None
+        self._mmap: Optional[mmap.mmap] = None
+        self._file = None
+
+    # Alternate constructor: memory-map a snapshot file
+    @classmethod
+    def open(cls, path: str) -> "SnapshotEngine":
+        """Memory-map a snapshot file read-only and attach to it."""
+        stream = open(path, "rb")
+        try:
+            mapped = mmap.mmap(stream.fileno(), 0, access=mmap.ACCESS_READ)
+        except Exception:
+            stream.close()
+            raise
+        engine = cls(mapped)
+        engine._mmap, engine._file = mapped, stream
+        return engine
+
+    def columnar_index(self) -> ColumnarIndex:
+        return self._columnar
+
+    def _resolve(self, product: int, quantity: int, customer_id: int) -> Optional[Tuple[float, PriceType]]:
+        return self._columnar.probe(product, quantity, customer_id)
+
+    def _cart_resolver(self, customer_id: int):
+        return lambda product, quantity: self._resolve(product, quantity, customer_id)
+
+    def enable_instrumentation(self) -> None:
+        raise PricingError("Snapshot engines do not support instrumentation; instrument the source engine.")
+
+    def _set_mapping(self, mapping, customer_id, value) -> None:
+        raise PricingError("Snapshot engines are read-only.")
+
+    def apply_delta(self, batch) -> dict:
+        raise PricingError("Snapshot engines are read-only.")
+
+    def close(self) -> None:
+        """Release the views and, when opened from a file, the mapping."""
+        for view in self._arrays.values():
+            view.release()
+        self._arrays.clear()
+        self._view.release()
+        if self._mmap is not None:
+            self._mmap.close()
+            self._file.close()
+            self._mmap = self._file = None
+
+    def __enter__(self) -> "SnapshotEngine":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+
+def load_snapshot(path: str) -> SnapshotEngine:
+    """Memory-map a snapshot file; shorthand for SnapshotEngine.open(path)."""
+    return SnapshotEngine.open(path)
@@ -0,0 +1,202 @@
+"""
+Copy-on-write versioned engines for concurrent readers and a single writer.
+
+A VersionedEngine always points at one immutable EngineVersion. Reader threads
+take that reference once per call (a single attribute read, atomic in Python)
+and never lock. The writer builds the next version off to the side and
+publishes it by swapping the reference, so a reader sees a delta batch
+completely or not at all. Versions split their buckets into fixed product
+shards; a new version copies only the shards a batch touches and shares every
+other shard, and every untouched step table, with the version before it. A
+columnar index the previous version built is patched for the new one, sharing
+the arrays the change leaves alone.
+"""
+import threading
+from typing import Dict, Iterable, List, Optional, Tuple, Union
+
+from pricing_engine import (ColumnarIndex, PriceBook, PriceRecord, PriceResult, PricingEngine, PricingError, Probes, ProductCodeInterner,
+                            SegmentKey, StepTable, probe_order)
+
+# Product shards per version: product id % SHARDS picks a product's shard
+SHARDS = 1024
+
+# One shard: (product id, source, key) -> compiled table, and -> raw (min_qty, price) rows
+SegmentShard = Dict[SegmentKey, StepTable]
+BucketShard = Dict[SegmentKey, List[Tuple[int, float]]]
+
+
+# One immutable engine state
+class EngineVersion(PricingEngine):
+    """
+    A read-only PricingEngine over sharded buckets. get_best_price and
+    get_best_prices behave as on PricingEngine; updates raise PricingError
+    and go through the owning VersionedEngine instead. The product-code
+    interner is shared by all versions: it is append-only, and a product added
+    by a later version simply has no buckets in earlier ones.
+    """
+
+    def __init__(self, number: int, products: ProductCodeInterner, segment_shards: Tuple[SegmentShard, ...],
+                 bucket_shards: Tuple[BucketShard, ...], customer_tiers: Dict[int, str], customer_groups: Dict[int, str]):
+        """
+        Wrap shards that must no longer be modified.
+        :param number: Version number (1 for the first)
+        """
+        self.number = number
+        self.prices = None
+        self.customer_tiers = customer_tiers
+        self.customer_groups = customer_groups
+        self._products = products
+        self._shards = segment_shards
+        self._bucket_shards = bucket_shards
+        self._columnar: Optional[ColumnarIndex] = None
+        self._cache = None
+        self._normal_only = {}   # no NORMAL-only fast path: every product goes through its shard
+        self._stats = None
+
+    # Alternate constructor: shard a built engine's index
+    @classmethod
+    def from_engine(cls, engine: PricingEngine) -> "EngineVersion":
+        """Build version 1 from an engine's compiled buckets (the engine itself is left unchanged)."""
+        engine.compile_all()
+        segment_shards: List[SegmentShard] = [{} for _ in range(SHARDS)]
+        bucket_shards: List[BucketShard] = [{} for _ in range(SHARDS)]
+        for segment, table in engine._segments.items():
+            segment_shards[segment[0] % SHARDS][segment] = table
+        for segment, rows in engine._buckets.items():
+            bucket_shards[segment[0] % SHARDS][segment] = rows
+        return cls(1, engine._products, tuple(segment_shards), tuple(bucket_shards),
+                   dict(engine.customer_tiers), dict(engine.customer_groups))
+
+    # Lookup hooks: every product goes through its shard. Profiles are not
+    # precomputed, so the CUSTOMER probe is always tried (a miss is just a dict lookup)
+    def _probes(self, customer_id: int) -> Probes:
+        return probe_order(customer_id, (self.customer_tiers.get(customer_id), self.customer_groups.get(customer_id), True))
+
+    def _product_segments(self, product: int) -> SegmentShard:
+        return self._shards[product % SHARDS]
+
+    def columnar_index(self) -> ColumnarIndex:
+        # Built at most once per version (two racing threads may both build it; either result is correct)
+        if self._columnar is None:
+            segments = {segment: table for shard in self._shards for segment, table in shard.items()}
+            self._columnar = ColumnarIndex(segments, self.customer_tiers, self.customer_groups)
+        return self._columnar
+
+    def apply_delta(self, batch) -> dict:
+        raise PricingError("Engine versions are immutable; update through VersionedEngine.")
+
+    def _set_mapping(self, mapping, customer_id, value) -> None:
+        raise PricingError("Engine versions are immutable; update through VersionedEngine.")
+
+
+# Front end: lock-free reads of the current version, serialized copy-on-write updates
+class VersionedEngine:
+    """
+    Thread-safe engine for many readers and concurrent updates. Lookups read
+    the current version once and run entirely on it; use current() to run
+    several lookups against one consistent version. Writers are serialized by
+    a lock that readers never take. There is no result cache.
+    """
+
+    def __init__(self, prices: Union[List[PriceRecord], PriceBook], customer_tiers: Dict[int, str], customer_groups: Dict[int, str]):
+        """
+        Build version 1; arguments are as for PricingEngine.
+        """
+        self._current = EngineVersion.from_engine(PricingEngine(prices, customer_tiers, customer_groups))
+        self._write_lock = threading.Lock()
+
+    @property
+    def version(self) -> int:
+        """Number of the current version."""
+        return self._current.number
+
+    def current(self) -> EngineVersion:
+        """Return the current version; it never changes, whatever later updates do."""
+        return self._current
+
+    def get_best_price(self, product_id: Union[int, str], quantity: int, customer_id: int) -> dict:
+        return self._current.get_best_price(product_id, quantity, customer_id)
+
+    def try_get_best_price(self, product_id: Union[int, str], quantity: int, customer_id: int) -> PriceResult:
+        return self._current.try_get_best_price(product_id, quantity, customer_id)
+
+    def get_best_prices(self, product_ids, quantities, customer_ids):
+        return self._current.get_best_prices(product_ids, quantities, customer_ids)
+
+    def price_cart(self, customer_id: int, lines) -> dict:
+        return self._current.price_cart(customer_id, lines)
+
+    # Price updates: same operations as PricingEngine, published as one new version
+    def upsert_price(self, entry: PriceRecord) -> None:
+        """Add or replace one price row (see PricingEngine.upsert_price)."""
+        self.apply_delta([("upsert", entry)])
+
+    def remove_price(self, entry: PriceRecord) -> None:
+        """Remove one price row (see PricingEngine.remove_price)."""
+        self.apply_delta([("remove", entry)])
+
+    def apply_delta(self, batch: Iterable[Tuple[str, PriceRecord]]) -> dict:
+        """
+        Apply ("upsert" | "remove", entry) operations and publish the result as
+        a single new version; readers see all of the batch or none of it. Only
+        the shards the batch touches are copied.
+        :return: {"upserted", "removed", "segments", "version"}
+        """
+        with self._write_lock:
+            current = self._current
+            segment_shards = list(current._shards)
+            bucket_shards = list(current._bucket_shards)
+            copied = set()
+
+            # Copy a shard the first time the batch writes to it
+            def buckets_for(product: int) -> BucketShard:
+                shard = product % SHARDS
+                if shard not in copied:
+                    copied.add(shard)
+                    segment_shards[shard] = dict(segment_shards[shard])
+                    bucket_shards[shard] = dict(bucket_shards[shard])
+                return bucket_shards[shard]
+
+            touched, upserted, removed = current._edit_buckets(batch, buckets_for)
+            for segment in touched:
+                shard = segment[0] % SHARDS
+                rows = bucket_shards[shard][segment]
+                if rows:
+                    segment_shards[shard][segment] = PricingEngine._compile_step_table(rows)
+                else:
+                    del bucket_shards[shard][segment]
+                    segment_shards[shard].pop(segment, None)
+            if touched:
+                self._publish(EngineVersion(current.number + 1, current._products, tuple(segment_shards),
+                                            tuple(bucket_shards), current.customer_tiers, current.customer_groups),
+                              {segment: segment_shards[segment[0] % SHARDS].get(segment) for segment in touched})
+            return {"upserted": upserted, "removed": removed, "segments": len(touched), "version": self._current.number}
+
+    # Customer mapping updates: copy the mapping into a new version
+    def set_customer_tier(self, customer_id: int, tier: Optional[str]) -> None:
+        """Assign (or with None, remove) a customer's tier in a new version."""
+        self._set_mapping("customer_tiers", customer_id, tier)
+
+    def set_customer_group(self, customer_id: int, group: Optional[str]) -> None:
+        """Assign (or with None, remove) a customer's group in a new version."""
+        self._set_mapping("customer_groups", customer_id, group)
+
+    def _set_mapping(self, name: str, customer_id: int, value: Optional[str]) -> None:
+        with self._write_lock:
+            current = self._current
+            mappings = {"customer_tiers": current.customer_tiers, "customer_groups": current.customer_groups}
+            mapping = mappings[name] = dict(mappings[name])
+            if value is None:
+                mapping.pop(customer_id, None)
+            else:
+                mapping[customer_id] = value
+            self._publish(EngineVersion(current.number + 1, current._products, current._shards,
+                                        current._bucket_shards, mappings["customer_tiers"], mappings["customer_groups"]),
+                          {}, (customer_id,))
+
+    # Helper method: make a version current, patching the previous version's columnar index for it
+    def _publish(self, version: EngineVersion, changes: Dict[SegmentKey, Optional[StepTable]], customers: Iterable[int] = ()) -> None:
+        # The previous index is copied, not modified, so readers of older versions are unaffected
+        version._columnar = self._current._columnar
+        version._patch_columnar(changes, customers)
+        self._current = version
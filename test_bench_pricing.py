@@ -0,0 +1,26 @@
+import json
+
+from bench_pricing import run_suite, synthetic_price_book, zipf_requests
+from pricing_engine import PriceType
+
+# Synthetic Data Tests
+def test_synthetic_price_book_follows_config():
+    rows, tiers, groups = synthetic_price_book(products=50, entries_per_product=7, mix=(0, 1, 0, 0), break_depth=3, customers=20)
+    assert len(rows) == 50 * 7
+    assert {row.source for row in rows} == {PriceType.NORMAL, PriceType.TIER}
+    assert [row.min_qty for row in rows[:7]] == [1, 5, 10, 1, 5, 10, 1]
+    assert len(tiers) == len(groups) == 20
+    assert synthetic_price_book(50, 7, seed=3)[0] == synthetic_price_book(50, 7, seed=3)[0]
+
+def test_zipf_requests_are_skewed():
+    product_ids, quantities, customer_ids = zipf_requests(5000, products=100, skew=1.5)
+    counts = sorted((product_ids.count(p) for p in set(product_ids)), reverse=True)
+    assert counts[0] > 10 * counts[len(counts) // 2]
+    assert len(quantities) == len(customer_ids) == 5000
+
+def test_suite_report_is_json():
+    report = run_suite(products=30, entries_per_product=4, requests=500, customers=10)
+    results = json.loads(json.dumps(report))["results"]
+    assert results["catalog_rows"] == 120
+    assert results["get_best_price_us"]["p50"] <= results["get_best_price_us"]["p99"]
+    assert results["batch_requests_per_second"] > 0
@@ -0,0 +1,46 @@
+import asyncio
+
+import pytest
+
+from pricing_async import AsyncPricingService, price_concurrently
+from pricing_engine import PricingEngine, PricingError
+from pricing_io import price_order_lines
+from test_pricing_engine import customer_groups, customer_tiers, prices
+
+engine = PricingEngine(prices, customer_tiers, customer_groups)
+
+# Async Service Tests
+@pytest.mark.parametrize("offload", [None, 1])
+def test_concurrent_requests_are_batched_and_coalesced(offload):
+    rows = [{"product_id": product, "quantity": quantity, "customer_id": customer}
+            for product in (1, 2, "P003", "bad", 999) for quantity in (0, 1, 4) for customer in (2, 6)] * 3
+
+    async def run():
+        async with AsyncPricingService(engine, window=0.01, max_batch=1000, offload=offload) as service:
+            results = await price_concurrently(service, rows)
+            return results, service.metrics()
+
+    results, metrics = asyncio.run(run())
+    for result, expected in zip(results, price_order_lines(engine, rows)):
+        if "error" in expected:
+            assert isinstance(result, PricingError) and str(result) == expected["error"]
+        else:
+            assert result == expected
+    assert (metrics["requests"], metrics["coalesced"], metrics["batches"]) == (90, 60, 1)
+    assert metrics["max_batch_size"] == 30
+
+def test_max_batch_flushes_early_and_close_flushes_the_rest():
+    async def run():
+        service = AsyncPricingService(engine, window=10, max_batch=2, lag_interval=0)
+        first, second = await asyncio.gather(service.get_best_price(1, 4, 2), service.get_best_price(2, 1, 6))
+        lone = asyncio.ensure_future(service.get_best_price(999, 1, 2))
+        await asyncio.sleep(0)
+        await service.close()   # the 10s window never fires; close() prices the lone request
+        with pytest.raises(PricingError) as exc_info:
+            await lone
+        return first, second, str(exc_info.value), service.metrics()
+
+    first, second, message, metrics = asyncio.run(run())
+    assert (first["price_type"], second["price_type"]) == ("TIER", "CUSTOMER")
+    assert message == "No price found for P999 with quantity 1."
+    assert (metrics["batches"], metrics["max_batch_size"]) == (2, 2)
@@ -1,5 +1,5 @@
 import pytest
-from pricing_engine import PricingEngine, PriceEntry, PriceType, PricingError
+from pricing_engine import FrozenPriceEntry, PricingEngine, PriceBook, PriceEntry, PriceType, PricingError, ProductCodeInterner
 
 # Sample price entries
 prices = [
@@ -46,3 +46,483 @@ def test_missing_product():
     with pytest.raises(PricingError) as exc_info:
         engine.get_best_price(product_id=999, quantity=1, customer_id=2)
     assert "No price found" in str(exc_info.value)
+
+# Quantity Break Tests
+def test_quantity_breaks_pick_lowest_applicable():
+    breaks = [
+        PriceEntry(product_id="P010", min_qty=1, price=20, source=PriceType.NORMAL),
+        PriceEntry(product_id="P010", min_qty=10, price=15, source=PriceType.NORMAL),
+        PriceEntry(product_id="P010", min_qty=5, price=18, source=PriceType.NORMAL),
+    ]
+    break_engine = PricingEngine(breaks, {}, {})
+    assert break_engine.get_best_price(10, 4, 1)["price"] == 20
+    assert break_engine.get_best_price(10, 5, 1)["price"] == 18
+    assert break_engine.get_best_price(10, 50, 1)["price"] == 15
+
+def test_mismatched_key_types_never_apply():
+    odd = [
+        PriceEntry(product_id="P011", min_qty=1, price=1, source=PriceType.CUSTOMER, key="6"),
+        PriceEntry(product_id="P011", min_qty=1, price=2, source=PriceType.TIER, key=6),
+        PriceEntry(product_id="P011", min_qty=1, price=9, source=PriceType.NORMAL),
+    ]
+    odd_engine = PricingEngine(odd, {6: "GOLD"}, {})
+    result = odd_engine.get_best_price(11, 1, 6)
+    assert result["price_type"] == "NORMAL"
+    assert result["price"] == 9
+
+# Equivalence Tests: compiled index must agree with a full scan of the price list
+def reference_best_price(prices, tiers, groups, product_code, quantity, customer_id):
+    tier = tiers.get(customer_id)
+    group = groups.get(customer_id)
+    applicable = [
+        p for p in prices
+        if p.product_id == product_code and quantity >= p.min_qty and (
+            (p.source == PriceType.CUSTOMER and isinstance(p.key, int) and p.key == customer_id) or
+            (p.source == PriceType.TIER and isinstance(p.key, str) and p.key == tier) or
+            (p.source == PriceType.GROUP and isinstance(p.key, str) and p.key == group) or
+            p.source == PriceType.NORMAL
+        )
+    ]
+    if not applicable:
+        return None
+    best = min(applicable, key=lambda p: (PricingEngine.PRIORITY[p.source], p.price))
+    return {"product_id": best.product_id, "price": best.price, "price_type": best.source.value}
+
+def random_catalog(rng, products=8, rows=200):
+    keys = {
+        PriceType.CUSTOMER: [1, 2, 3, 4],
+        PriceType.TIER: ["GOLD", "SILVER"],
+        PriceType.GROUP: ["GRP1", "GRP2"],
+        PriceType.NORMAL: [None],
+    }
+    catalog = []
+    for _ in range(rows):
+        source = rng.choice(list(PriceType))
+        catalog.append(PriceEntry(
+            product_id=f"P{rng.randint(1, products):03d}",
+            min_qty=rng.randint(1, 20),
+            price=rng.randint(1, 100),
+            source=source,
+            key=rng.choice(keys[source]),
+        ))
+    tiers = {c: rng.choice(["GOLD", "SILVER"]) for c in range(1, 6) if rng.random() < 0.7}
+    groups = {c: rng.choice(["GRP1", "GRP2"]) for c in range(1, 6) if rng.random() < 0.7}
+    return catalog, tiers, groups
+
+def test_price_types_hash_by_identity_and_survive_pickling():
+    import pickle
+    for source in PriceType:
+        assert hash(source) == object.__hash__(source)
+        assert PriceType(source.value) is source and {source: 1}[PriceType[source.name]] == 1
+    # Identity hashes differ between processes; pickled engines rebuild their dicts on load
+    engine = PricingEngine(prices, customer_tiers, customer_groups)
+    restored = pickle.loads(pickle.dumps(engine))
+    for row in ((1, 4, 2), (1, 1, 1), (2, 1, 6), (3, 2, 6)):
+        assert restored.get_best_price(*row) == engine.get_best_price(*row)
+
+def test_matches_reference_scan():
+    import random
+    rng = random.Random(1234)
+    for _ in range(20):
+        catalog, tiers, groups = random_catalog(rng)
+        random_engine = PricingEngine(catalog, tiers, groups)
+        for _ in range(100):
+            product_id = rng.randint(1, 9)
+            quantity = rng.randint(1, 25)
+            customer_id = rng.randint(1, 6)
+            expected = reference_best_price(catalog, tiers, groups, f"P{product_id:03d}", quantity, customer_id)
+            if expected is None:
+                with pytest.raises(PricingError):
+                    random_engine.get_best_price(product_id, quantity, customer_id)
+            else:
+                assert random_engine.get_best_price(product_id, quantity, customer_id) == expected
+
+# Columnar PriceBook Tests
+def test_price_book_round_trips_entries():
+    book = PriceBook(prices)
+    assert len(book) == len(prices)
+    assert list(book) == prices
+    assert book[4] == prices[4]
+    assert book[4].key == 6 and book.keys[book.key[4]] == 6
+
+def test_price_book_engine_matches_list_engine():
+    import random
+    rng = random.Random(99)
+    catalog, tiers, groups = random_catalog(rng)
+    list_engine = PricingEngine(catalog, tiers, groups)
+    book_engine = PricingEngine(PriceBook(catalog), tiers, groups)
+    for product_id in range(1, 9):
+        for quantity in (1, 5, 12, 30):
+            for customer_id in range(1, 6):
+                try:
+                    expected = list_engine.get_best_price(product_id, quantity, customer_id)
+                except PricingError:
+                    with pytest.raises(PricingError):
+                        book_engine.get_best_price(product_id, quantity, customer_id)
+                else:
+                    assert book_engine.get_best_price(product_id, quantity, customer_id) == expected
+
+# Frozen PriceEntry Tests
+def test_frozen_entries_are_hashable_and_drive_the_engine():
+    frozen = [FrozenPriceEntry.from_entry(p) for p in prices]
+    assert FrozenPriceEntry("P002", 1, 5, PriceType.CUSTOMER, key=6) == frozen[4]
+    assert len(set(frozen)) == len(frozen)
+    assert not hasattr(frozen[0], "__dict__")
+    with pytest.raises(AttributeError):
+        frozen[0].price = 1
+    frozen_engine = PricingEngine(frozen, customer_tiers, customer_groups)
+    assert frozen_engine.get_best_price(product_id=1, quantity=4, customer_id=2)["price"] == 95
+
+# Product Code Interner Tests
+def test_interner_resolves_raw_inputs_to_dense_ids():
+    interner = ProductCodeInterner(["P001", "P002"])
+    assert interner.lookup(1) == 0
+    assert interner.lookup("2") == 1
+    assert interner.lookup("p002") == 1
+    assert interner.lookup(1) == 0            # served from the int fast path
+    assert interner.lookup(3) is None
+    assert 3 not in interner._int_ids         # unknown codes are not remembered
+    with pytest.raises(PricingError):
+        interner.lookup("X1")
+    # find takes codes exactly as given
+    assert (interner.find("P002"), interner.find("p002"), interner.find(2), interner.find("X1")) == (1, None, None, None)
+
+def test_interner_memo_is_bounded(monkeypatch):
+    interner = ProductCodeInterner(["P001", "P002"])
+    monkeypatch.setattr(ProductCodeInterner, "MAX_REMEMBERED", 3)
+    # Endless spellings of P001 stop being remembered at one per product plus MAX_REMEMBERED
+    for zeros in range(10):
+        assert interner.lookup("0" * zeros + "1") == 0
+        assert interner.resolve("0" * zeros + "2") == (1, "P002")
+    assert len(interner._str_ids) == 5
+    assert interner.lookup("0000001") == 0   # still resolved, just not remembered
+
+# Result Cache Tests
+def test_cache_hits_within_quantity_band_and_invalidates_customer():
+    cached_engine = PricingEngine(prices, dict(customer_tiers), dict(customer_groups), cache_size=2)
+    assert cached_engine.get_best_price(1, 4, 2)["price"] == 95
+    assert cached_engine.get_best_price(1, 7, 2)["price"] == 95   # same band (>= 3)
+    info = cached_engine.cache_info()
+    assert (info["hits"], info["misses"], info["size"]) == (1, 1, 1)
+
+    cached_engine.set_customer_tier(2, None)
+    assert cached_engine.cache_info()["invalidations"] == 1
+    result = cached_engine.get_best_price(1, 4, 2)
+    assert (result["price_type"], result["price"]) == ("NORMAL", 100)
+
+def test_cache_evicts_least_recently_used():
+    cached_engine = PricingEngine(prices, customer_tiers, customer_groups, cache_size=2)
+    cached_engine.get_best_price(1, 1, 1)
+    cached_engine.get_best_price(2, 1, 1)
+    cached_engine.get_best_price(1, 1, 1)
+    cached_engine.get_best_price(2, 1, 6)
+    info = cached_engine.cache_info()
+    assert (info["size"], info["evictions"]) == (2, 1)
+    cached_engine.get_best_price(1, 1, 1)
+    assert cached_engine.cache_info()["hits"] == 2
+
+# Batch Pricing Tests
+def batch_rows(rng, count=500):
+    product_ids = [rng.choice([rng.randint(1, 9), str(rng.randint(1, 9)), "bad"]) for _ in range(count)]
+    quantities = [rng.choice([0, -1, 1, 3, 7, 12, 30]) for _ in range(count)]
+    customer_ids = [rng.randint(1, 7) for _ in range(count)]
+    return product_ids, quantities, customer_ids
+
+def check_batch_matches_scalar(batch_engine, product_ids, quantities, customer_ids):
+    from pricing_engine import ErrorCode
+    prices, types, errors = batch_engine.get_best_prices(product_ids, quantities, customer_ids)
+    for row in range(len(product_ids)):
+        try:
+            expected = batch_engine.get_best_price(product_ids[row], quantities[row], customer_ids[row])
+        except PricingError as e:
+            message = str(e)
+            code = (ErrorCode.INVALID_QUANTITY if "Quantity" in message
+                    else ErrorCode.INVALID_PRODUCT if "Invalid" in message else ErrorCode.NO_PRICE)
+            assert errors[row] == code
+            assert types[row] == 0
+        else:
+            assert errors[row] == ErrorCode.OK
+            assert prices[row] == expected["price"]
+            assert types[row] == PricingEngine.PRIORITY[PriceType(expected["price_type"])]
+
+def test_batch_matches_scalar_with_numpy():
+    pytest.importorskip("numpy")
+    import random
+    rng = random.Random(7)
+    for _ in range(5):
+        catalog, tiers, groups = random_catalog(rng)
+        check_batch_matches_scalar(PricingEngine(catalog, tiers, groups), *batch_rows(rng))
+
+def test_batch_matches_scalar_without_numpy(monkeypatch):
+    import random
+    import pricing_engine
+    monkeypatch.setattr(pricing_engine, "np", None)
+    rng = random.Random(8)
+    catalog, tiers, groups = random_catalog(rng)
+    check_batch_matches_scalar(PricingEngine(catalog, tiers, groups), *batch_rows(rng))
+
+@pytest.mark.parametrize("with_numpy", [True, False])
+def test_batch_reports_malformed_rows_instead_of_raising(monkeypatch, with_numpy):
+    from pricing_engine import ErrorCode
+    import pricing_engine
+    if with_numpy:
+        pytest.importorskip("numpy")
+    else:
+        monkeypatch.setattr(pricing_engine, "np", None)
+    checked = PricingEngine(prices, customer_tiers, customer_groups)
+    cases = [
+        (([1, [1, 2]], [4, 1], [2, 2]), [ErrorCode.OK, ErrorCode.INVALID_PRODUCT]),
+        (([1, 2], [4, [1]], [2, 6]), [ErrorCode.OK, ErrorCode.INVALID_QUANTITY]),
+        (([1, 2], [4, 1], [[2], [6]]), [ErrorCode.OK, ErrorCode.OK]),
+        (([1, 2], [4, 1], [{"id": 2}, 6]), [ErrorCode.OK, ErrorCode.OK]),
+    ]
+    for rows, expected in cases:
+        found, types, errors = checked.get_best_prices(*rows)
+        assert list(errors) == expected
+    # Unhashable customer ids are unknown customers: only NORMAL prices apply
+    found, types, errors = checked.get_best_prices([1, 2], [4, 1], [[2], {"id": 6}])
+    assert list(found) == [100, 10] and list(types) == [PricingEngine.PRIORITY[PriceType.NORMAL]] * 2
+
+@pytest.mark.parametrize("with_numpy", [True, False])
+def test_batch_matches_scalar_for_fractional_quantities(monkeypatch, with_numpy):
+    import pricing_engine
+    if with_numpy:
+        pytest.importorskip("numpy")
+    else:
+        monkeypatch.setattr(pricing_engine, "np", None)
+    # A zero min_qty row makes quantities below 1 priceable
+    checked = PricingEngine(prices + [PriceEntry(product_id="P002", min_qty=0, price=12, source=PriceType.NORMAL)],
+                            customer_tiers, customer_groups)
+    quantities = [0.5, 0.999, 2.5, 4.9, 9.99, 0.0, -0.5, float("inf")]
+    count = len(quantities)
+    for product in (1, 2):
+        check_batch_matches_scalar(checked, [product] * count, quantities, [2] * count)
+    assert checked.get_best_prices([2], [0.5], [6])[2][0] == 0   # priced, not INVALID_QUANTITY
+
+def test_unhashable_customer_ids_are_priced_as_unknown_customers():
+    for engine in (PricingEngine(prices, customer_tiers, customer_groups, cache_size=10),
+                   PricingEngine(prices, customer_tiers, customer_groups, instrument=True)):
+        expected = engine.get_best_price(1, 4, None)
+        for customer_id in ([2], {"id": 2}):
+            assert engine.try_get_best_price(1, 4, customer_id).to_dict() == expected
+            assert engine.get_best_price(1, 4, customer_id) == expected
+            assert engine.price_cart(customer_id, [(1, 4)])["lines"][0]["price"] == expected["price"]
+
+# Incremental Update Tests
+def test_upsert_and_remove_reprice_only_touched_products():
+    cached_engine = PricingEngine(list(prices), customer_tiers, customer_groups, cache_size=10)
+    assert cached_engine.get_best_price(1, 4, 2)["price"] == 95
+    assert cached_engine.get_best_price(2, 1, 1)["price"] == 10
+
+    cached_engine.upsert_price(PriceEntry(product_id="P001", min_qty=3, price=90, source=PriceType.TIER, key="GOLD"))
+    assert cached_engine.get_best_price(1, 4, 2)["price"] == 90
+    assert cached_engine.cache_info()["invalidations"] == 1   # P002's cached result survives
+    cached_engine.upsert_price(PriceEntry(product_id="P009", min_qty=1, price=7, source=PriceType.NORMAL))
+    assert cached_engine.get_best_price(9, 1, 1)["price"] == 7
+
+    cached_engine.remove_price(PriceEntry(product_id="P001", min_qty=3, price=0, source=PriceType.TIER, key="GOLD"))
+    assert cached_engine.get_best_price(1, 4, 2)["price_type"] == "NORMAL"
+    with pytest.raises(ValueError):
+        cached_engine.apply_delta([("replace", prices[0])])
+
+def test_bad_delta_batch_changes_nothing_and_codes_match_exactly():
+    engine = PricingEngine(list(prices), customer_tiers, customer_groups, cache_size=10)
+    before = [engine.get_best_price(1, q, c) for q in (1, 4, 10) for c in (1, 2, 6)]
+    batch = [("upsert", PriceEntry(product_id="P001", min_qty=1, price=1, source=PriceType.NORMAL)),
+             ("remove", PriceEntry(product_id="P002", min_qty=1, price=0, source=PriceType.NORMAL)),
+             ("remove", PriceEntry(product_id=["P001"], min_qty=1, price=0, source=PriceType.NORMAL))]
+    for bad in (batch, batch[:2] + [("upsert", PriceEntry(product_id="P001", min_qty=None, price=1, source=PriceType.NORMAL))]):
+        with pytest.raises(PricingError, match="Invalid price delta entry"):
+            engine.apply_delta(bad)
+        assert [engine.get_best_price(1, q, c) for q in (1, 4, 10) for c in (1, 2, 6)] == before
+        assert engine.get_best_price(2, 1, 1)["price"] == 10
+
+    # "p001" is a different code from "P001", for removals as for upserts and construction
+    engine.remove_price(PriceEntry(product_id="p001", min_qty=1, price=0, source=PriceType.NORMAL))
+    engine.remove_price(PriceEntry(product_id="XYZ", min_qty=1, price=0, source=PriceType.NORMAL))
+    assert engine.get_best_price(1, 1, 1)["price"] == before[0]["price"]
+    engine.upsert_price(PriceEntry(product_id="p001", min_qty=1, price=1, source=PriceType.NORMAL))
+    assert engine.apply_delta([("remove", PriceEntry(product_id="p001", min_qty=1, price=0, source=PriceType.NORMAL))])["removed"] == 1
+    assert engine.get_best_price(1, 1, 1)["price"] == before[0]["price"]
+
+def test_deltas_match_rebuilt_engine():
+    import random
+    import pricing_engine
+    rng = random.Random(99)
+    for _ in range(10):
+        catalog, tiers, groups = random_catalog(rng)
+        updated = PricingEngine(catalog, dict(tiers), dict(groups))
+        index = updated.columnar_index()
+        current = list(catalog)
+        for _ in range(5):
+            batch = [(rng.choice(["upsert", "remove"]), entry) for entry in random_catalog(rng, rows=20)[0]]
+            updated.apply_delta(batch)
+            updated.set_customer_tier(rng.randint(1, 7), rng.choice(["GOLD", "SILVER", "BRONZE", None]))
+            updated.set_customer_group(rng.randint(1, 7), rng.choice(["GRP1", "GRP2", None]))
+            tiers, groups = dict(updated.customer_tiers), dict(updated.customer_groups)
+            # With NumPy the built columnar index is patched, not dropped
+            if pricing_engine.np is not None:
+                assert updated._columnar is not None and updated._columnar is not index
+            for operation, entry in batch:
+                current = [p for p in current if not (
+                    (p.product_id, p.source, p.min_qty) == (entry.product_id, entry.source, entry.min_qty)
+                    and (p.source == PriceType.NORMAL or p.key == entry.key))]
+                if operation == "upsert":
+                    current.append(entry)
+            rebuilt = PricingEngine(current, tiers, groups)
+            rows = batch_rows(rng, 100)
+            for row in zip(*rows):
+                try:
+                    expected = rebuilt.get_best_price(*row)
+                except PricingError as e:
+                    expected = str(e)
+                try:
+                    assert updated.get_best_price(*row) == expected
+                except PricingError as e:
+                    assert str(e) == expected
+            check_batch_matches_scalar(updated, *rows)
+
+# Customer Profile Tests
+def test_profiles_track_mappings_and_contract_prices():
+    profiled = PricingEngine(list(prices), dict(customer_tiers), dict(customer_groups))
+    assert profiled._profiles == {2: ("GOLD", None, False), 6: ("SILVER", "GRP1", True)}
+    assert profiled.get_best_price(2, 1, 2)["price_type"] == "NORMAL"   # customer 2 skips the CUSTOMER probe
+
+    profiled.upsert_price(PriceEntry(product_id="P002", min_qty=1, price=4, source=PriceType.CUSTOMER, key=2))
+    assert profiled._profiles[2] == ("GOLD", None, True)
+    assert profiled._probes(2) == ((PriceType.CUSTOMER, 2), (PriceType.TIER, "GOLD"), (PriceType.NORMAL, None))
+    assert profiled.get_best_price(2, 1, 2)["price"] == 4
+    profiled.remove_price(PriceEntry(product_id="P002", min_qty=1, price=0, source=PriceType.CUSTOMER, key=6))
+    profiled.set_customer_tier(6, None)
+    profiled.set_customer_group(6, None)
+    assert 6 not in profiled._profiles
+    assert profiled._probes(6) == ((PriceType.NORMAL, None),)
+    assert profiled.get_best_price(2, 1, 6)["price_type"] == "NORMAL"
+    profiled.set_customer_group(9, "GRP1")
+    assert profiled.get_best_price(3, 2, 9)["price_type"] == "GROUP"
+
+# NORMAL-only Fast Path Tests
+def test_normal_only_products_take_fast_path_and_follow_updates():
+    fast = PricingEngine(list(prices), customer_tiers, customer_groups, cache_size=10)
+    assert set(fast._normal_only) == set()   # P001/P002 have segment prices, P003 has no NORMAL price
+    fast.upsert_price(PriceEntry(product_id="P004", min_qty=1, price=30, source=PriceType.NORMAL))
+    fast.upsert_price(PriceEntry(product_id="P004", min_qty=10, price=25, source=PriceType.NORMAL))
+    assert fast.product_codes[next(iter(fast._normal_only))] == "P004"
+    assert fast.get_best_price(4, 12, 6) == {"product_id": "P004", "price": 25, "price_type": "NORMAL"}
+    assert fast.cache_info()["size"] == 0   # served without the cache
+
+    fast.upsert_price(PriceEntry(product_id="P004", min_qty=1, price=20, source=PriceType.GROUP, key="GRP1"))
+    assert not fast._normal_only
+    assert fast.get_best_price(4, 12, 6)["price_type"] == "GROUP"
+    fast.remove_price(PriceEntry(product_id="P004", min_qty=1, price=0, source=PriceType.GROUP, key="GRP1"))
+    assert fast.get_best_price(4, 5, 6)["price"] == 30
+    assert len(fast._normal_only) == 1
+
+# Non-raising Lookup Tests
+def test_try_get_best_price_matches_raising_lookup():
+    from pricing_engine import ErrorCode
+    import random
+    rng = random.Random(5)
+    catalog, tiers, groups = random_catalog(rng)
+    for cache_size in (0, 16):
+        checked = PricingEngine(catalog, tiers, groups, cache_size=cache_size)
+        for row in zip(*batch_rows(rng, 300)):
+            result = checked.try_get_best_price(*row)
+            try:
+                expected = checked.get_best_price(*row)
+            except PricingError as e:
+                assert not result.ok and result.message == str(e)
+            else:
+                assert result.ok and result.to_dict() == expected
+    failed = engine.try_get_best_price("bad", 1, 1)
+    assert (failed.error, failed.to_dict()) == (ErrorCode.INVALID_PRODUCT, {"product_id": "bad", "error": "Invalid product_id: bad"})
+    assert engine.try_get_best_price(3, "x", 6).error == ErrorCode.INVALID_QUANTITY
+
+def test_numeric_quantity_types_and_oversized_codes_match_raising_lookup():
+    from decimal import Decimal
+    from fractions import Fraction
+    from pricing_engine import ErrorCode
+    quantities = [Decimal("4.5"), Fraction(9, 2), True]
+    try:
+        import numpy as np
+        quantities += [np.int64(4), np.float32(4.5)]
+    except ImportError:
+        pass
+    for quantity in quantities:
+        assert engine.try_get_best_price(1, quantity, 2).to_dict() == engine.get_best_price(1, quantity, 2)
+        assert engine.get_best_prices([1], [quantity], [2])[2][0] == ErrorCode.OK
+    # Digit strings int() refuses are invalid codes, not a ValueError
+    for product_id in ("1" * 5000, "\u00b2"):
+        assert engine.try_get_best_price(product_id, 1, 2).error == ErrorCode.INVALID_PRODUCT
+        assert engine.get_best_prices([product_id], [1], [2])[2][0] == ErrorCode.INVALID_PRODUCT
+        with pytest.raises(PricingError, match="Invalid product_id"):
+            engine.get_best_price(product_id, 1, 2)
+
+# Cart Pricing Tests
+def test_price_cart_matches_single_lookups():
+    import random
+    from pricing_snapshot import SnapshotEngine, snapshot_bytes
+    from decimal import Decimal
+    from fractions import Fraction
+    from pricing_versioned import VersionedEngine
+    rng = random.Random(21)
+    catalog, tiers, groups = random_catalog(rng)
+    # Float prices, so Decimal quantities cannot simply be multiplied by them
+    catalog = [PriceEntry(p.product_id, p.min_qty, p.price + 0.25, p.source, p.key) for p in catalog]
+    cart_engine = PricingEngine(catalog, tiers, groups)
+    # Few products over many lines: most products repeat within the cart
+    quantities = [0, 1, 3, 7, 12, 30, 2.5, Decimal("7.5"), Fraction(1, 2), "3"]
+    lines = [(rng.choice([rng.randint(1, 9), "bad"]), rng.choice(quantities)) for _ in range(300)]
+    for source in (cart_engine, SnapshotEngine(snapshot_bytes(cart_engine)), VersionedEngine(catalog, tiers, groups)):
+        for customer_id in range(1, 7):
+            cart = source.price_cart(customer_id, lines)
+            total = 0.0
+            for (product_id, quantity), line in zip(lines, cart["lines"]):
+                result = cart_engine.try_get_best_price(product_id, quantity, customer_id)
+                assert line["quantity"] == quantity
+                if result.ok:
+                    assert (line["price"], line["price_type"]) == (result.price, result.price_type.value)
+                    total += line["line_total"]
+                else:
+                    assert line == {"product_id": result.product_id, "quantity": quantity, "error": result.message}
+            assert cart["total"] == pytest.approx(total)
+            assert cart["errors"] == sum("error" in line for line in cart["lines"])
+
+# Instrumentation Tests
+def test_instrumented_lookups_match_plain_lookups_and_count_stages():
+    import random
+    from pricing_versioned import EngineVersion
+    rng = random.Random(23)
+    catalog, tiers, groups = random_catalog(rng)
+    rows = list(zip(*batch_rows(rng, 300)))
+    for cache_size in (0, 16):
+        plain = PricingEngine(catalog, tiers, groups, cache_size=cache_size)
+        for checked in (PricingEngine(catalog, tiers, groups, cache_size=cache_size, instrument=True),
+                        EngineVersion.from_engine(plain)):
+            checked.enable_instrumentation()
+            failures = 0
+            for row in rows:
+                try:
+                    expected = plain.get_best_price(*row)
+                except PricingError as e:
+                    failures += 1
+                    with pytest.raises(PricingError, match=str(e)):
+                        checked.get_best_price(*row)
+                else:
+                    assert checked.get_best_price(*row) == expected
+            stats = checked.stats()
+            assert stats["calls"] == len(rows)
+            assert sum(stats["errors"].values()) == failures
+            assert stats["stages"]["total"]["count"] == len(rows)
+            assert sum(stats["candidate_sizes"].values()) == stats["stages"]["select"]["count"]
+            assert sum(stats["stages"]["total"]["buckets"].values()) == len(rows)
+
+    quiet = PricingEngine(prices, customer_tiers, customer_groups)
+    assert quiet.stats() is None and "get_best_price" not in vars(quiet)
+    quiet.enable_instrumentation()
+    quiet.get_best_price("P001", 3, 2)
+    quiet.disable_instrumentation()
+    quiet.get_best_price("P001", 3, 2)
+    assert quiet.stats()["calls"] == 1 and quiet.stats()["candidate_sizes"][2] == 1
+    quiet.reset_stats()
+    assert quiet.stats()["calls"] == 0
@@ -0,0 +1,135 @@
+import io
+import json
+
+import pytest
+
+from pricing_engine import PriceEntry, PriceType, PricingEngine, PricingError, build_sample_engine
+from pricing_io import load_customers, load_price_book, price_order_lines, read_order_lines, stream_orders
+
+engine = build_sample_engine()
+
+ORDERS_CSV = """product_id,quantity,customer_id
+1,4,2
+P002,3,6
+3,0,6
+5,2,6
+bad,1,1
+1,x,2
+"""
+
+EXPECTED = [
+    {"product_id": "P001", "price": 95.0, "price_type": "TIER"},
+    {"product_id": "P002", "price": 5.0, "price_type": "CUSTOMER"},
+    {"product_id": "P003", "error": "Quantity must be greater than zero."},
+    {"product_id": "P005", "error": "No price found for P005 with quantity 2."},
+    {"product_id": "bad", "error": "Invalid product_id: bad"},
+    {"product_id": "P001", "error": "Quantity must be greater than zero."},
+]
+
+# Streaming Tests
+def test_stream_csv_to_jsonl():
+    sink = io.StringIO()
+    summary = stream_orders(engine, io.StringIO(ORDERS_CSV), sink, fmt="csv", chunk_size=4)
+    assert [json.loads(line) for line in sink.getvalue().splitlines()] == EXPECTED
+    assert (summary["rows"], summary["errors"]) == (6, 4)
+
+def test_stream_jsonl_matches_csv():
+    rows = list(read_order_lines(io.StringIO(ORDERS_CSV), "csv"))
+    source = io.StringIO("\n".join(json.dumps(row) for row in rows) + "\n")
+    sink = io.StringIO()
+    stream_orders(engine, source, sink, fmt="jsonl", chunk_size=2)
+    assert [json.loads(line) for line in sink.getvalue().splitlines()] == EXPECTED
+
+def test_malformed_jsonl_lines_become_error_rows():
+    source = io.StringIO('{"product_id": 1, "quantity": 4, "customer_id": 2}\n'
+                         '{"product_id": 1, "quantity": \n'
+                         '[1, 4, 2]\n'
+                         '\n'
+                         '{"product_id": 2, "quantity": 3, "customer_id": 6}\n')
+    sink = io.StringIO()
+    summary = stream_orders(engine, source, sink, fmt="jsonl", chunk_size=10)
+    results = [json.loads(line) for line in sink.getvalue().splitlines()]
+    assert results[0] == EXPECTED[0] and results[3] == EXPECTED[1]
+    assert results[1]["product_id"] is None and results[1]["error"].startswith("line 2: invalid JSON")
+    assert results[2] == {"product_id": None, "error": "line 3: order line must be a JSON object"}
+    assert (summary["rows"], summary["errors"]) == (4, 2)
+
+def test_price_order_lines_is_lazy():
+    def endless():
+        while True:
+            yield {"product_id": 1, "quantity": 4, "customer_id": 2}
+    results = price_order_lines(engine, endless(), chunk_size=3)
+    assert [next(results)["price"] for _ in range(5)] == [95.0] * 5
+
+# Bulk Loader Tests
+PRICES_CSV = """product_id,min_qty,price,source,key
+P001,1,120,NORMAL,
+P001,3,95,TIER,GOLD
+2,1,5,customer,6
+P002,1,10,NORMAL,
+"""
+
+EXPECTED_ENTRIES = [
+    PriceEntry("P001", 1, 120.0, PriceType.NORMAL),
+    PriceEntry("P001", 3, 95.0, PriceType.TIER, "GOLD"),
+    PriceEntry("P002", 1, 5.0, PriceType.CUSTOMER, 6),
+    PriceEntry("P002", 1, 10.0, PriceType.NORMAL),
+]
+
+def test_load_price_book_csv():
+    book, stats = load_price_book(io.StringIO(PRICES_CSV), "csv")
+    assert list(book) == EXPECTED_ENTRIES
+    assert stats["rows"] == 4
+
+def test_load_price_book_reordered_quoted_csv_and_jsonl_agree():
+    reordered = 'source,key,product_id,price,min_qty\nNORMAL,,P001,120,1\nTIER,"GOLD",P001,95,3\nCUSTOMER,6,2,5,1\nNORMAL,,P002,10,1\n'
+    book, _ = load_price_book(io.StringIO(reordered), "csv")
+    assert list(book) == EXPECTED_ENTRIES
+    jsonl = "\n".join(json.dumps({"product_id": p.product_id, "min_qty": p.min_qty, "price": p.price,
+                                   "source": p.source.value, "key": p.key}) for p in EXPECTED_ENTRIES)
+    book, _ = load_price_book(io.StringIO(jsonl), "jsonl")
+    assert list(book) == EXPECTED_ENTRIES
+
+def test_load_price_book_reports_bad_rows():
+    bad = "product_id,min_qty,price,source,key\nP001,x,1,NORMAL,\nP001,1,1,BOGUS,\nP001,1,1,CUSTOMER,abc\nP001,1,1,TIER,\n"
+    with pytest.raises(PricingError) as exc_info:
+        load_price_book(io.StringIO(bad), "csv")
+    message = str(exc_info.value)
+    assert message.startswith("4 invalid price rows")
+    assert "row 1: invalid min_qty 'x'" in message and "row 2: unknown source 'BOGUS'" in message
+
+def test_load_price_book_checks_field_counts_per_row():
+    # A short row followed by a long one has the right total field count, but
+    # must not shift the long row's fields into the wrong columns
+    ragged = "product_id,min_qty,price,source,key\nP001,5,10,NORMAL\nP002,P003,1,10,NORMAL,\n"
+    with pytest.raises(PricingError, match="1 invalid price rows; row 2: invalid min_qty 'P003'"):
+        load_price_book(io.StringIO(ragged), "csv")
+    # A row without its trailing empty key is still read like any other
+    book, _ = load_price_book(io.StringIO("product_id,min_qty,price,source,key\nP001,5,10,NORMAL\nP002,1,10,NORMAL,\n"), "csv")
+    assert list(book) == [PriceEntry("P001", 5, 10.0, PriceType.NORMAL), PriceEntry("P002", 1, 10.0, PriceType.NORMAL)]
+
+def test_load_price_book_rejects_inexact_quantities_and_non_object_lines():
+    rows = [{"product_id": 1, "min_qty": 2.7, "price": 1, "source": "NORMAL"},
+            {"product_id": 1, "min_qty": True, "price": 1, "source": "NORMAL"},
+            {"product_id": 1, "min_qty": 2 ** 31, "price": 1, "source": "NORMAL"},
+            [1, 1, 1, "NORMAL"],
+            {"product_id": 1, "min_qty": 3.0, "price": 1, "source": "NORMAL"}]
+    jsonl = "".join(json.dumps(row) + "\n" for row in rows) + "{oops\n"
+    with pytest.raises(PricingError) as exc_info:
+        load_price_book(io.StringIO(jsonl), "jsonl")
+    message = str(exc_info.value)
+    assert message.startswith("5 invalid price rows")
+    assert "row 1: invalid min_qty 2.7" in message and "row 2: invalid min_qty True" in message
+    assert "row 3: invalid min_qty 2147483648" in message and "row 4: expected a JSON object, got list" in message
+    assert "row 6: invalid JSON" in message
+    with pytest.raises(PricingError, match="row 1: invalid min_qty '2147483648'"):
+        load_price_book(io.StringIO("product_id,min_qty,price,source,key\nP001,2147483648,1,NORMAL,\n"), "csv")
+    book, _ = load_price_book(io.StringIO(json.dumps(rows[-1]) + "\n"), "jsonl")
+    assert list(book.min_qty) == [3]
+
+def test_loaded_engine_prices_orders():
+    book, _ = load_price_book(io.StringIO(PRICES_CSV), "csv")
+    tiers, groups = load_customers(io.StringIO("customer_id,tier,group\n2,GOLD,\n6,SILVER,GRP1\n"))
+    loaded = PricingEngine(book, tiers, groups)
+    assert loaded.get_best_price(1, 4, 2) == {"product_id": "P001", "price": 95.0, "price_type": "TIER"}
+    assert loaded.get_best_price(2, 1, 6)["price_type"] == "CUSTOMER"
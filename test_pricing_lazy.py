@@ -0,0 +1,125 @@
+import pickle
+import random
+import threading
+from array import array
+
+import pytest
+
+from pricing_engine import PriceBook, PriceEntry, PriceType, PricingEngine, PricingError
+import pricing_lazy
+from pricing_lazy import LazyPricingEngine, _group_rows
+from pricing_snapshot import SnapshotEngine, snapshot_bytes
+from pricing_versioned import EngineVersion
+from test_pricing_engine import batch_rows, check_batch_matches_scalar, random_catalog
+
+
+def answer(engine, product_id, quantity, customer_id):
+    try:
+        return engine.get_best_price(product_id, quantity, customer_id)
+    except PricingError as e:
+        return str(e)
+
+
+# Lazy Engine Tests
+@pytest.mark.parametrize("cache_size", [0, 16])
+def test_lazy_engine_matches_eager_engine(cache_size):
+    rng = random.Random(25)
+    for _ in range(5):
+        catalog, tiers, groups = random_catalog(rng)
+        eager = PricingEngine(catalog, tiers, groups)
+        for source in (catalog, PriceBook(catalog)):
+            lazy = LazyPricingEngine(source, tiers, groups, cache_size=cache_size)
+            assert lazy.pending == len(eager.product_codes)
+            rows = list(zip(*batch_rows(rng, 300)))
+            for row in rows:
+                assert answer(lazy, *row) == answer(eager, *row)
+            assert lazy.price_cart(3, [(1, 4), ("P002", 7)]) == eager.price_cart(3, [(1, 4), ("P002", 7)])
+            check_batch_matches_scalar(LazyPricingEngine(source, tiers, groups), *batch_rows(rng))
+            lazy.compile_all()
+            assert lazy.pending == 0 and lazy._segments == eager._segments
+
+
+def test_lazy_engine_compiles_on_first_use_and_supports_whole_index_operations():
+    rng = random.Random(26)
+    catalog, tiers, groups = random_catalog(rng)
+    eager = PricingEngine(catalog, tiers, groups)
+    lazy = LazyPricingEngine(catalog, tiers, groups)
+    total = lazy.pending
+    assert answer(lazy, 1, 20, 1) == answer(eager, 1, 20, 1)
+    assert lazy.pending == total - 1 and len(lazy._segments) < len(eager._segments)
+
+    # Updates to a pending product start from its original rows
+    lazy.upsert_price(PriceEntry(product_id="P002", min_qty=1, price=0.5, source=PriceType.NORMAL))
+    eager.upsert_price(PriceEntry(product_id="P002", min_qty=1, price=0.5, source=PriceType.NORMAL))
+    for customer_id in range(1, 7):
+        assert answer(lazy, 2, 5, customer_id) == answer(eager, 2, 5, customer_id)
+
+    # Snapshots and versions see the whole index
+    fresh = LazyPricingEngine(catalog, tiers, groups)
+    for derived in (SnapshotEngine(snapshot_bytes(fresh)), EngineVersion.from_engine(LazyPricingEngine(catalog, tiers, groups))):
+        for row in zip(*batch_rows(rng, 200)):
+            assert answer(derived, *row) == answer(PricingEngine(catalog, tiers, groups), *row)
+
+    # Instrumented lookups compile too; pickled copies keep pending products pending
+    instrumented = LazyPricingEngine(catalog, tiers, groups, instrument=True)
+    copy = pickle.loads(pickle.dumps(LazyPricingEngine(catalog, tiers, groups)))
+    for row in zip(*batch_rows(rng, 200)):
+        assert answer(instrumented, *row) == answer(copy, *row) == answer(PricingEngine(catalog, tiers, groups), *row)
+
+
+def test_concurrent_first_lookups_compile_each_product_once():
+    rng = random.Random(27)
+    catalog, tiers, groups = random_catalog(rng, products=50, rows=2000)
+    eager = PricingEngine(catalog, tiers, groups)
+    lazy = LazyPricingEngine(PriceBook(catalog), tiers, groups)
+    compiled = []
+    compile_table = lazy._compile_step_table
+
+    def counting_compile_table(rows):
+        compiled.append(rows)
+        return compile_table(rows)
+
+    lazy._compile_step_table = counting_compile_table
+    rows = [(rng.randint(1, 50), rng.randint(1, 25), rng.randint(1, 6)) for _ in range(2000)]
+    mismatches = []
+    start = threading.Barrier(8)
+
+    def reader():
+        start.wait()
+        for row in rows:
+            if answer(lazy, *row) != answer(eager, *row):
+                mismatches.append(row)
+
+    threads = [threading.Thread(target=reader) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert not mismatches
+    assert lazy.pending == 0 and lazy._segments == eager._segments
+    assert len(compiled) == len(eager._segments)   # every bucket compiled exactly once
+
+@pytest.mark.parametrize("with_numpy", [True, False])
+def test_group_rows_is_a_stable_counting_sort(monkeypatch, with_numpy):
+    if not with_numpy:
+        monkeypatch.setattr(pricing_lazy, "np", None)
+    elif pricing_lazy.np is None:
+        pytest.skip("NumPy is not installed")
+    rng = random.Random(27)
+    grouped = sorted(rng.randrange(50) for _ in range(1000))
+    shuffled = rng.sample(grouped, len(grouped))
+    for values in ([], grouped, shuffled):
+        offsets, order = _group_rows(array("i", values), 60)
+        assert len(offsets) == 61 and offsets[-1] == len(values)
+        rows = range(len(values)) if order is None else order
+        assert (order is None) == (values == sorted(values))
+        for product in range(60):
+            expected = [row for row, value in enumerate(values) if value == product]
+            assert list(rows[offsets[product]:offsets[product + 1]]) == expected
+
+    # A shuffled PriceBook still prices like an eager engine
+    catalog, tiers, groups = random_catalog(rng)
+    book = PriceBook(rng.sample(catalog, len(catalog)))
+    eager, lazy = PricingEngine(book, tiers, groups), LazyPricingEngine(book, tiers, groups)
+    for row in zip(*batch_rows(rng, 300)):
+        assert answer(lazy, *row) == answer(eager, *row)
@@ -0,0 +1,21 @@
+from pricing_engine import PricingEngine
+from pricing_io import price_order_lines
+from pricing_parallel import ParallelPricer, price_rows_parallel
+from pricing_snapshot import save_snapshot
+from test_pricing_engine import customer_groups, customer_tiers, prices
+
+engine = PricingEngine(prices, customer_tiers, customer_groups)
+rows = [{"product_id": product, "quantity": quantity, "customer_id": customer}
+        for product in (1, 2, "P003", "bad", 999) for quantity in (0, 1, 4, 10) for customer in (1, 2, 6)]
+
+# Parallel Pricing Tests
+def test_parallel_results_match_serial_in_input_order():
+    expected = list(price_order_lines(engine, rows))
+    with ParallelPricer(engine, workers=2, chunk_size=7) as pricer:
+        assert list(pricer.price(rows)) == expected
+        assert list(pricer.price(rows[:3])) == expected[:3]   # the pool is reused
+
+def test_parallel_workers_map_a_snapshot(tmp_path):
+    path = str(tmp_path / "engine.snap")
+    save_snapshot(engine, path)
+    assert price_rows_parallel(rows, snapshot=path, workers=2, chunk_size=5) == list(price_order_lines(engine, rows))
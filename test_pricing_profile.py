@@ -0,0 +1,47 @@
+import pytest
+
+from pricing_engine import build_sample_engine, main
+from pricing_profile import format_hot_functions, profile_call
+
+engine = build_sample_engine()
+
+
+def busy(rounds=20_000):
+    prices = 0.0
+    for customer_id in range(rounds):
+        prices += engine.get_best_price(1, 4, customer_id % 8)["price"]
+    return prices
+
+
+# Profiler Tests
+@pytest.mark.parametrize("profiler", ["sample", "cprofile"])
+def test_profile_call_reports_hot_functions_and_stacks(profiler):
+    result, report = profile_call(busy, profiler, interval=0.0005)
+    assert result == busy()
+    assert report.profiler == profiler and report.seconds > 0
+    assert report.stacks and all(weight > 0 for weight in report.stacks.values())
+    assert any(stack.split(";")[0].startswith("busy ") for stack in report.stacks)
+    names = [row.function.split(" ")[0] for row in report.functions]
+    assert "get_best_price" in names
+    if profiler == "cprofile":
+        row = next(row for row in report.functions if row.function.startswith("get_best_price "))
+        assert row.calls == 20_000
+    assert "function" in format_hot_functions(report, top=5).splitlines()[1]
+
+    with pytest.raises(ValueError):
+        profile_call(busy, "perf")
+
+
+def test_cli_profile_writes_collapsed_stacks(tmp_path, capsys):
+    orders = tmp_path / "orders.csv"
+    orders.write_text("product_id,quantity,customer_id\n" + "1,4,2\n2,3,6\n3,0,6\n" * 2000)
+    folded = tmp_path / "run.folded"
+    main(["--orders", str(orders), "--output", str(tmp_path / "out.jsonl"), "--profile", str(folded),
+          "--profiler", "cprofile", "--profile-top", "5"])
+    lines = folded.read_text().splitlines()
+    assert lines and all(line.rsplit(" ", 1)[1].isdigit() for line in lines)
+    assert all(line.startswith("_run ") for line in lines)
+    assert "stream_orders" in folded.read_text()
+    err = capsys.readouterr().err
+    assert "cprofile profile" in err and "collapsed stacks" in err
+    assert len((tmp_path / "out.jsonl").read_text().splitlines()) == 6000
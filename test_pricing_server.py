@@ -0,0 +1,82 @@
+import http.client
+import json
+import threading
+
+import pytest
+
+from pricing_engine import PricingEngine
+from pricing_io import price_order_lines
+from pricing_loadgen import generate_load
+from pricing_server import PricingServer
+from test_pricing_engine import customer_groups, customer_tiers, prices
+
+engine = PricingEngine(prices, customer_tiers, customer_groups)
+
+@pytest.fixture
+def server():
+    running = PricingServer(engine, port=0, chunk_size=4)
+    thread = threading.Thread(target=running.serve_forever, daemon=True)
+    thread.start()
+    yield running
+    running.shutdown()
+    running.server_close()
+
+def request(connection, method, path, body=None):
+    connection.request(method, path, body)
+    response = connection.getresponse()
+    return response.status, response.read()
+
+# HTTP Server Tests
+def test_single_lookups_share_one_keep_alive_connection(server):
+    connection = http.client.HTTPConnection(*server.server_address)
+    status, body = request(connection, "GET", "/price?product_id=1&quantity=4&customer_id=2")
+    assert (status, json.loads(body)) == (200, engine.get_best_price(1, 4, 2))
+    status, body = request(connection, "POST", "/price", json.dumps({"product_id": "P002", "quantity": 1, "customer_id": 6}))
+    assert (status, json.loads(body)["price_type"]) == (200, "CUSTOMER")
+    status, body = request(connection, "GET", "/price?product_id=999&quantity=1&customer_id=2")
+    assert (status, json.loads(body)["error"]) == (404, "No price found for P999 with quantity 1.")
+    status, _ = request(connection, "GET", "/price?product_id=1&quantity=0&customer_id=2")
+    assert status == 400
+    connection.close()
+
+def test_batch_endpoint_streams_json_lines(server):
+    rows = [{"product_id": product, "quantity": quantity, "customer_id": 6}
+            for product in (1, 2, 3, "bad", 999) for quantity in (0, 2, 5)]
+    connection = http.client.HTTPConnection(*server.server_address)
+    status, body = request(connection, "POST", "/prices", "".join(json.dumps(row) + "\n" for row in rows))
+    assert status == 200
+    assert [json.loads(line) for line in body.splitlines()] == list(price_order_lines(engine, rows))
+    connection.close()
+
+def test_malformed_input_gets_error_replies_on_a_live_connection(server):
+    connection = http.client.HTTPConnection(*server.server_address)
+    for customer_id in ([2], {"id": 2}):
+        status, body = request(connection, "POST", "/price", json.dumps({"product_id": 1, "quantity": 4, "customer_id": customer_id}))
+        assert (status, json.loads(body)) == (400, {"product_id": 1, "error": "customer_id must be a number or a string."})
+
+    # Bad lines are reported in place and the rest of the batch is still priced
+    good = {"product_id": 1, "quantity": 4, "customer_id": 2}
+    lines = [json.dumps(good), "not json", "[1, 4, 2]", json.dumps({**good, "customer_id": {"id": 2}}),
+             json.dumps({**good, "customer_id": [2]}), json.dumps(good)]
+    status, body = request(connection, "POST", "/prices", "\n".join(lines) + "\n")
+    results = [json.loads(line) for line in body.splitlines()]
+    assert status == 200 and len(results) == 6
+    assert results[0] == results[5] == engine.get_best_price(1, 4, 2)
+    assert [result["error"].split(":")[0] for result in results[1:5]] == ["line 2", "line 3", "line 4", "line 5"]
+    assert results[3]["error"] == "line 4: customer_id must be a number or a string."
+    status, body = request(connection, "GET", "/price?product_id=1&quantity=4&customer_id=2")
+    assert status == 200
+    connection.close()
+
+def test_load_generator(server):
+    host, port = server.server_address[:2]
+    # A malformed batch first: the server answers it in-band and keeps serving
+    connection = http.client.HTTPConnection(host, port)
+    status, body = request(connection, "POST", "/prices", "not json\n[1, 4, 2]\n")
+    assert (status, len(body.splitlines())) == (200, 2)
+    connection.close()
+    stats = generate_load(f"http://{host}:{port}", clients=2, requests=40, products=3, customers=6)
+    assert (stats["lines"], stats["requests"]) == (40, 40)
+    # Products 4 and 5 have no prices: their error replies still count as one line each
+    stats = generate_load(f"http://{host}:{port}", clients=2, requests=40, batch_size=7, products=5, customers=6)
+    assert (stats["lines"], stats["requests"]) == (40, 6)
@@ -0,0 +1,100 @@
+import os
+import subprocess
+import sys
+import time
+from multiprocessing import shared_memory
+
+import pytest
+
+from pricing_engine import PriceEntry, PriceType, PricingEngine, PricingError
+from pricing_shared import MAX_NAME_BYTES, SharedEngine, SharedEnginePublisher
+from test_pricing_engine import customer_groups, customer_tiers, prices
+
+# Shared-Memory Engine Tests
+def test_reader_follows_published_generations():
+    name = f"pricing-test-{os.getpid()}"
+    with SharedEnginePublisher(name) as publisher:
+        publisher.publish(PricingEngine(prices, customer_tiers, customer_groups))
+        with SharedEngine(name) as reader:
+            assert reader.get_best_price(product_id=1, quantity=4, customer_id=2)["price"] == 95
+            assert reader.generation == 1
+
+            repriced = prices + [PriceEntry(product_id="P001", min_qty=1, price=80, source=PriceType.CUSTOMER, key=2)]
+            assert publisher.publish(PricingEngine(repriced, customer_tiers, customer_groups)) == 2
+            result = reader.get_best_price(product_id=1, quantity=4, customer_id=2)
+            assert (result["price_type"], result["price"], reader.generation) == ("CUSTOMER", 80, 2)
+
+
+def test_long_names_are_rejected_and_attach_gives_up_after_close():
+    with pytest.raises(PricingError, match="longer than"):
+        SharedEnginePublisher("p" * (MAX_NAME_BYTES + 1))
+    name = f"pricing-test-{os.getpid()}-closed"
+    publisher = SharedEnginePublisher(name)
+    publisher.publish(PricingEngine(prices, customer_tiers, customer_groups))
+    reader = SharedEngine(name)
+    publisher.close()
+    with pytest.raises(PricingError, match="Could not attach"):
+        reader.engine()
+    reader.close()
+
+def test_reader_gives_up_on_a_control_block_left_mid_update():
+    import struct
+    name = f"pricing-test-{os.getpid()}-torn"
+    with SharedEnginePublisher(name) as publisher:
+        publisher.publish(PricingEngine(prices, customer_tiers, customer_groups))
+        with SharedEngine(name) as reader:
+            # A publisher that died between its two sequence bumps leaves the sequence odd
+            sequence = struct.unpack_from("<Q", publisher._control.buf, 0)[0]
+            struct.pack_into("<Q", publisher._control.buf, 0, sequence + 1)
+            with pytest.raises(PricingError, match="stayed mid-update"):
+                reader.engine()
+            struct.pack_into("<Q", publisher._control.buf, 0, sequence)
+            assert reader.get_best_price(1, 4, 2)["price"] == 95
+
+# Publisher with an in-process reader and forked workers, then either a clean close or a crash
+TRACKER_SCRIPT = """
+import os, sys
+from pricing_parallel import ParallelPricer
+from pricing_shared import SharedEngine, SharedEnginePublisher
+from pricing_engine import build_sample_engine
+publisher = SharedEnginePublisher(sys.argv[1])
+publisher.publish(build_sample_engine())
+with SharedEngine(sys.argv[1]) as reader, ParallelPricer(shared=sys.argv[1], workers=2) as pricer:
+    rows = [{"product_id": 1, "quantity": 4, "customer_id": 2}] * 4
+    assert list(pricer.price(rows)) == [reader.get_best_price(1, 4, 2)] * 4
+if sys.argv[2] == "crash":
+    os._exit(1)
+publisher.close()
+"""
+
+def test_readers_leave_the_publishers_resource_tracker_registrations_alone():
+    name = f"pricing-test-{os.getpid()}-tracker"
+    done = subprocess.run([sys.executable, "-c", TRACKER_SCRIPT, name, "close"], capture_output=True, text=True, timeout=60)
+    assert done.returncode == 0 and "Traceback" not in done.stderr, done.stderr
+
+    # A crashed publisher's segments are still unlinked by its resource tracker
+    subprocess.run([sys.executable, "-c", TRACKER_SCRIPT, name, "crash"], capture_output=True, timeout=60)
+    deadline = time.monotonic() + 10
+    while _segment_exists(name) and time.monotonic() < deadline:
+        time.sleep(0.05)
+    assert not _segment_exists(name)
+
+def test_unrelated_reader_process_does_not_unlink_segments():
+    name = f"pricing-test-{os.getpid()}-unrelated"
+    with SharedEnginePublisher(name) as publisher:
+        publisher.publish(PricingEngine(prices, customer_tiers, customer_groups))
+        script = "import sys; from pricing_shared import SharedEngine; print(SharedEngine(sys.argv[1]).get_best_price(1, 4, 2)['price'])"
+        done = subprocess.run([sys.executable, "-c", script, name], capture_output=True, text=True, timeout=60)
+        assert done.stdout.strip() == "95.0", done.stderr
+        with SharedEngine(name) as reader:
+            assert reader.get_best_price(product_id=1, quantity=4, customer_id=2)["price"] == 95
+
+def _segment_exists(name: str) -> bool:
+    try:
+        segment = shared_memory.SharedMemory(name=name)
+    except FileNotFoundError:
+        return False
+    from multiprocessing import resource_tracker
+    resource_tracker.unregister(segment._name, "shared_memory")
+    segment.close()
+    return True
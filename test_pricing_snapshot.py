@@ -0,0 +1,50 @@
+import random
+
+import pytest
+
+from pricing_engine import PricingEngine, PricingError
+from pricing_snapshot import SnapshotEngine, save_snapshot, snapshot_bytes
+from test_pricing_engine import customer_groups, customer_tiers, prices, random_catalog
+
+engine = PricingEngine(prices, customer_tiers, customer_groups)
+
+# Snapshot Tests
+def test_snapshot_file_round_trip(tmp_path):
+    path = str(tmp_path / "engine.snap")
+    save_snapshot(engine, path)
+    with SnapshotEngine.open(path) as mapped:
+        assert mapped.get_best_price(product_id=2, quantity=1, customer_id=6) == engine.get_best_price(2, 1, 6)
+        assert mapped.get_best_price(product_id=1, quantity=4, customer_id=2)["price_type"] == "TIER"
+        with pytest.raises(PricingError) as exc_info:
+            mapped.get_best_price(product_id=999, quantity=1, customer_id=2)
+        assert "No price found for P999" in str(exc_info.value)
+
+def test_snapshot_matches_engine_on_random_catalogs():
+    rng = random.Random(11)
+    for _ in range(10):
+        catalog, tiers, groups = random_catalog(rng)
+        source = PricingEngine(catalog, tiers, groups)
+        mapped = SnapshotEngine(snapshot_bytes(source))
+        for _ in range(200):
+            row = (rng.randint(1, 9), rng.randint(1, 25), rng.randint(1, 6))
+            try:
+                expected = source.get_best_price(*row)
+            except PricingError:
+                with pytest.raises(PricingError):
+                    mapped.get_best_price(*row)
+            else:
+                assert mapped.get_best_price(*row) == expected
+        mapped.close()
+
+def test_snapshot_rejects_bad_buffers_and_updates():
+    with pytest.raises(PricingError):
+        SnapshotEngine(b"\0" * 64)
+    mapped = SnapshotEngine(snapshot_bytes(engine))
+    with pytest.raises(PricingError):
+        mapped.set_customer_tier(2, "SILVER")
+
+def test_snapshot_batch_pricing_matches_engine():
+    mapped = SnapshotEngine(snapshot_bytes(engine))
+    rows = ([1, 2, 3, 5, "bad"], [4, 1, 2, 2, 1], [2, 6, 6, 6, 1])
+    for got, expected in zip(mapped.get_best_prices(*rows), engine.get_best_prices(*rows)):
+        assert [str(value) for value in got] == [str(value) for value in expected]
@@ -0,0 +1,79 @@
+import threading
+
+import pytest
+
+from pricing_engine import PriceEntry, PriceType, PricingError
+from pricing_versioned import VersionedEngine
+from test_pricing_engine import check_batch_matches_scalar, customer_groups, customer_tiers, prices
+
+# Versioned Engine Tests
+def test_updates_publish_new_versions_and_share_untouched_shards():
+    engine = VersionedEngine(prices, customer_tiers, customer_groups)
+    before = engine.current()
+    result = engine.apply_delta([
+        ("upsert", PriceEntry(product_id="P001", min_qty=3, price=90, source=PriceType.TIER, key="GOLD")),
+        ("upsert", PriceEntry(product_id="P010", min_qty=1, price=7, source=PriceType.NORMAL)),
+    ])
+    after = engine.current()
+    assert (result["version"], engine.version, before.number) == (2, 2, 1)
+    assert engine.get_best_price(1, 4, 2)["price"] == 90
+    assert engine.get_best_price(10, 1, 2)["price"] == 7
+    # The old version still answers from its own, unchanged buckets
+    assert before.get_best_price(1, 4, 2)["price"] == 95
+    with pytest.raises(PricingError):
+        before.get_best_price(10, 1, 2)
+    shared = sum(old is new for old, new in zip(before._shards, after._shards))
+    assert shared == len(before._shards) - 2
+    check_batch_matches_scalar(before, [1, 2, 3, 10], [4, 1, 2, 1], [2, 6, 6, 1])
+
+    engine.set_customer_tier(2, None)
+    assert engine.get_best_price(1, 4, 2)["price_type"] == "NORMAL"
+    assert after.get_best_price(1, 4, 2)["price_type"] == "TIER"
+    with pytest.raises(PricingError):
+        after.upsert_price(prices[0])
+    current = engine.current()
+    with pytest.raises(PricingError, match="Invalid price delta entry"):
+        engine.apply_delta([("upsert", prices[0]), ("remove", PriceEntry(product_id=["P001"], min_qty=1, price=0, source=PriceType.NORMAL))])
+    assert engine.current() is current
+
+def test_new_versions_patch_the_previous_columnar_index():
+    pytest.importorskip("numpy")
+    engine = VersionedEngine(prices, customer_tiers, customer_groups)
+    first = engine.current()
+    index = first.columnar_index()
+    engine.upsert_price(PriceEntry(product_id="P001", min_qty=3, price=90, source=PriceType.TIER, key="GOLD"))
+    engine.set_customer_tier(6, "GOLD")
+    assert engine.current()._columnar is not None and first.columnar_index() is index
+    rows = [1, 1, 2, 3, 10], [4, 4, 1, 2, 1], [2, 6, 6, 1, 2]
+    check_batch_matches_scalar(first, *rows)
+    check_batch_matches_scalar(engine.current(), *rows)
+    assert list(engine.get_best_prices(*rows)[0][:2]) == [90, 90]
+    assert list(first.get_best_prices(*rows)[0][:2]) == [95, 100]
+
+def test_readers_never_see_half_applied_batches():
+    engine = VersionedEngine(prices, customer_tiers, customer_groups)
+    stop = threading.Event()
+    torn = []
+
+    def reader():
+        while not stop.is_set():
+            version = engine.current()
+            first = version.get_best_price(1, 1, 1)["price"]
+            second = version.get_best_price(2, 1, 1)["price"]
+            if first != second:
+                torn.append((first, second))
+
+    def batch(price):
+        return [("upsert", PriceEntry(product_id=code, min_qty=1, price=price, source=PriceType.NORMAL)) for code in ("P001", "P002")]
+
+    engine.apply_delta(batch(1.0))
+    readers = [threading.Thread(target=reader) for _ in range(4)]
+    for thread in readers:
+        thread.start()
+    for price in range(2, 500):
+        engine.apply_delta(batch(float(price)))
+    stop.set()
+    for thread in readers:
+        thread.join()
+    assert not torn
+    assert engine.version == 500